@@ -2,6 +2,10 @@ from django.contrib import admin
 from django.contrib.admin.widgets import AdminFileWidget
 from django.utils.html import format_html
 from .models import Ingredient, Recipe, RecipeIngredient, UserProfile
+from .autocomplete import get_ingredient_index
+
+# Upper bound on ingredient autocomplete matches served from the prefix index
+ADMIN_AUTOCOMPLETE_LIMIT = 200
 
 
 # --- Ingredient Admin ---
@@ -19,6 +23,16 @@ class IngredientAdmin(admin.ModelAdmin):
     ordering = ['name']
     search_fields = ('name', 'fdc_id')
     list_filter = ('base_unit',)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Autocomplete widgets (e.g. RecipeIngredientInline) use the in-memory prefix index
+        # instead of icontains scans; the changelist search keeps the default behaviour
+        resolver_match = getattr(request, 'resolver_match', None)
+        if search_term and resolver_match and resolver_match.url_name == 'autocomplete':
+            ids = get_ingredient_index().search_ids(search_term, limit=ADMIN_AUTOCOMPLETE_LIMIT)
+            return queryset.filter(pk__in=ids), False
+        return super().get_search_results(request, queryset, search_term)
+
     fieldsets = (
         (None, {
             'fields': ('name', 'fdc_id', 'base_unit')
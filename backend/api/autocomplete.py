@@ -0,0 +1,291 @@
+import logging
+import re
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max
+
+from .models import Ingredient
+
+logger = logging.getLogger(__name__)
+
+
+# --- Ingredient prefix index ---
+# Every word of every ingredient name is stored in one sorted list of tokens, with the owning
+# ingredient ID in a parallel array. Within a token, entries are ordered by the ingredient's
+# rank (shorter names first), so a prefix lookup is two bisects plus a short forward scan.
+# FDC IDs get their own sorted list of digit strings.
+# The index lives in process memory; Ingredient writes in this process update it in place
+# (see the receivers in models.py), and other processes' writes are picked up by a background
+# rebuild (see ProcessWideIndex below).
+AUTOCOMPLETE_DEFAULT_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+SCAN_CHUNK_SIZE = 256
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(text):
+    """
+    Lowercases and strips accents, so 'Crème' and 'creme' index the same way.
+    """
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(normalize(text))
+
+
+class IngredientPrefixIndex:
+    """
+    Prefix search over ingredient names (any word, all query words must match) and FDC IDs.
+    """
+
+    def __init__(self, rows=()):
+        # rows: iterable of (id, name, fdc_id)
+        self._lock = threading.RLock()
+        self._entries = {}  # id -> (name, fdc_id, rank, tokens)
+        self._words = {}  # id -> ' token token ...'; word-prefix checks are substring checks
+        for ingredient_id, name, fdc_id in rows:
+            self._entries[ingredient_id] = self._make_entry(ingredient_id, name, fdc_id)
+            self._words[ingredient_id] = ' ' + ' '.join(self._entries[ingredient_id][3])
+
+        # Sort ingredients by rank once, then (token, rank position) pairs of plain ints
+        ranked_ids = sorted(self._entries, key=self._rank_key)
+        pairs = [(token, position)
+                 for position, ingredient_id in enumerate(ranked_ids)
+                 for token in self._entries[ingredient_id][3]]
+        pairs.sort()
+        self._tokens = [token for token, _ in pairs]
+        self._token_ids = array('q', (ranked_ids[position] for _, position in pairs))
+
+        fdc_pairs = sorted((str(entry[1]), ingredient_id)
+                           for ingredient_id, entry in self._entries.items() if entry[1] is not None)
+        self._fdc_keys = [key for key, _ in fdc_pairs]
+        self._fdc_ids = array('q', (ingredient_id for _, ingredient_id in fdc_pairs))
+
+    @classmethod
+    def from_db(cls):
+        start = time.perf_counter()
+        index = cls(Ingredient.objects.values_list(
+            'id', 'name', 'fdc_id').iterator(chunk_size=5000))
+        logger.info(
+            f"Built ingredient prefix index: {len(index)} ingredients in {time.perf_counter() - start:.2f}s.")
+        return index
+
+    @staticmethod
+    def _make_entry(ingredient_id, name, fdc_id):
+        normalized = normalize(name)
+        tokens = tuple(dict.fromkeys(sys.intern(token) for token in _TOKEN_RE.findall(normalized)))
+        rank = (len(name), normalized, ingredient_id)
+        return (name, fdc_id, rank, tokens)
+
+    def __len__(self):
+        return len(self._entries)
+
+    # --- Incremental updates ---
+    def _rank_key(self, ingredient_id):
+        return self._entries[ingredient_id][2]
+
+    def add(self, ingredient_id, name, fdc_id):
+        with self._lock:
+            if ingredient_id in self._entries:
+                self.remove(ingredient_id)
+            entry = self._make_entry(ingredient_id, name, fdc_id)
+            self._entries[ingredient_id] = entry
+            self._words[ingredient_id] = ' ' + ' '.join(entry[3])
+            for token in entry[3]:
+                lo = bisect_left(self._tokens, token)
+                hi = bisect_right(self._tokens, token, lo)
+                position = bisect_left(self._token_ids, entry[2], lo, hi, key=self._rank_key)
+                self._tokens.insert(position, token)
+                self._token_ids.insert(position, ingredient_id)
+            if fdc_id is not None:
+                key = str(fdc_id)
+                position = bisect_right(self._fdc_keys, key)
+                self._fdc_keys.insert(position, key)
+                self._fdc_ids.insert(position, ingredient_id)
+
+    def remove(self, ingredient_id):
+        with self._lock:
+            entry = self._entries.get(ingredient_id)
+            if entry is None:
+                return
+            for token in entry[3]:
+                lo = bisect_left(self._tokens, token)
+                hi = bisect_right(self._tokens, token, lo)
+                position = bisect_left(self._token_ids, entry[2], lo, hi, key=self._rank_key)
+                del self._tokens[position]
+                del self._token_ids[position]
+            if entry[1] is not None:
+                key = str(entry[1])
+                lo = bisect_left(self._fdc_keys, key)
+                hi = bisect_right(self._fdc_keys, key, lo)
+                for position in range(lo, hi):
+                    if self._fdc_ids[position] == ingredient_id:
+                        del self._fdc_keys[position]
+                        del self._fdc_ids[position]
+                        break
+            del self._entries[ingredient_id]
+            del self._words[ingredient_id]
+
+    # --- Lookups ---
+    @staticmethod
+    def _prefix_range(keys, prefix):
+        lo = bisect_left(keys, prefix)
+        # Sorts after every word that starts with the prefix
+        hi = bisect_left(keys, prefix + '\U0010ffff', lo)
+        return lo, hi
+
+    def search(self, query, limit=AUTOCOMPLETE_DEFAULT_LIMIT):
+        """
+        Returns up to `limit` (id, name, fdc_id) tuples. A numeric query also matches FDC ID
+        prefixes. Names starting with the query come first, then shorter names.
+        """
+        query_tokens = tokenize(query)
+        if not query_tokens or limit <= 0:
+            return []
+
+        with self._lock:
+            found = {}
+            if len(query_tokens) == 1 and query_tokens[0].isdigit():
+                lo, hi = self._prefix_range(self._fdc_keys, query_tokens[0])
+                for position in range(lo, min(hi, lo + limit)):
+                    ingredient_id = self._fdc_ids[position]
+                    found[ingredient_id] = self._entries[ingredient_id]
+
+            # Scan the rarest query word; check the others against each candidate's tokens
+            ranges = [(self._prefix_range(self._tokens, token), token) for token in query_tokens]
+            (lo, hi), scanned = min(ranges, key=lambda item: item[0][1] - item[0][0])
+            needles = [' ' + token for token in query_tokens if token != scanned]
+            words = self._words
+            # Filtered in chunks with list comprehensions; most keystrokes stop after the first
+            for start in range(lo, hi, SCAN_CHUNK_SIZE):
+                candidates = self._token_ids[start:min(hi, start + SCAN_CHUNK_SIZE)]
+                for needle in needles:
+                    candidates = [ingredient_id for ingredient_id in candidates
+                                  if needle in words[ingredient_id]]
+                for ingredient_id in candidates:
+                    if ingredient_id not in found:
+                        found[ingredient_id] = self._entries[ingredient_id]
+                        if len(found) >= limit:
+                            break
+                if len(found) >= limit:
+                    break
+
+        normalized_query = ' '.join(query_tokens)
+        results = sorted(found.items(), key=lambda item: (
+            not item[1][2][1].startswith(normalized_query), item[1][2]))
+        return [(ingredient_id, entry[0], entry[1]) for ingredient_id, entry in results[:limit]]
+
+    def search_ids(self, query, limit=AUTOCOMPLETE_DEFAULT_LIMIT):
+        return [ingredient_id for ingredient_id, _, _ in self.search(query, limit)]
+
+
+# --- Process-wide index ---
+# The first request builds the index inline. After that, once every
+# settings.INGREDIENT_INDEX_CHECK_SECONDS, a background thread compares ingredient_stamp() with
+# the stamp the index was built from and rebuilds only when it moved; requests keep using the
+# current index in the meantime. Writes made in this process are applied in place right away.
+def ingredient_stamp():
+    """
+    (latest Ingredient.updated_at, row count): moves on every insert, update and delete.
+    """
+    stamp = Ingredient.objects.aggregate(latest=Max('updated_at'), count=Count('id'))
+    return stamp['latest'], stamp['count']
+
+
+class ProcessWideIndex:
+    """
+    One lazily built, background-refreshed in-memory structure per process; `build` makes a
+    fresh one from the database.
+    """
+
+    def __init__(self, build):
+        self._build = build
+        self._lock = threading.Lock()
+        self._index = None
+        self._stamp = None
+        self._checked_at = 0.0
+        self._refreshing = False
+
+    def get(self):
+        index = self._index
+        if index is None:
+            with self._lock:
+                if self._index is None:
+                    self._stamp = ingredient_stamp()
+                    self._index = self._build()
+                    self._checked_at = time.monotonic()
+                return self._index
+        interval = getattr(settings, 'INGREDIENT_INDEX_CHECK_SECONDS', None)
+        if interval is not None and time.monotonic() - self._checked_at >= interval:
+            self._start_refresh()
+        return index
+
+    def loaded(self):
+        """
+        The current index if it has been built, else None (writes don't force a build).
+        """
+        return self._index
+
+    def reset(self):
+        with self._lock:
+            self._index = self._stamp = None
+
+    def _start_refresh(self):
+        with self._lock:
+            if self._refreshing or self._index is None:
+                return
+            self._refreshing = True
+            self._checked_at = time.monotonic()
+        threading.Thread(target=self._refresh_in_thread, daemon=True).start()
+
+    def _refresh_in_thread(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Background index refresh failed: {e}")
+        finally:
+            connection.close()
+
+    def refresh(self):
+        """
+        Rebuilds now if the ingredient table changed since the last build. Returns True if it did.
+        """
+        try:
+            # Taken before the build, so writes that land during it trigger another refresh
+            stamp = ingredient_stamp()
+            if stamp == self._stamp:
+                return False
+            index = self._build()
+            with self._lock:
+                if self._index is not None:
+                    self._index, self._stamp = index, stamp
+            return True
+        finally:
+            self._refreshing = False
+
+
+_ingredient_index = ProcessWideIndex(IngredientPrefixIndex.from_db)
+
+
+def get_ingredient_index():
+    return _ingredient_index.get()
+
+
+def loaded_ingredient_index():
+    return _ingredient_index.loaded()
+
+
+def reset_ingredient_index():
+    _ingredient_index.reset()
@@ -0,0 +1,365 @@
+import json
+import logging
+import math
+import platform
+import subprocess
+import time
+from contextlib import contextmanager
+
+import django
+from django.conf import settings
+from django.db import transaction
+
+from .models import Ingredient, Recipe
+
+logger = logging.getLogger(__name__)
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """
+    Runs the block inside a transaction that is always rolled back, so benchmarks can
+    create (or delete) as much data as they like without touching the real catalog.
+    """
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback()
+    except _Rollback:
+        pass
+
+
+def percentile(sorted_samples, pct):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_samples:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+def latency_summary(samples_ms):
+    samples = sorted(samples_ms)
+    return {
+        'runs': len(samples),
+        'mean_ms': round(sum(samples) / len(samples), 4) if samples else None,
+        'p50_ms': round(percentile(samples, 50), 4) if samples else None,
+        'p95_ms': round(percentile(samples, 95), 4) if samples else None,
+        'p99_ms': round(percentile(samples, 99), 4) if samples else None,
+    }
+
+
+def run_metadata():
+    """
+    Identifies the environment a benchmark ran in, so JSON reports can be compared across commits.
+    """
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'git_commit': commit,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'platform': platform.platform(),
+        'database': settings.DATABASES['default']['ENGINE'],
+    }
+
+
+def write_report(path, report):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    logger.info(f"Wrote benchmark report to '{path}'.")
+
+
+# --- Synthetic recipe catalogs ---
+# Per-meal-type calorie distributions (mean, standard deviation, min) and the share of
+# recipes of each type, loosely based on typical home-cooking recipe collections.
+SYNTHETIC_MEAL_PROFILES = {
+    'breakfast': {'share': 0.25, 'calories': (450, 130, 120)},
+    'lunch': {'share': 0.30, 'calories': (650, 180, 200)},
+    'dinner': {'share': 0.30, 'calories': (720, 200, 250)},
+    'snack': {'share': 0.15, 'calories': (220, 90, 50)},
+}
+
+
+def synthetic_recipe(rng, index, meal_type, name_prefix='bench'):
+    """
+    Builds an unsaved Recipe with realistic, internally consistent macros:
+    protein/fat shares of energy are drawn from typical ranges, carbs make up the rest.
+    """
+    mean, stddev, minimum = SYNTHETIC_MEAL_PROFILES[meal_type]['calories']
+    calories = max(minimum, rng.gauss(mean, stddev))
+    protein_share = min(0.45, max(0.08, rng.gauss(0.22, 0.07)))
+    fat_share = min(0.55, max(0.10, rng.gauss(0.32, 0.08)))
+    carbs_share = max(0.0, 1.0 - protein_share - fat_share)
+    return Recipe(
+        name=f"{name_prefix}-{index}",
+        instructions='',
+        meal_type=meal_type,
+        total_calories=round(calories, 2),
+        total_protein_g=round(calories * protein_share / 4, 2),
+        total_carbs_g=round(calories * carbs_share / 4, 2),
+        total_fat_g=round(calories * fat_share / 9, 2),
+    )
+
+
+def create_synthetic_catalog(size, rng, batch_size=5000, name_prefix='bench'):
+    """
+    Bulk-inserts `size` synthetic recipes split across meal types. Returns the per-type counts.
+    """
+    counts = {}
+    remaining = size
+    meal_types = list(SYNTHETIC_MEAL_PROFILES)
+    for position, meal_type in enumerate(meal_types):
+        if position == len(meal_types) - 1:
+            counts[meal_type] = remaining
+        else:
+            counts[meal_type] = round(
+                size * SYNTHETIC_MEAL_PROFILES[meal_type]['share'])
+            remaining -= counts[meal_type]
+
+    index = 0
+    batch = []
+    for meal_type, count in counts.items():
+        for _ in range(count):
+            batch.append(synthetic_recipe(rng, index, meal_type, name_prefix))
+            index += 1
+            if len(batch) >= batch_size:
+                Recipe.objects.bulk_create(batch)
+                batch = []
+    if batch:
+        Recipe.objects.bulk_create(batch)
+    return counts
+
+
+# Slots the planner may leave empty; every other non-empty slot gets a recipe
+OPTIONAL_MEAL_SLOTS = ('snack',)
+
+
+def exact_daily_optimum(catalog, user_daily_targets, limit=1_000_000):
+    """
+    Best achievable daily fitness score (see calculate_daily_plan_fitness_score) over every
+    combination of one recipe per non-empty meal slot, optional slots (OPTIONAL_MEAL_SLOTS)
+    possibly left out as the planner may do.
+    Meet-in-the-middle: slots are split into two halves whose recipe combinations are summed,
+    then each left sum is paired with right sums ordered by calories. The calorie term alone
+    is a lower bound on the score, so the scan stops once it exceeds the best score found.
+    Returns None when either half has more than `limit` combinations.
+    """
+    from bisect import bisect_left
+    from itertools import product
+    from .meal_planner_logic import MEAL_SLOTS_ORDER
+
+    slots = [slot for slot in MEAL_SLOTS_ORDER if catalog.count(slot)]
+    if not slots:
+        return None
+    # An optional slot has one more choice: no recipe at all
+    choices = [catalog.count(slot) + (slot in OPTIONAL_MEAL_SLOTS) for slot in slots]
+    half = len(slots) // 2
+    if math.prod(choices[:half]) > limit or math.prod(choices[half:]) > limit:
+        return None
+
+    vectors = [
+        [(n['calories'], n['protein'], n['carbs'], n['fat'])
+         for _, n in catalog.iter_recipes(slot)]
+        + ([(0.0, 0.0, 0.0, 0.0)] if slot in OPTIONAL_MEAL_SLOTS else [])
+        for slot in slots
+    ]
+
+    def summed(groups):
+        if not groups:
+            return [(0.0, 0.0, 0.0, 0.0)]
+        return [tuple(map(sum, zip(*combo))) for combo in product(*groups)]
+
+    left = summed(vectors[:half])
+    right = sorted(summed(vectors[half:]))
+    right_calories = [combo[0] for combo in right]
+    target_cal = user_daily_targets['calories']
+    target_protein = user_daily_targets['protein_g']
+    target_carbs = user_daily_targets['carbs_g']
+    target_fat = user_daily_targets['fat_g']
+
+    def score_against(combo, need_cal, need_protein, need_carbs, need_fat):
+        return (abs(combo[0] - need_cal) + abs(combo[1] - need_protein)
+                + abs(combo[2] - need_carbs) + abs(combo[3] - need_fat))
+
+    best = math.inf
+    for cal, protein, carbs, fat in left:
+        needs = (target_cal - cal, target_protein - protein,
+                 target_carbs - carbs, target_fat - fat)
+        start = bisect_left(right_calories, needs[0])
+        # Walk outwards from the closest calorie match in both directions
+        for index in range(start, len(right)):
+            if right_calories[index] - needs[0] >= best:
+                break
+            best = min(best, score_against(right[index], *needs))
+        for index in range(start - 1, -1, -1):
+            if needs[0] - right_calories[index] >= best:
+                break
+            best = min(best, score_against(right[index], *needs))
+    return best
+
+
+# --- Fixture ingredients ---
+# Per-100g macros and foodPortions payloads shaped like USDA FDC responses (SR Legacy and
+# Foundation foods), covering each conversion path in Recipe.get_ingredient_grams.
+def _portion(amount, gram_weight, unit_name='undetermined', unit_abbreviation='undetermined', modifier='', sequence=1):
+    return {
+        'id': 80000 + sequence,
+        'amount': amount,
+        'gramWeight': gram_weight,
+        'modifier': modifier,
+        'measureUnit': {'id': 9999 if unit_name == 'undetermined' else 1000 + sequence,
+                        'name': unit_name, 'abbreviation': unit_abbreviation},
+        'sequenceNumber': sequence,
+        'portionDescription': '',
+    }
+
+
+FIXTURE_INGREDIENTS = {
+    'flour': {
+        'name': 'Wheat flour, white, all-purpose, enriched, bleached', 'fdc_id': 169761,
+        'calories_per_100g': 364.0, 'protein_per_100g': 10.33, 'carbs_per_100g': 76.31, 'fat_per_100g': 0.98,
+        'usda_food_portions': [
+            _portion(1.0, 125.0, 'cup', 'cup', sequence=1),
+            _portion(1.0, 7.8, modifier='tbsp', sequence=2),
+        ],
+    },
+    'sugar': {
+        'name': 'Sugars, granulated', 'fdc_id': 169655,
+        'calories_per_100g': 387.0, 'protein_per_100g': 0.0, 'carbs_per_100g': 99.98, 'fat_per_100g': 0.0,
+        'usda_food_portions': [
+            _portion(1.0, 4.2, modifier='tsp', sequence=1),
+            _portion(1.0, 2.8, modifier='packet', sequence=2),
+            _portion(1.0, 200.0, modifier='cup', sequence=3),
+            _portion(1.0, 12.6, modifier='tbsp', sequence=4),
+        ],
+    },
+    'olive_oil': {
+        'name': 'Oil, olive, salad or cooking', 'fdc_id': 171413,
+        'calories_per_100g': 884.0, 'protein_per_100g': 0.0, 'carbs_per_100g': 0.0, 'fat_per_100g': 100.0,
+        'usda_food_portions': [
+            _portion(1.0, 13.5, modifier='tablespoon', sequence=1),
+            _portion(1.0, 216.0, modifier='cup', sequence=2),
+            _portion(1.0, 4.5, modifier='tsp', sequence=3),
+        ],
+    },
+    'apple': {
+        'name': 'Apples, raw, with skin', 'fdc_id': 171688,
+        'calories_per_100g': 52.0, 'protein_per_100g': 0.26, 'carbs_per_100g': 13.81, 'fat_per_100g': 0.17,
+        'usda_food_portions': [
+            _portion(1.0, 125.0, modifier='cup, quartered or chopped', sequence=1),
+            _portion(1.0, 223.0, modifier='large (3-1/4" dia)', sequence=2),
+            _portion(1.0, 182.0, modifier='apples, medium (3" dia)', sequence=3),
+            _portion(1.0, 149.0, modifier='small (2-3/4" dia)', sequence=4),
+        ],
+    },
+    'egg': {
+        'name': 'Egg, whole, raw, fresh', 'fdc_id': 171287,
+        'calories_per_100g': 143.0, 'protein_per_100g': 12.56, 'carbs_per_100g': 0.72, 'fat_per_100g': 9.51,
+        'usda_food_portions': [
+            _portion(1.0, 56.0, modifier='extra large', sequence=1),
+            _portion(1.0, 243.0, 'cup', 'cup', sequence=2),
+            _portion(1.0, 50.0, 'piece', 'piece', modifier='large', sequence=3),
+        ],
+    },
+    'milk': {
+        'name': 'Milk, whole, 3.25% milkfat, with added vitamin D', 'fdc_id': 171265,
+        'calories_per_100g': 61.0, 'protein_per_100g': 3.15, 'carbs_per_100g': 4.8, 'fat_per_100g': 3.25,
+        'usda_food_portions': [
+            _portion(1.0, 244.0, 'cup', 'cup', sequence=1),
+            _portion(1.0, 30.5, modifier='fl oz', sequence=2),
+        ],
+    },
+    'chicken': {
+        'name': 'Chicken, broilers or fryers, breast, meat only, raw', 'fdc_id': 171077,
+        'calories_per_100g': 120.0, 'protein_per_100g': 22.5, 'carbs_per_100g': 0.0, 'fat_per_100g': 2.62,
+        'usda_food_portions': [],
+    },
+}
+
+
+def fixture_ingredient(key, **overrides):
+    """
+    Returns an unsaved Ingredient built from FIXTURE_INGREDIENTS.
+    """
+    fields = {**FIXTURE_INGREDIENTS[key], **overrides}
+    return Ingredient(**fields)
+
+
+# --- FDC-shaped payloads ---
+# Nutrient IDs and units as served by the FoodData Central API (full format)
+FDC_NUTRIENTS = {
+    'calories_per_100g': (1008, 'Energy', 'kcal'),
+    'protein_per_100g': (1003, 'Protein', 'g'),
+    'fat_per_100g': (1004, 'Total lipid (fat)', 'g'),
+    'carbs_per_100g': (1005, 'Carbohydrate, by difference', 'g'),
+}
+
+
+def fdc_food_payload(fdc_id, name, macros, food_portions=(), extra_nutrients=0):
+    """
+    A full-format FDC food as returned by `food/<fdc_id>`. `macros` maps Ingredient macro
+    fields to amounts per 100g; `extra_nutrients` pads foodNutrients with unrelated entries,
+    real SR Legacy foods carry ~100-150 of them.
+    """
+    food_nutrients = []
+    for sequence in range(extra_nutrients):
+        nutrient_id = 1100 + sequence
+        food_nutrients.append({
+            'type': 'FoodNutrient', 'id': 2000000 + sequence, 'amount': round(sequence * 0.37, 3),
+            'nutrient': {'id': nutrient_id, 'number': str(300 + sequence), 'name': f'Nutrient {nutrient_id}',
+                         'rank': 5000 + sequence, 'unitName': 'mg'},
+        })
+    for field, (nutrient_id, nutrient_name, unit) in FDC_NUTRIENTS.items():
+        if macros.get(field) is None:
+            continue
+        food_nutrients.append({
+            'type': 'FoodNutrient', 'id': 1000000 + nutrient_id, 'amount': macros[field],
+            'nutrient': {'id': nutrient_id, 'number': str(nutrient_id - 800), 'name': nutrient_name,
+                         'rank': 100, 'unitName': unit},
+        })
+    return {
+        'fdcId': fdc_id,
+        'description': name,
+        'dataType': 'SR Legacy',
+        'publicationDate': '4/1/2019',
+        'foodNutrients': food_nutrients,
+        'foodPortions': list(food_portions),
+    }
+
+
+def fixture_fdc_payload(key, **kwargs):
+    fields = FIXTURE_INGREDIENTS[key]
+    return fdc_food_payload(fields['fdc_id'], fields['name'], fields,
+                            fields['usda_food_portions'], **kwargs)
+
+
+def synthetic_fdc_foods(count, rng, first_fdc_id=2000000, extra_nutrients=0):
+    """
+    {fdc_id: payload} for `count` FDC-shaped foods with plausible macros, e.g. to serve from
+    StubFDCServer when benchmarking the fetcher.
+    """
+    foods = {}
+    for offset in range(count):
+        fdc_id = first_fdc_id + offset
+        protein, fat = round(rng.uniform(0, 30), 2), round(rng.uniform(0, 40), 2)
+        carbs = round(rng.uniform(0, 100 - protein - fat) if protein + fat < 100 else 0.0, 2)
+        macros = {
+            'protein_per_100g': protein, 'fat_per_100g': fat, 'carbs_per_100g': carbs,
+            'calories_per_100g': round(protein * 4 + carbs * 4 + fat * 9, 1),
+        }
+        portions = [{'id': fdc_id, 'gramWeight': round(rng.uniform(5, 250), 1), 'amount': 1.0,
+                     'modifier': 'cup', 'measureUnit': {'id': 9999, 'name': 'undetermined'}}]
+        foods[fdc_id] = fdc_food_payload(
+            fdc_id, f"Synthetic food {fdc_id}, raw", macros, portions, extra_nutrients)
+    return foods
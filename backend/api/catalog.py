@@ -0,0 +1,349 @@
+import logging
+import struct
+import sys
+from array import array
+from multiprocessing import resource_tracker, shared_memory
+
+from django.conf import settings
+
+from .models import CatalogVersion, Recipe
+
+logger = logging.getLogger(__name__)
+
+
+# --- Catalog layout ---
+# The planner only needs (id, calories, protein, carbs, fat) per recipe, bucketed by meal type.
+# We keep those as flat typed arrays so they can be shared between worker processes without
+# pickling or per-object overhead.
+MEAL_TYPES = [choice[0] for choice in Recipe.MEAL_TYPE_CHOICES]
+MACRO_FIELDS = ('calories', 'protein', 'carbs', 'fat')
+MACROS_PER_RECIPE = len(MACRO_FIELDS)
+
+# Binary layout (little endian, every block 8-byte aligned):
+#   header:  magic, layout version, number of meal types, generation, catalog version
+#            (CatalogVersion.version and updated_at in microseconds, see catalog_version_key())
+#   index:   one (meal type name, recipe count) entry per meal type
+#   ids:     int64 recipe IDs, meal types in index order
+#   macros:  float64 macro vectors (MACROS_PER_RECIPE per recipe), same order as ids
+CATALOG_MAGIC = b'NPCATLG\x00'
+CATALOG_LAYOUT_VERSION = 2
+_HEADER = struct.Struct('<8sIIQQQ')
+_INDEX_ENTRY = struct.Struct('<16sQ')
+
+# Control segment: magic + generation of the currently published data segment
+_CONTROL = struct.Struct('<8sQ')
+CONTROL_MAGIC = b'NPCTRL\x00\x00'
+
+DEFAULT_SHM_NAME = 'nutriplan_catalog'
+
+
+def catalog_version_key(catalog_version=None):
+    """
+    (version, updated_at in microseconds) of a CatalogVersion (default: the current one),
+    the same pair CatalogVersion.cache_token is made of.
+    """
+    catalog_version = catalog_version or CatalogVersion.current()
+    return catalog_version.version, int(catalog_version.updated_at.timestamp() * 1_000_000)
+
+
+class PlannerCatalog:
+    """
+    Array-backed catalog of recipes with calculated nutrition, bucketed by meal type.
+    Built either from the database or (zero-copy) from a shared memory buffer.
+    """
+
+    def __init__(self, ids_by_meal_type, macros_by_meal_type, generation=0, shm=None, catalog_version=None):
+        # meal_type -> sequence of recipe IDs (array('q') or memoryview cast to 'q')
+        self.ids = ids_by_meal_type
+        # meal_type -> flat sequence of macros (array('d') or memoryview cast to 'd')
+        self.macros = macros_by_meal_type
+        self.generation = generation
+        # catalog_version_key() of the data this catalog was built from, when known
+        self.catalog_version = catalog_version
+        # Keeps the shared memory mapping alive for as long as this catalog is referenced
+        self._shm = shm
+
+    def __len__(self):
+        return sum(len(ids) for ids in self.ids.values())
+
+    def __del__(self):
+        self.close()
+
+    def count(self, meal_type):
+        return len(self.ids.get(meal_type, ()))
+
+    def iter_recipes(self, meal_type):
+        """
+        Yields (recipe_id, nutrition_dict) for every recipe of the given meal type,
+        in the same order the catalog was built in.
+        """
+        ids = self.ids.get(meal_type, ())
+        macros = self.macros.get(meal_type, ())
+        for index, recipe_id in enumerate(ids):
+            base = index * MACROS_PER_RECIPE
+            yield recipe_id, {
+                'calories': macros[base],
+                'protein': macros[base + 1],
+                'carbs': macros[base + 2],
+                'fat': macros[base + 3],
+            }
+
+    @classmethod
+    def from_db(cls, generation=0, catalog_version=None):
+        """
+        Builds the catalog with a single values_list() query over recipes that have
+        calculated nutrition. Missing macro values are stored as 0, like the planner expects.
+        Pass the catalog_version_key() read before building to tag the catalog with it.
+        """
+        ids_by_meal_type = {meal_type: array('q') for meal_type in MEAL_TYPES}
+        macros_by_meal_type = {meal_type: array('d') for meal_type in MEAL_TYPES}
+
+        rows = Recipe.objects.filter(total_calories__isnull=False).order_by('pk').values_list(
+            'id', 'meal_type', 'total_calories', 'total_protein_g', 'total_carbs_g', 'total_fat_g')
+        for recipe_id, meal_type, calories, protein, carbs, fat in rows.iterator():
+            if meal_type not in ids_by_meal_type:
+                logger.warning(
+                    f"Recipe ID {recipe_id} has unknown meal type '{meal_type}'. Leaving it out of the planner catalog.")
+                continue
+            ids_by_meal_type[meal_type].append(recipe_id)
+            macros_by_meal_type[meal_type].extend(
+                (calories or 0.0, protein or 0.0, carbs or 0.0, fat or 0.0))
+
+        return cls(ids_by_meal_type, macros_by_meal_type, generation=generation,
+                   catalog_version=catalog_version)
+
+    def to_bytes(self, generation=None):
+        """
+        Serializes the catalog into the shared binary layout described at the top of this module.
+        """
+        generation = self.generation if generation is None else generation
+        version, stamp = self.catalog_version or (0, 0)
+        parts = [_HEADER.pack(CATALOG_MAGIC, CATALOG_LAYOUT_VERSION, len(MEAL_TYPES), generation, version, stamp)]
+        for meal_type in MEAL_TYPES:
+            parts.append(_INDEX_ENTRY.pack(meal_type.encode('ascii'), self.count(meal_type)))
+        for meal_type in MEAL_TYPES:
+            parts.append(array('q', self.ids.get(meal_type, ())).tobytes())
+        for meal_type in MEAL_TYPES:
+            parts.append(array('d', self.macros.get(meal_type, ())).tobytes())
+        return b''.join(parts)
+
+    @classmethod
+    def from_buffer(cls, buffer, shm=None):
+        """
+        Maps a catalog over an existing buffer (e.g. SharedMemory.buf) without copying.
+        Raises ValueError if the buffer does not hold a catalog in the expected layout.
+        """
+        view = memoryview(buffer)
+        magic, layout_version, num_meal_types = _HEADER.unpack_from(view, 0)[:3]
+        if magic != CATALOG_MAGIC or layout_version != CATALOG_LAYOUT_VERSION:
+            raise ValueError(
+                f"Unsupported planner catalog buffer (magic={magic!r}, layout version={layout_version}).")
+        generation, version, stamp = _HEADER.unpack_from(view, 0)[3:]
+
+        offset = _HEADER.size
+        counts = []
+        for _ in range(num_meal_types):
+            raw_name, count = _INDEX_ENTRY.unpack_from(view, offset)
+            counts.append((raw_name.rstrip(b'\x00').decode('ascii'), count))
+            offset += _INDEX_ENTRY.size
+
+        ids_by_meal_type = {}
+        for meal_type, count in counts:
+            size = count * 8
+            ids_by_meal_type[meal_type] = view[offset:offset + size].cast('q')
+            offset += size
+
+        macros_by_meal_type = {}
+        for meal_type, count in counts:
+            size = count * MACROS_PER_RECIPE * 8
+            macros_by_meal_type[meal_type] = view[offset:offset + size].cast('d')
+            offset += size
+
+        return cls(ids_by_meal_type, macros_by_meal_type, generation=generation, shm=shm,
+                   catalog_version=(version, stamp) if version or stamp else None)
+
+    def close(self):
+        """
+        Releases any views over a shared memory mapping and unmaps it.
+        Catalogs built from the database have nothing to release.
+        """
+        if getattr(self, '_shm', None) is None:
+            return
+        for views in (self.ids, self.macros):
+            for view in views.values():
+                if isinstance(view, memoryview):
+                    view.release()
+        self._shm.close()
+        self._shm = None
+
+
+# --- Shared memory publishing ---
+
+def _shm_name(name=None):
+    return name or getattr(settings, 'PLANNER_CATALOG_SHM_NAME', DEFAULT_SHM_NAME)
+
+
+def _open_segment(name, create=False, size=0):
+    """
+    Opens (or creates) a shared memory segment that outlives this process.
+    The multiprocessing resource tracker would otherwise unlink it when the process exits.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    segment = shared_memory.SharedMemory(name=name, create=create, size=size)
+    resource_tracker.unregister(segment._name, 'shared_memory')
+    return segment
+
+
+def _unlink_segment(segment):
+    segment.close()
+    if sys.version_info < (3, 13):
+        # unlink() unregisters from the resource tracker, so register it back first
+        resource_tracker.register(segment._name, 'shared_memory')
+    segment.unlink()
+
+
+def _read_generation(control):
+    magic, generation = _CONTROL.unpack_from(control.buf, 0)
+    if magic != CONTROL_MAGIC:
+        return 0
+    return generation
+
+
+def publish_catalog(catalog=None, name=None):
+    """
+    Writes the catalog into a new shared memory segment and atomically points the
+    control segment at it. Returns the new generation number.
+    The previous generation's segment is unlinked; workers still mapping it keep
+    their mapping until they swap to the new generation.
+    """
+    name = _shm_name(name)
+    if catalog is None:
+        # Read before the recipes, so writes landing during the build trigger another publish
+        catalog = PlannerCatalog.from_db(catalog_version=catalog_version_key())
+
+    try:
+        control = _open_segment(name, create=True, size=_CONTROL.size)
+        _CONTROL.pack_into(control.buf, 0, CONTROL_MAGIC, 0)
+    except FileExistsError:
+        control = _open_segment(name)
+
+    try:
+        previous_generation = _read_generation(control)
+        generation = previous_generation + 1
+        payload = catalog.to_bytes(generation)
+
+        segment = _open_segment(f"{name}_{generation}", create=True, size=len(payload))
+        segment.buf[:len(payload)] = payload
+        segment.close()
+
+        # An aligned 8-byte store: readers see either the old or the new generation
+        _CONTROL.pack_into(control.buf, 0, CONTROL_MAGIC, generation)
+    finally:
+        control.close()
+
+    if previous_generation:
+        try:
+            _unlink_segment(_open_segment(f"{name}_{previous_generation}"))
+        except FileNotFoundError:
+            pass
+
+    logger.info(
+        f"Published planner catalog generation {generation} ({len(catalog)} recipes, {len(payload)} bytes) to shared memory '{name}'.")
+    return generation
+
+
+def unlink_catalog(name=None):
+    """
+    Removes the control segment and the currently published data segment.
+    """
+    name = _shm_name(name)
+    try:
+        control = _open_segment(name)
+    except FileNotFoundError:
+        return False
+    generation = _read_generation(control)
+    _unlink_segment(control)
+    # A later publish under this name starts again at generation 1
+    _attached_catalogs.pop(name, None)
+    if generation:
+        try:
+            _unlink_segment(_open_segment(f"{name}_{generation}"))
+        except FileNotFoundError:
+            pass
+    return True
+
+
+# Per-process handles on the currently mapped generation, by segment name
+_attached_catalogs = {}
+
+
+def get_shared_catalog(name=None):
+    """
+    Returns the currently published catalog mapped zero-copy from shared memory,
+    re-mapping only when the generation changes. Returns None if nothing is published.
+    """
+    name = _shm_name(name)
+    try:
+        control = _open_segment(name)
+    except FileNotFoundError:
+        return None
+    attached = _attached_catalogs.get(name)
+    try:
+        generation = _read_generation(control)
+    finally:
+        control.close()
+
+    if not generation:
+        return None
+    if attached is not None and attached.generation == generation:
+        return attached
+
+    try:
+        segment = _open_segment(f"{name}_{generation}")
+    except FileNotFoundError:
+        # Lost a race with a newer publish; keep serving what we already have
+        return attached
+
+    # The previous generation is released once the last in-flight user drops its reference
+    try:
+        attached = _attached_catalogs[name] = PlannerCatalog.from_buffer(segment.buf, shm=segment)
+    except ValueError as e:
+        # Published by an older layout; the caller republishes
+        logger.warning(f"Ignoring shared planner catalog generation {generation}: {e}")
+        segment.close()
+        return None
+    logger.info(
+        f"Mapped planner catalog generation {generation} ({len(attached)} recipes) from shared memory '{name}'.")
+    return attached
+
+
+def load_planner_catalog():
+    """
+    Entry point used by the meal planner.
+    With settings.PLANNER_SHARED_CATALOG enabled, maps the shared catalog, (re)publishing it
+    first when nothing is published yet or the published one was built from an older
+    CatalogVersion; otherwise builds a private catalog from the database. Catalogs published
+    from a snapshot (load_catalog_snapshot) carry the version it was exported at.
+    """
+    if not getattr(settings, 'PLANNER_SHARED_CATALOG', False):
+        return PlannerCatalog.from_db()
+
+    catalog = None
+    try:
+        current_version = catalog_version_key()
+        catalog = get_shared_catalog()
+        if catalog is None or catalog.catalog_version != current_version:
+            try:
+                publish_catalog()
+            except FileExistsError:
+                # Another worker published the same generation concurrently
+                pass
+            catalog = get_shared_catalog()
+    except OSError as e:
+        logger.warning(f"Shared planner catalog unavailable: {e}")
+    if catalog is None:
+        logger.warning(
+            "Shared planner catalog is enabled but could not be mapped. Falling back to the database.")
+        return PlannerCatalog.from_db()
+    return catalog
@@ -0,0 +1,293 @@
+import logging
+import math
+import mmap
+import struct
+import time
+from array import array
+
+from django.db import transaction
+
+from .catalog import MACROS_PER_RECIPE, MEAL_TYPES, PlannerCatalog, catalog_version_key
+from .models import CatalogVersion, Ingredient, Recipe, RecipeIngredient
+from .search import index_recipes
+
+logger = logging.getLogger(__name__)
+
+
+# --- Snapshot file format ---
+# A snapshot is a single little-endian binary file that can be memory-mapped:
+#   header:         magic, format version, number of sections, creation time (unix seconds),
+#                   catalog version exported (CatalogVersion.version and updated_at in
+#                   microseconds, see catalog_version_key())
+#   section table:  (name, array typecode, byte offset, item count) per section
+#   sections:       raw array data, each starting on an 8-byte boundary
+# Missing numeric values are stored as NaN (floats) or -1 (IDs).
+SNAPSHOT_MAGIC = b'NPSNAP\x00\x00'
+SNAPSHOT_FORMAT_VERSION = 2
+_HEADER = struct.Struct('<8sIIQQQ')
+# Version 1 headers carry no catalog version
+_HEADER_V1 = struct.Struct('<8sIIQ')
+_SECTION = struct.Struct('<16s8sQQ')
+
+# Section names, grouped by table
+RECIPE_SECTIONS = ('recipe_ids', 'recipe_meal', 'recipe_macros',
+                   'recipe_names', 'recipe_name_ix')
+INGREDIENT_SECTIONS = ('ingr_ids', 'ingr_fdc_ids', 'ingr_macros',
+                       'ingr_names', 'ingr_name_ix')
+RECIPE_INGREDIENT_SECTIONS = ('ri_recipe_ids', 'ri_ingr_ids', 'ri_grams')
+
+
+def _nan_if_none(value):
+    return math.nan if value is None else float(value)
+
+
+def _none_if_nan(value):
+    return None if math.isnan(value) else value
+
+
+def _encode_names(names):
+    """
+    Packs strings into one UTF-8 blob plus an offsets array (len(names) + 1 entries).
+    """
+    blob = bytearray()
+    offsets = array('q', [0])
+    for name in names:
+        blob += name.encode('utf-8')
+        offsets.append(len(blob))
+    return array('B', blob), offsets
+
+
+def export_snapshot(path):
+    """
+    Writes recipes, ingredients, RecipeIngredient gram weights and macro vectors to `path`.
+    Returns a dict with the number of rows written per table.
+    """
+    # Read before the rows, like publish_catalog(), so a write landing mid-export leaves the
+    # snapshot looking stale rather than current
+    catalog_version = catalog_version_key()
+    sections = {}
+
+    recipe_rows = list(Recipe.objects.order_by('pk').values_list(
+        'id', 'name', 'meal_type', 'total_calories', 'total_protein_g', 'total_carbs_g', 'total_fat_g'))
+    sections['recipe_ids'] = array('q', (row[0] for row in recipe_rows))
+    sections['recipe_meal'] = array('b', (
+        MEAL_TYPES.index(row[2]) if row[2] in MEAL_TYPES else -1 for row in recipe_rows))
+    recipe_macros = array('d')
+    for row in recipe_rows:
+        recipe_macros.extend(_nan_if_none(value) for value in row[3:7])
+    sections['recipe_macros'] = recipe_macros
+    sections['recipe_names'], sections['recipe_name_ix'] = _encode_names(
+        row[1] for row in recipe_rows)
+
+    ingredient_rows = list(Ingredient.objects.order_by('pk').values_list(
+        'id', 'name', 'fdc_id', 'calories_per_100g', 'protein_per_100g', 'carbs_per_100g', 'fat_per_100g'))
+    sections['ingr_ids'] = array('q', (row[0] for row in ingredient_rows))
+    sections['ingr_fdc_ids'] = array('q', (
+        row[2] if row[2] is not None else -1 for row in ingredient_rows))
+    ingredient_macros = array('d')
+    for row in ingredient_rows:
+        ingredient_macros.extend(_nan_if_none(value) for value in row[3:7])
+    sections['ingr_macros'] = ingredient_macros
+    sections['ingr_names'], sections['ingr_name_ix'] = _encode_names(
+        row[1] for row in ingredient_rows)
+
+    # Gram weights are resolved once here so loaders never need the conversion logic
+    ri_recipe_ids = array('q')
+    ri_ingredient_ids = array('q')
+    ri_grams = array('d')
+    recipe_ingredients = RecipeIngredient.objects.select_related(
+        'recipe', 'ingredient').order_by('pk')
+    for ri in recipe_ingredients.iterator(chunk_size=2000):
+        ri_recipe_ids.append(ri.recipe_id)
+        ri_ingredient_ids.append(ri.ingredient_id)
+        ri_grams.append(_nan_if_none(ri.recipe.get_ingredient_grams(ri)))
+    sections['ri_recipe_ids'] = ri_recipe_ids
+    sections['ri_ingr_ids'] = ri_ingredient_ids
+    sections['ri_grams'] = ri_grams
+
+    _write_sections(path, sections, catalog_version)
+    counts = {
+        'recipes': len(recipe_rows),
+        'ingredients': len(ingredient_rows),
+        'recipe_ingredients': len(ri_grams),
+    }
+    logger.info(f"Exported catalog snapshot to '{path}': {counts}")
+    return counts
+
+
+def _write_sections(path, sections, catalog_version):
+    table_size = _HEADER.size + _SECTION.size * len(sections)
+    offset = table_size
+    table = []
+    payloads = []
+    for name, data in sections.items():
+        payload = data.tobytes()
+        padding = (-len(payload)) % 8
+        table.append(_SECTION.pack(name.encode('ascii'),
+                     data.typecode.encode('ascii'), offset, len(data)))
+        payloads.append(payload + b'\x00' * padding)
+        offset += len(payload) + padding
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION,
+                len(sections), int(time.time()), *catalog_version))
+        for entry in table:
+            f.write(entry)
+        for payload in payloads:
+            f.write(payload)
+
+
+class CatalogSnapshot:
+    """
+    Read-only, memory-mapped view over a snapshot file.
+    Sections are exposed as typed memoryviews; nothing is copied until you ask for it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, format_version, num_sections, self.created_at = _HEADER_V1.unpack_from(view, 0)
+        if magic != SNAPSHOT_MAGIC:
+            view.release()
+            self._mmap.close()
+            raise ValueError(f"'{path}' is not a NutriPlan catalog snapshot.")
+        if format_version not in (1, SNAPSHOT_FORMAT_VERSION):
+            view.release()
+            self._mmap.close()
+            raise ValueError(
+                f"Unsupported snapshot format version {format_version} in '{path}' (expected {SNAPSHOT_FORMAT_VERSION}).")
+        self.format_version = format_version
+        # catalog_version_key() at export time; None for version 1 snapshots
+        self.catalog_version = None
+        header = _HEADER_V1
+        if format_version >= 2:
+            header = _HEADER
+            self.catalog_version = _HEADER.unpack_from(view, 0)[4:]
+
+        self.sections = {}
+        for i in range(num_sections):
+            raw_name, raw_typecode, offset, count = _SECTION.unpack_from(
+                view, header.size + i * _SECTION.size)
+            name = raw_name.rstrip(b'\x00').decode('ascii')
+            typecode = raw_typecode.rstrip(b'\x00').decode('ascii')
+            itemsize = array(typecode).itemsize
+            self.sections[name] = view[offset:offset + count * itemsize].cast(typecode)
+        view.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for section in self.sections.values():
+            section.release()
+        self.sections = {}
+        self._mmap.close()
+
+    def __getitem__(self, name):
+        return self.sections[name]
+
+    def _name_at(self, blob_section, index_section, i):
+        offsets = self.sections[index_section]
+        return bytes(self.sections[blob_section][offsets[i]:offsets[i + 1]]).decode('utf-8')
+
+    def recipe_name(self, i):
+        return self._name_at('recipe_names', 'recipe_name_ix', i)
+
+    def ingredient_name(self, i):
+        return self._name_at('ingr_names', 'ingr_name_ix', i)
+
+    @property
+    def counts(self):
+        return {
+            'recipes': len(self.sections['recipe_ids']),
+            'ingredients': len(self.sections['ingr_ids']),
+            'recipe_ingredients': len(self.sections['ri_grams']),
+        }
+
+    def to_planner_catalog(self, generation=0):
+        """
+        Buckets recipes with calculated nutrition by meal type, matching PlannerCatalog.from_db().
+        The catalog is tagged with the snapshot's catalog version, so load_planner_catalog() keeps
+        serving it for as long as the database hasn't changed since the export.
+        """
+        ids_by_meal_type = {meal_type: array('q') for meal_type in MEAL_TYPES}
+        macros_by_meal_type = {meal_type: array('d') for meal_type in MEAL_TYPES}
+        recipe_ids = self.sections['recipe_ids']
+        recipe_meal = self.sections['recipe_meal']
+        recipe_macros = self.sections['recipe_macros']
+        for i, recipe_id in enumerate(recipe_ids):
+            base = i * MACROS_PER_RECIPE
+            macros = recipe_macros[base:base + MACROS_PER_RECIPE]
+            if recipe_meal[i] < 0 or math.isnan(macros[0]):
+                continue
+            meal_type = MEAL_TYPES[recipe_meal[i]]
+            ids_by_meal_type[meal_type].append(recipe_id)
+            macros_by_meal_type[meal_type].extend(
+                0.0 if math.isnan(value) else value for value in macros)
+        return PlannerCatalog(ids_by_meal_type, macros_by_meal_type, generation=generation,
+                              catalog_version=self.catalog_version)
+
+    def restore_to_db(self, batch_size=2000):
+        """
+        Recreates the snapshot's ingredients, recipes and RecipeIngredients (as gram quantities)
+        in the database, keeping primary keys. Intended for empty benchmark/test databases.
+        """
+        ingredient_macros = self.sections['ingr_macros']
+        fdc_ids = self.sections['ingr_fdc_ids']
+        ingredients = []
+        for i, ingredient_id in enumerate(self.sections['ingr_ids']):
+            base = i * MACROS_PER_RECIPE
+            ingredients.append(Ingredient(
+                id=ingredient_id,
+                name=self.ingredient_name(i),
+                fdc_id=fdc_ids[i] if fdc_ids[i] >= 0 else None,
+                calories_per_100g=_none_if_nan(ingredient_macros[base]),
+                protein_per_100g=_none_if_nan(ingredient_macros[base + 1]),
+                carbs_per_100g=_none_if_nan(ingredient_macros[base + 2]),
+                fat_per_100g=_none_if_nan(ingredient_macros[base + 3]),
+            ))
+
+        recipe_macros = self.sections['recipe_macros']
+        recipe_meal = self.sections['recipe_meal']
+        recipes = []
+        for i, recipe_id in enumerate(self.sections['recipe_ids']):
+            base = i * MACROS_PER_RECIPE
+            recipes.append(Recipe(
+                id=recipe_id,
+                name=self.recipe_name(i),
+                instructions='',
+                meal_type=MEAL_TYPES[recipe_meal[i]] if recipe_meal[i] >= 0 else '',
+                total_calories=_none_if_nan(recipe_macros[base]),
+                total_protein_g=_none_if_nan(recipe_macros[base + 1]),
+                total_carbs_g=_none_if_nan(recipe_macros[base + 2]),
+                total_fat_g=_none_if_nan(recipe_macros[base + 3]),
+            ))
+
+        ri_recipe_ids = self.sections['ri_recipe_ids']
+        ri_ingredient_ids = self.sections['ri_ingr_ids']
+        recipe_ingredients = [
+            RecipeIngredient(recipe_id=ri_recipe_ids[i], ingredient_id=ri_ingredient_ids[i],
+                             quantity=grams, unit='g')
+            for i, grams in enumerate(self.sections['ri_grams'])
+            if not math.isnan(grams)
+        ]
+
+        with transaction.atomic():
+            Ingredient.objects.bulk_create(ingredients, batch_size=batch_size)
+            Recipe.objects.bulk_create(recipes, batch_size=batch_size)
+            RecipeIngredient.objects.bulk_create(
+                recipe_ingredients, batch_size=batch_size)
+            # bulk_create() bypasses the signals that normally bump the catalog version
+            # and keep the search index in sync
+            CatalogVersion.bump()
+            index_recipes(recipe.id for recipe in recipes)
+        return {
+            'recipes': len(recipes),
+            'ingredients': len(ingredients),
+            'recipe_ingredients': len(recipe_ingredients),
+        }
@@ -0,0 +1,135 @@
+import logging
+import time
+
+from .conversions import METHOD_DENSITY, METHOD_ZERO_QUANTITY, unit_grams
+from .models import Ingredient, Recipe, RecipeIngredient
+
+logger = logging.getLogger(__name__)
+
+
+# --- Conversion audit ---
+# Runs every RecipeIngredient through the batch conversion path (api/conversions.py) and groups
+# the problems by (ingredient, unit) instead of logging them row by row the way
+# Recipe.get_ingredient_grams() does. Recipes are walked by primary key in fixed-size chunks,
+# with their lines loaded as tuples, so a recipe's lines are always seen together and memory is
+# bounded by the chunk plus one entry per distinct (ingredient, unit) pair, never by row count.
+AUDIT_CHUNK_SIZE = 2000
+# Recipe IDs kept per group as examples to look at
+AUDIT_SAMPLE_SIZE = 5
+
+ISSUE_UNCONVERTIBLE = 'unconvertible'
+ISSUE_DENSITY_FALLBACK = 'density_fallback'
+ISSUE_ZERO_QUANTITY = 'zero_quantity'
+ISSUES = (ISSUE_UNCONVERTIBLE, ISSUE_DENSITY_FALLBACK, ISSUE_ZERO_QUANTITY)
+
+AUDIT_INGREDIENT_COLUMNS = ('id', 'name', 'fdc_id', 'usda_food_portions')
+
+
+def _recipe_id_chunks(chunk_size):
+    """
+    Yields (first_id, last_id, count) for `chunk_size` recipes at a time, in pk order.
+    """
+    last_id = 0
+    while True:
+        ids = list(Recipe.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return
+        yield ids[0], ids[-1], len(ids)
+        last_id = ids[-1]
+
+
+def audit_conversions(chunk_size=AUDIT_CHUNK_SIZE, progress=None):
+    """
+    Returns {'summary': {...}, ISSUE: [group, ...] for each of ISSUES}. A group is
+    {'ingredient_id', 'ingredient_name', 'fdc_id', 'unit', 'lines', 'sample_recipe_ids'} (plus
+    'density' for density fallbacks), sorted by line count. Each recipe lists an ingredient once,
+    so a group's line count is also the number of recipes it affects.
+    Calls progress(summary) after each chunk.
+    """
+    start = time.perf_counter()
+    conversions = {}  # (ingredient_id, unit) -> (grams per unit, method)
+    groups = {issue: {} for issue in ISSUES}  # issue -> (ingredient_id, unit) -> group
+    summary = {
+        'recipes': 0,
+        'lines': 0,
+        'lines_by_method': {},
+        'recipes_with_unconvertible': 0,
+        'recipes_with_density_fallback': 0,
+        'recipes_with_zero_quantity': 0,
+        'seconds': 0.0,
+    }
+    names = {}  # ingredient_id -> (name, fdc_id), for ingredients that appear in a group
+
+    by_method = summary['lines_by_method']
+    for first_id, last_id, recipe_count in _recipe_id_chunks(chunk_size):
+        lines = list(RecipeIngredient.objects.filter(
+            recipe_id__gte=first_id, recipe_id__lte=last_id).order_by('recipe_id').values_list(
+            'recipe_id', 'ingredient_id', 'quantity', 'unit'))
+
+        # Resolve the (ingredient, unit) pairs this chunk sees for the first time
+        unseen = {(ingredient_id, unit) for _, ingredient_id, quantity, unit in lines
+                  if quantity > 0 and (ingredient_id, unit) not in conversions}
+        if unseen:
+            ingredients = Ingredient.objects.only(*AUDIT_INGREDIENT_COLUMNS).in_bulk(
+                {ingredient_id for ingredient_id, _ in unseen})
+            for ingredient_id, unit in unseen:
+                ingredient = ingredients[ingredient_id]
+                conversions[ingredient_id, unit] = unit_grams(ingredient, unit)
+                if conversions[ingredient_id, unit][1] in (None, METHOD_DENSITY):
+                    names[ingredient_id] = (ingredient.name, ingredient.fdc_id)
+
+        flagged = {issue: set() for issue in ISSUES}
+        for recipe_id, ingredient_id, quantity, unit in lines:
+            if quantity <= 0:
+                method = METHOD_ZERO_QUANTITY
+                issue = ISSUE_ZERO_QUANTITY
+            else:
+                grams_per_unit, method = conversions[ingredient_id, unit]
+                issue = (ISSUE_UNCONVERTIBLE if method is None
+                         else ISSUE_DENSITY_FALLBACK if method == METHOD_DENSITY else None)
+            method = method or ISSUE_UNCONVERTIBLE
+            by_method[method] = by_method.get(method, 0) + 1
+            if issue is None:
+                continue
+
+            flagged[issue].add(recipe_id)
+            group = groups[issue].get((ingredient_id, unit))
+            if group is None:
+                group = groups[issue][ingredient_id, unit] = {
+                    'ingredient_id': ingredient_id, 'unit': unit, 'lines': 0, 'sample_recipe_ids': []}
+                if issue == ISSUE_DENSITY_FALLBACK:
+                    group['density'] = grams_per_unit
+                if issue == ISSUE_ZERO_QUANTITY and ingredient_id not in names:
+                    names[ingredient_id] = None  # looked up once the scan is done
+            group['lines'] += 1
+            if len(group['sample_recipe_ids']) < AUDIT_SAMPLE_SIZE:
+                group['sample_recipe_ids'].append(recipe_id)
+
+        summary['recipes'] += recipe_count
+        summary['lines'] += len(lines)
+        summary['recipes_with_unconvertible'] += len(flagged[ISSUE_UNCONVERTIBLE])
+        summary['recipes_with_density_fallback'] += len(flagged[ISSUE_DENSITY_FALLBACK])
+        summary['recipes_with_zero_quantity'] += len(flagged[ISSUE_ZERO_QUANTITY])
+        summary['seconds'] = time.perf_counter() - start
+        if progress is not None:
+            progress(summary)
+
+    # Names for ingredients only seen on zero-quantity lines
+    unnamed = [ingredient_id for ingredient_id, name in names.items() if name is None]
+    for start_index in range(0, len(unnamed), AUDIT_CHUNK_SIZE):
+        batch = unnamed[start_index:start_index + AUDIT_CHUNK_SIZE]
+        names.update((ingredient_id, (name, fdc_id)) for ingredient_id, name, fdc_id in
+                     Ingredient.objects.filter(pk__in=batch).values_list('id', 'name', 'fdc_id'))
+
+    report = {'summary': summary}
+    for issue in ISSUES:
+        rows = sorted(groups[issue].values(), key=lambda group: (-group['lines'], group['ingredient_id'], group['unit']))
+        for group in rows:
+            group['ingredient_name'], group['fdc_id'] = names.get(group['ingredient_id']) or ('', None)
+        report[issue] = rows
+    summary['seconds'] = round(time.perf_counter() - start, 3)
+    logger.info(
+        f"Audited {summary['lines']} ingredient lines in {summary['recipes']} recipes: "
+        f"{len(report[ISSUE_UNCONVERTIBLE])} unconvertible (ingredient, unit) pairs, "
+        f"{summary['recipes_with_unconvertible']} recipes affected.")
+    return report
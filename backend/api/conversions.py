@@ -0,0 +1,138 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# --- Batch unit conversion ---
+# The rules of Recipe.get_ingredient_grams(), without its per-row logging, for code that
+# converts many lines at once (bulk imports, audits). The grams a unit is worth depend only on
+# the ingredient and the unit, never the quantity, so each (ingredient, unit) pair is resolved
+# once and reused for every line that repeats it.
+DIRECT_WEIGHT_UNITS = {
+    'g': 1.0, 'gram': 1.0, 'grams': 1.0,
+    'kg': 1000.0, 'kilogram': 1000.0, 'kilograms': 1000.0,
+    'oz': 28.349523125, 'ounce': 28.349523125, 'ounces': 28.349523125,
+    'lb': 453.59237, 'pound': 453.59237, 'pounds': 453.59237,
+}
+PIECE_LIKE_UNITS = ('piece', 'slice', 'each', 'item', 'serving', 'unit', 'container')
+MILLILITER_UNITS = ('ml', 'milliliter', 'milliliters')
+WATER_DENSITY = 1.0
+OIL_DENSITY = 0.92
+
+# How a line was converted
+METHOD_DIRECT = 'direct'
+METHOD_PORTION = 'portion'
+METHOD_DENSITY = 'density'
+METHOD_ZERO_QUANTITY = 'zero_quantity'
+
+
+def _portion_units(portion):
+    """
+    The unit spellings a USDA portion answers to, and the unit named by its modifier.
+    """
+    measure_unit = portion.get('measureUnit') or {}
+    unit_name = (measure_unit.get('name') or '').lower().strip()
+    unit_abbreviation = (measure_unit.get('abbreviation') or '').lower().strip()
+    modifier = (portion.get('modifier') or '').lower().strip()
+
+    units = set()
+    for unit in (unit_name, unit_abbreviation):
+        if unit and unit != 'undetermined':
+            units.update((unit, unit + 's'))
+
+    modifier_unit = ''
+    if modifier:
+        modifier_unit = modifier.split('(')[0].strip().split(',')[0].strip()
+        if modifier_unit:
+            units.update((modifier_unit, modifier_unit + 's'))
+        if modifier_unit in ('tbsp', 'tbs', 'tablespoon'):
+            units.update(('tablespoon', 'tbsp', 'tbs'))
+        elif modifier_unit in ('tsp', 'teaspoon'):
+            units.update(('teaspoon', 'tsp'))
+        elif modifier_unit in ('cup', 'cups'):
+            units.update(('cup', 'cups'))
+        elif modifier_unit in ('fl oz', 'floz', 'fluid ounce'):
+            units.update(('fluid ounce', 'fl oz', 'floz'))
+    return units, unit_name, modifier_unit
+
+
+def unit_grams(ingredient, unit):
+    """
+    Returns (grams per one `unit` of `ingredient`, method), or (None, None) when the unit
+    can't be converted. Same precedence as Recipe.get_ingredient_grams(): direct weight
+    units, then USDA portions in order, then a density fallback for milliliters.
+    """
+    unit = unit.lower().strip()
+    if unit in DIRECT_WEIGHT_UNITS:
+        return DIRECT_WEIGHT_UNITS[unit], METHOD_DIRECT
+
+    name_head = ingredient.name.lower().split(',')[0].strip()
+    for portion in ingredient.usda_food_portions or ():
+        units, unit_name, modifier_unit = _portion_units(portion)
+        matched = unit in units
+        if not matched and unit in PIECE_LIKE_UNITS:
+            describes_piece = (unit == modifier_unit or unit in unit_name
+                               or name_head in unit_name or name_head in modifier_unit)
+            matched = describes_piece and portion.get('amount', 0) == 1
+        if matched and portion.get('gramWeight') is not None:
+            amount = float(portion.get('amount') or 1.0)
+            return float(portion['gramWeight']) / amount, METHOD_PORTION
+
+    if unit in MILLILITER_UNITS:
+        return (OIL_DENSITY if 'oil' in ingredient.name.lower() else WATER_DENSITY), METHOD_DENSITY
+    return None, None
+
+
+class ConversionTable:
+    """
+    Memoized unit_grams() per (ingredient ID, unit), for converting many lines.
+    """
+
+    def __init__(self):
+        self._grams = {}
+
+    def __len__(self):
+        return len(self._grams)
+
+    def unit_grams(self, ingredient, unit):
+        key = (ingredient.pk, unit)
+        try:
+            return self._grams[key]
+        except KeyError:
+            result = self._grams[key] = unit_grams(ingredient, unit)
+            return result
+
+    def grams(self, ingredient, quantity, unit):
+        """
+        (grams, method) for one line; (0.0, METHOD_ZERO_QUANTITY) for non-positive quantities
+        and (None, None) when unconvertible, as get_ingredient_grams() returns.
+        """
+        if quantity <= 0:
+            return 0.0, METHOD_ZERO_QUANTITY
+        grams_per_unit, method = self.unit_grams(ingredient, unit)
+        if grams_per_unit is None:
+            return None, None
+        return float(quantity) * grams_per_unit, method
+
+    def nutrition(self, lines):
+        """
+        Recipe totals from (ingredient, quantity, unit) lines, rounded the way
+        Recipe.calculate_nutrition() stores them. Unconvertible lines are left out of the
+        totals, as there. Returns ({'calories', 'protein', 'fat', 'carbs'}, unconvertible count).
+        """
+        calories = protein = fat = carbs = 0.0
+        unconvertible = 0
+        for ingredient, quantity, unit in lines:
+            grams, _ = self.grams(ingredient, quantity, unit)
+            if grams is None:
+                unconvertible += 1
+                continue
+            if not grams:
+                continue
+            calories += ((ingredient.calories_per_100g or 0.0) / 100.0) * grams
+            protein += ((ingredient.protein_per_100g or 0.0) / 100.0) * grams
+            fat += ((ingredient.fat_per_100g or 0.0) / 100.0) * grams
+            carbs += ((ingredient.carbs_per_100g or 0.0) / 100.0) * grams
+        totals = {'calories': round(calories, 2), 'protein': round(protein, 2),
+                  'fat': round(fat, 2), 'carbs': round(carbs, 2)}
+        return totals, unconvertible
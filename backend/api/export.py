@@ -0,0 +1,60 @@
+import logging
+
+from .models import Recipe, RecipeIngredient
+from .renderers import dumps_json
+from .serializers import INGREDIENT_SUMMARY_COLUMNS, RecipeSerializer
+
+logger = logging.getLogger(__name__)
+
+
+# --- NDJSON catalog export ---
+# Walks the catalog by primary key in fixed-size chunks (keyset pagination), loading each
+# chunk's recipes and ingredient lines as plain tuples, so memory stays constant however
+# large the catalog is. Each line has the same shape as the recipe detail endpoint.
+EXPORT_CHUNK_SIZE = 1000
+
+RECIPE_COLUMNS = [field for field in RecipeSerializer.Meta.fields if field != 'ingredient_details']
+INGREDIENT_COLUMNS = list(INGREDIENT_SUMMARY_COLUMNS)
+
+
+def iter_recipe_chunks(chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields lists of recipe dicts (RecipeSerializer shape), `chunk_size` recipes at a time,
+    using two queries per chunk.
+    """
+    last_id = 0
+    while True:
+        rows = list(Recipe.objects.filter(pk__gt=last_id).order_by('pk').values_list(
+            *RECIPE_COLUMNS)[:chunk_size])
+        if not rows:
+            return
+        last_id = rows[-1][0]
+
+        recipes = {}
+        for row in rows:
+            recipe = dict(zip(RECIPE_COLUMNS, row))
+            recipe['ingredient_details'] = []
+            recipes[row[0]] = recipe
+
+        lines = RecipeIngredient.objects.filter(recipe_id__in=recipes).order_by('pk').values_list(
+            'recipe_id', 'id', 'quantity', 'unit',
+            *[f'ingredient__{column}' for column in INGREDIENT_COLUMNS])
+        for recipe_id, line_id, quantity, unit, *ingredient in lines:
+            recipes[recipe_id]['ingredient_details'].append({
+                'id': line_id,
+                'ingredient': dict(zip(INGREDIENT_COLUMNS, ingredient)),
+                'quantity': quantity,
+                'unit': unit,
+            })
+        yield list(recipes.values())
+
+
+def iter_recipe_ndjson(chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields one bytes block of newline-delimited JSON per chunk of recipes.
+    """
+    exported = 0
+    for chunk in iter_recipe_chunks(chunk_size):
+        exported += len(chunk)
+        yield b''.join(dumps_json(recipe) + b'\n' for recipe in chunk)
+    logger.info(f"Exported {exported} recipes as NDJSON.")
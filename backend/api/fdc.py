@@ -0,0 +1,430 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import date, datetime
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from django.db import transaction
+from requests.adapters import HTTPAdapter
+
+from .models import CatalogVersion, Ingredient, RecipeIngredient, touch_recipes_using_ingredients
+from .nutrients import default_parser
+
+logger = logging.getLogger(__name__)
+
+
+# --- USDA FoodData Central API ---
+API_BASE_URL = "https://api.nal.usda.gov/fdc/v1/"
+
+# api.data.gov keys allow 1,000 requests per rolling hour. The token bucket below refills at
+# (quota - burst) per hour, so even a full burst followed by a steady stream stays within it.
+USDA_HOURLY_QUOTA = 1000
+DEFAULT_BURST = 50
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# The `foods` endpoint accepts at most 20 FDC IDs per request, `foods/list` 200 foods per page
+MAX_IDS_PER_REQUEST = 20
+LIST_PAGE_SIZE = 200
+
+
+class FDCError(Exception):
+    """
+    A food could not be fetched: a non-retryable HTTP status, or retries ran out.
+    """
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, at most `capacity` banked.
+    acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_hourly_quota(cls, quota=USDA_HOURLY_QUOTA, burst=DEFAULT_BURST):
+        burst = min(burst, quota)
+        return cls(rate=max(quota - burst, 1) / 3600.0, capacity=burst)
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            self._sleep(delay)
+
+
+class FDCClient:
+    """
+    FoodData Central client over one pooled keep-alive session. Every HTTP attempt takes a
+    token from the rate limiter; 429 and 5xx responses are retried with exponential backoff
+    (honouring Retry-After when the server sends it).
+    """
+
+    def __init__(self, api_key, base_url=API_BASE_URL, rate_limiter=None, pool_size=DEFAULT_WORKERS,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff_seconds=DEFAULT_BACKOFF_SECONDS,
+                 timeout=30, sleep=time.sleep):
+        self.api_key = api_key
+        self.base_url = base_url if base_url.endswith('/') else base_url + '/'
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout = timeout
+        self._sleep = sleep
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.requests_made = 0
+        self._count_lock = threading.Lock()
+
+    def close(self):
+        self.session.close()
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), MAX_BACKOFF_SECONDS)
+        return min(self.backoff_seconds * (2 ** attempt), MAX_BACKOFF_SECONDS)
+
+    def request(self, method, path, **kwargs):
+        """
+        Returns the decoded JSON body, or raises FDCError.
+        """
+        params = {'api_key': self.api_key, **kwargs.pop('params', {})}
+        url = self.base_url + path
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            with self._count_lock:
+                self.requests_made += 1
+            try:
+                response = self.session.request(
+                    method, url, params=params, timeout=self.timeout, **kwargs)
+            except requests.exceptions.RequestException as e:
+                if attempt == self.max_retries:
+                    raise FDCError(f"Request to {path} failed: {e}")
+                delay = self._backoff(attempt)
+                logger.warning(f"Request to {path} failed ({e}); retrying in {delay:.1f}s.")
+                self._sleep(delay)
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                delay = self._backoff(attempt, response)
+                logger.warning(
+                    f"HTTP {response.status_code} from {path}; retrying in {delay:.1f}s "
+                    f"(attempt {attempt + 1}/{self.max_retries}).")
+                self._sleep(delay)
+                continue
+            if response.status_code >= 400:
+                raise FDCError(
+                    f"HTTP {response.status_code} from {path}: {response.text[:200]}", response.status_code)
+            try:
+                return response.json()
+            except ValueError:
+                # Gateways and maintenance pages answer 200 with HTML; retried like a 5xx
+                if attempt == self.max_retries:
+                    raise FDCError(
+                        f"Invalid JSON from {path}: {response.text[:200]}", response.status_code)
+                delay = self._backoff(attempt, response)
+                logger.warning(
+                    f"Invalid JSON from {path}; retrying in {delay:.1f}s "
+                    f"(attempt {attempt + 1}/{self.max_retries}).")
+                self._sleep(delay)
+
+    def get_food(self, fdc_id):
+        return self.request('GET', f"food/{fdc_id}", params={'format': 'full'})
+
+    def get_foods(self, fdc_ids):
+        """
+        Full payloads for up to MAX_IDS_PER_REQUEST foods in one request.
+        IDs the API doesn't know are simply absent from the returned list.
+        """
+        if len(fdc_ids) > MAX_IDS_PER_REQUEST:
+            raise ValueError(f"At most {MAX_IDS_PER_REQUEST} FDC IDs per request.")
+        return self.request('POST', 'foods', json={'fdcIds': list(fdc_ids), 'format': 'full'})
+
+    def list_foods(self, data_types, page_number, page_size=LIST_PAGE_SIZE):
+        """
+        One page (1-based) of abridged foods of the given data types, ordered by FDC ID.
+        """
+        return self.request('POST', 'foods/list', json={
+            'dataType': list(data_types), 'pageSize': page_size, 'pageNumber': page_number,
+            'sortBy': 'fdcId', 'sortOrder': 'asc'})
+
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def fetch_foods(client, fdc_ids, workers=DEFAULT_WORKERS):
+    """
+    Fetches foods one per request, with at most `workers` requests in flight.
+    Yields (fdc_id, food_data, error) as responses arrive; exactly one of food_data/error is None.
+    """
+    yield from _fetch_concurrently(client.get_food, fdc_ids, workers)
+
+
+def fetch_food_batches(client, fdc_ids, batch_size=MAX_IDS_PER_REQUEST, workers=DEFAULT_WORKERS):
+    """
+    Fetches foods `batch_size` IDs per request through the `foods` endpoint.
+    Yields (batch_ids, foods, error) per request; exactly one of foods/error is None.
+    """
+    batches = (tuple(batch) for batch in chunked(fdc_ids, batch_size))
+    yield from _fetch_concurrently(client.get_foods, batches, workers)
+
+
+def iter_listed_versions(client, data_types, page_size=LIST_PAGE_SIZE):
+    """
+    Pages through `foods/list` and yields (fdc_id, publication_date, modified_date) for every
+    food of the given data types, with dates parsed by parse_fdc_date().
+    """
+    page_number = 1
+    while True:
+        foods = client.list_foods(data_types, page_number, page_size)
+        for food in foods:
+            yield (food['fdcId'], parse_fdc_date(food.get('publicationDate')),
+                   parse_fdc_date(food.get('modifiedDate')))
+        if len(foods) < page_size:
+            return
+        page_number += 1
+
+
+def _fetch_concurrently(fetch, items, workers):
+    """
+    Runs fetch(item) on a thread pool with at most `workers` calls in flight, submitting new items
+    as earlier ones finish, so memory stays bounded for long ID lists.
+    Yields (item, result, error) as calls complete; error is always an FDCError, so one
+    unexpected failure costs its item rather than the whole run.
+    """
+    remaining = iter(items)
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fdc-fetch') as executor:
+        def submit_next():
+            item = next(remaining, None)
+            if item is not None:
+                pending[executor.submit(fetch, item)] = item
+
+        for _ in range(workers * 2):
+            submit_next()
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    submit_next()
+                    try:
+                        result, error = future.result(), None
+                    except FDCError as e:
+                        result, error = None, e
+                    except Exception as e:
+                        logger.exception(f"Unexpected error fetching {item}.")
+                        result, error = None, FDCError(f"Unexpected error fetching {item}: {e!r}")
+                    yield item, result, error
+        finally:
+            # On early exit (e.g. Ctrl-C) don't start the queued requests
+            for future in pending:
+                future.cancel()
+
+
+# --- Parsing ---
+def parse_fdc_date(value):
+    """
+    FDC dates come as '4/1/2019' from the API and '2019-04-01' from the bulk downloads.
+    """
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    for date_format in ('%m/%d/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value[:10], date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def content_hash(fields):
+    """
+    SHA-256 of the values parse_food() derived (name, nutrients, portions; not the FDC version
+    metadata), so a food whose stored values wouldn't change can skip the write, while a parser
+    change still rewrites everything.
+    """
+    payload = {field: value for field, value in fields.items() if not field.startswith('fdc_')}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def parse_food(data, fallback_name='', parser=default_parser):
+    """
+    Maps a full FDC food payload to Ingredient field values.
+    Returns None when one of the parser's required nutrients (protein, fat, carbs) is missing.
+    """
+    nutrient_values, missing = parser.parse(data.get('foodNutrients') or ())
+    if missing:
+        logger.warning(
+            f"Core nutrient '{missing[0]}' not found for {fallback_name or data.get('description')} "
+            f"(FDC ID: {data.get('fdcId')}).")
+        return None
+
+    fields = {
+        'name': (data.get('description') or fallback_name).strip(),
+        **nutrient_values,
+        'usda_food_portions': data.get('foodPortions', []),
+        'fdc_data_type': data.get('dataType') or '',
+        'fdc_publication_date': parse_fdc_date(data.get('publicationDate')),
+        'fdc_modified_date': parse_fdc_date(data.get('modifiedDate')),
+    }
+    fields['fdc_content_hash'] = content_hash(fields)
+    return fields
+
+
+# --- Storage ---
+INGREDIENT_FIELDS = ('name', 'calories_per_100g', 'protein_per_100g', 'fat_per_100g',
+                     'carbs_per_100g', 'usda_food_portions', 'fdc_data_type', 'fdc_publication_date',
+                     'fdc_modified_date', 'fdc_content_hash')
+FDC_VERSION_FIELDS = ('fdc_data_type', 'fdc_publication_date', 'fdc_modified_date')
+WRITE_BATCH_SIZE = 500
+
+
+def upsert_ingredients(fields_by_fdc_id):
+    """
+    Creates or updates one Ingredient per FDC ID from parse_food() output, in one transaction:
+    a SELECT of the rows that already exist (so the counts are exact) and one
+    INSERT ... ON CONFLICT (fdc_id) DO UPDATE for rows whose content hash changed.
+    Returns (created, updated, unchanged) Ingredient lists; unchanged rows only get their FDC
+    version metadata refreshed, without touching updated_at.
+    Bulk writes bypass the model signals, so the catalog version, the updated_at of recipes using
+    changed ingredients, the recipe search index, the autocomplete index and the ingredient
+    matcher are updated here.
+    """
+    if not fields_by_fdc_id:
+        return [], [], []
+    ingredients = [Ingredient(fdc_id=fdc_id, **fields) for fdc_id, fields in fields_by_fdc_id.items()]
+    created, updated, unchanged, renamed, restamped = [], [], [], [], []
+    with transaction.atomic():
+        existing = {
+            row[1]: row for row in Ingredient.objects.filter(fdc_id__in=list(fields_by_fdc_id)).values_list(
+                'id', 'fdc_id', 'name', 'fdc_content_hash', *FDC_VERSION_FIELDS)
+        }
+        for ingredient in ingredients:
+            row = existing.get(ingredient.fdc_id)
+            if row is None:
+                created.append(ingredient)
+                continue
+            # Not every backend returns primary keys for conflicting rows
+            ingredient.pk, _, old_name, old_hash, *old_version = row
+            if old_hash == ingredient.fdc_content_hash:
+                unchanged.append(ingredient)
+                if old_version != [getattr(ingredient, field) for field in FDC_VERSION_FIELDS]:
+                    restamped.append(ingredient)
+                continue
+            updated.append(ingredient)
+            if ingredient.name != old_name:
+                renamed.append(ingredient)
+
+        if created or updated:
+            written = created + updated
+            Ingredient.objects.bulk_create(
+                written, update_conflicts=True, unique_fields=['fdc_id'],
+                update_fields=[*INGREDIENT_FIELDS, 'updated_at'])
+            CatalogVersion.bump()
+            if updated:
+                touch_recipes_using_ingredients([ingredient.pk for ingredient in updated])
+        if restamped:
+            Ingredient.objects.bulk_update(restamped, FDC_VERSION_FIELDS)
+
+        if renamed:
+            from .search import index_recipes
+            index_recipes(RecipeIngredient.objects.filter(
+                ingredient_id__in=[ingredient.pk for ingredient in renamed]
+            ).values_list('recipe_id', flat=True).distinct())
+
+        # Deferred to the outermost commit, so a rolled-back import leaves them untouched
+        indexed = [(ingredient.pk, ingredient.name, ingredient.fdc_id)
+                   for ingredient in created + renamed if ingredient.pk is not None]
+        transaction.on_commit(lambda: _add_to_ingredient_indexes(indexed))
+    return created, updated, unchanged
+
+
+def _add_to_ingredient_indexes(entries):
+    from .autocomplete import loaded_ingredient_index
+    from .ingredient_lines import loaded_ingredient_matcher
+    index = loaded_ingredient_index()
+    matcher = loaded_ingredient_matcher()
+    for pk, name, fdc_id in entries:
+        if index is not None:
+            index.add(pk, name, fdc_id)
+        if matcher is not None:
+            matcher.add(pk, name)
+
+
+class IngredientWriter:
+    """
+    Accumulates parsed foods and upserts them `batch_size` at a time, one transaction per chunk.
+    `created`, `updated` and `unchanged` count rows across chunks; on_flush(created, updated,
+    unchanged) gets each chunk's Ingredient lists.
+
+        with IngredientWriter() as writer:
+            writer.add(fdc_id, parse_food(data))
+    """
+
+    def __init__(self, batch_size=WRITE_BATCH_SIZE, on_flush=None):
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self._pending = {}
+
+    def add(self, fdc_id, fields):
+        self._pending[fdc_id] = fields
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        created, updated, unchanged = upsert_ingredients(pending)
+        self.created += len(created)
+        self.updated += len(updated)
+        self.unchanged += len(unchanged)
+        if self.on_flush is not None:
+            self.on_flush(created, updated, unchanged)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Foods parsed before an error (or Ctrl-C) are still written; a chunk whose own write
+        # failed was rolled back and isn't retried
+        self.flush()
@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# --- On-disk FDC response cache ---
+# One file per food, <fdc_id>.json, holding the raw full-format payload and the version it was
+# fetched at: the food's publicationDate, or modifiedDate for branded foods. (Responses from the
+# multi-food endpoint cover many foods, so there is no per-food ETag to key on.) Entries are
+# written atomically, so an interrupted run never leaves a truncated payload behind.
+def food_version(food):
+    """
+    The version stamp FDC gives a food; changes whenever USDA republishes it.
+    """
+    return food.get('modifiedDate') or food.get('publicationDate')
+
+
+class FDCResponseCache:
+    def __init__(self, directory):
+        self.directory = str(directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, fdc_id):
+        return os.path.join(self.directory, f"{int(fdc_id)}.json")
+
+    def get_entry(self, fdc_id):
+        """
+        {'fdcId', 'version', 'fetched_at', 'food'} or None.
+        """
+        try:
+            with open(self._path(fdc_id), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache entry for FDC ID {fdc_id}: {e}")
+            return None
+
+    def get(self, fdc_id, version=None):
+        """
+        The cached payload, or None when missing or not at `version` (when given).
+        """
+        entry = self.get_entry(fdc_id)
+        if entry is None or (version is not None and entry.get('version') != version):
+            return None
+        return entry['food']
+
+    def put(self, food):
+        fdc_id = food['fdcId']
+        entry = {'fdcId': fdc_id, 'version': food_version(food), 'fetched_at': time.time(), 'food': food}
+        path = self._path(fdc_id)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, separators=(',', ':'))
+        os.replace(temp_path, path)
+
+    def __contains__(self, fdc_id):
+        return os.path.exists(self._path(fdc_id))
+
+
+# --- Checkpoint journal ---
+# An append-only file of FDC IDs whose ingredients have been committed to the database, one per
+# line. Lines are appended and fsynced after each write transaction, so after a crash the
+# journal never lists an ID that isn't stored; a torn last line is cut off on load.
+class IngestionJournal:
+    def __init__(self, path):
+        self.path = str(path)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.completed = set()
+        if os.path.exists(self.path):
+            with open(self.path, 'rb+') as f:
+                content = f.read()
+                complete = content[:content.rfind(b'\n') + 1]
+                if len(complete) != len(content):
+                    f.truncate(len(complete))
+            self.completed.update(int(line) for line in complete.split() if line.isdigit())
+
+    def __contains__(self, fdc_id):
+        return fdc_id in self.completed
+
+    def __len__(self):
+        return len(self.completed)
+
+    def mark_completed(self, fdc_ids):
+        new_ids = [fdc_id for fdc_id in fdc_ids if fdc_id not in self.completed]
+        if not new_ids:
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(f"{fdc_id}\n" for fdc_id in new_ids))
+            f.flush()
+            os.fsync(f.fileno())
+        self.completed.update(new_ids)
+
+    def clear(self):
+        """
+        Forgets all progress; called when a run finishes cleanly or is restarted.
+        """
+        self.completed.clear()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,283 @@
+import csv
+import io
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import time
+import zipfile
+from contextlib import contextmanager
+
+from .fdc import IngredientWriter, parse_food
+from .nutrients import default_parser
+
+logger = logging.getLogger(__name__)
+
+
+# --- FoodData Central bulk downloads ---
+# The datasets at fdc.nal.usda.gov/download-datasets come in two shapes:
+#   JSON: one object per dataset, e.g. {"SRLegacyFoods": [food, food, ...]}, each food in the
+#         same full format as the API's food/<fdc_id>. Foods are decoded one at a time from
+#         buffered reads, so memory is bounded by the largest single food, not the file.
+#   CSV:  a directory of tables (food.csv, food_nutrient.csv, food_portion.csv,
+#         measure_unit.csv). Only the nutrients in nutrients.NUTRIENT_MAP are kept from
+#         food_nutrient.csv, the multi-GB table. Kept nutrients and portions are staged in a
+#         temporary SQLite database indexed on fdc_id (the tables aren't guaranteed to be
+#         sorted), and foods are rebuilt from it one at a time in the API shape, so
+#         parse_food() handles both and memory doesn't grow with the dump.
+# Either may be given as the downloaded .zip; members are streamed without extracting.
+DUMP_READ_SIZE = 1 << 20
+DUMP_BATCH_SIZE = 2000
+# A "food" larger than this means the file isn't an FDC dump (or is corrupt)
+MAX_FOOD_CHARS = 64 << 20
+
+_SEPARATORS = re.compile(r'[\s,]*')
+
+# food.csv data_type values, as the API spells them
+CSV_DATA_TYPES = {
+    'foundation_food': 'Foundation',
+    'sr_legacy_food': 'SR Legacy',
+    'survey_fndds_food': 'Survey (FNDDS)',
+    'branded_food': 'Branded',
+    'experimental_food': 'Experimental',
+}
+
+
+class DumpFormatError(Exception):
+    pass
+
+
+def iter_json_array(stream, read_size=DUMP_READ_SIZE):
+    """
+    Yields the items of the first JSON array in a text stream (a top-level array, or the array
+    value of a top-level object such as {"FoundationFoods": [...]}), one at a time.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+
+    def read_more():
+        nonlocal buffer, position, eof
+        chunk = stream.read(read_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    read_more()
+    while True:
+        start = buffer.find('[', position)
+        if start != -1:
+            position = start + 1
+            break
+        if eof:
+            raise DumpFormatError("No JSON array found.")
+        position = len(buffer)
+        read_more()
+
+    while True:
+        position = _SEPARATORS.match(buffer, position).end()
+        if position == len(buffer):
+            if eof:
+                raise DumpFormatError("Unexpected end of file inside the foods array.")
+            read_more()
+            continue
+        if buffer[position] == ']':
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            # Usually the item is cut off at the end of the buffer
+            if eof or len(buffer) - position > MAX_FOOD_CHARS:
+                raise DumpFormatError(f"Invalid JSON in foods array: {e}")
+            read_more()
+            continue
+        yield item
+
+
+# --- Dump sources ---
+class DumpSource:
+    """
+    A bulk download on disk: a .json file, a CSV directory (or any CSV table inside it), or
+    the .zip of either. open(name) streams a member as text, matched by file name.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._zip = zipfile.ZipFile(path) if zipfile.is_zipfile(path) else None
+        if self._zip is not None:
+            self._members = {os.path.basename(name): name for name in self._zip.namelist()
+                             if not name.endswith('/')}
+        elif os.path.isdir(path):
+            self._members = {name: os.path.join(path, name) for name in os.listdir(path)}
+        elif path.lower().endswith('.csv'):
+            directory = os.path.dirname(path) or '.'
+            self._members = {name: os.path.join(directory, name) for name in os.listdir(directory)}
+        else:
+            self._members = {os.path.basename(path): path}
+
+    @property
+    def format(self):
+        if 'food.csv' in self._members:
+            return 'csv'
+        if any(name.lower().endswith('.json') for name in self._members) or self._zip is None:
+            return 'json'
+        raise DumpFormatError(f"No FDC JSON file or food.csv found in '{self.path}'.")
+
+    def has(self, name):
+        return name in self._members
+
+    @contextmanager
+    def open(self, name=None):
+        """
+        Streams member `name` (default: the JSON file) as UTF-8 text.
+        """
+        if name is None:
+            json_members = sorted(member for member in self._members if member.lower().endswith('.json'))
+            name = json_members[0] if json_members else next(iter(self._members))
+        if self._zip is not None:
+            with self._zip.open(self._members[name]) as raw:
+                yield io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+        else:
+            with open(self._members[name], encoding='utf-8-sig', newline='') as f:
+                yield f
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+
+
+def iter_json_foods(source):
+    with source.open() as stream:
+        yield from iter_json_array(stream)
+
+
+def _float_or_none(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@contextmanager
+def _staging_db():
+    """
+    A throwaway SQLite database in a temporary directory, deleted on exit.
+    """
+    with tempfile.TemporaryDirectory(prefix='fdc-dump-') as directory:
+        db = sqlite3.connect(os.path.join(directory, 'staging.sqlite3'))
+        try:
+            # Nothing here needs to survive a crash
+            db.execute('PRAGMA journal_mode = OFF')
+            db.execute('PRAGMA synchronous = OFF')
+            yield db
+        finally:
+            db.close()
+
+
+def _stage_csv(db, source, name, table, columns, rows_from):
+    """
+    Streams CSV member `name` into `table` (created with `columns`, indexed on fdc_id):
+    rows_from(reader) yields one tuple per kept row.
+    """
+    db.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+    if source.has(name):
+        with source.open(name) as f, db:
+            db.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})",
+                           rows_from(csv.DictReader(f)))
+    db.execute(f"CREATE INDEX {table}_fdc_id ON {table} (fdc_id)")
+
+
+def iter_csv_foods(source):
+    """
+    Rebuilds API-shaped foods from the CSV tables, in food.csv order. Nutrients and portions
+    are staged on disk first and looked up per food, so only one food is held in memory.
+    """
+    wanted = default_parser.nutrient_ids
+
+    units = {}
+    if source.has('measure_unit.csv'):
+        with source.open('measure_unit.csv') as f:
+            units = {row['id']: row['name'] for row in csv.DictReader(f)}
+
+    def nutrient_rows(reader):
+        for row in reader:
+            nutrient_id = int(row['nutrient_id'])
+            if nutrient_id in wanted:
+                yield int(row['fdc_id']), nutrient_id, _float_or_none(row['amount'])
+
+    def portion_rows(reader):
+        for row in reader:
+            yield (int(row['fdc_id']), int(row['id']), int(row['seq_num']) if row.get('seq_num') else None,
+                   _float_or_none(row.get('amount')), _float_or_none(row.get('gram_weight')),
+                   row.get('modifier') or '', row.get('portion_description') or '',
+                   row.get('measure_unit_id') or '')
+
+    with _staging_db() as db:
+        if not source.has('food_nutrient.csv'):
+            raise DumpFormatError(f"No food_nutrient.csv found in '{source.path}'.")
+        _stage_csv(db, source, 'food_nutrient.csv', 'nutrient', ('fdc_id', 'nutrient_id', 'amount'), nutrient_rows)
+        _stage_csv(db, source, 'food_portion.csv', 'portion',
+                   ('fdc_id', 'id', 'seq_num', 'amount', 'gram_weight', 'modifier', 'description', 'unit_id'),
+                   portion_rows)
+
+        with source.open('food.csv') as f:
+            for row in csv.DictReader(f):
+                fdc_id = int(row['fdc_id'])
+                # rowid keeps each table's file order, as the API lists them
+                food_nutrients = [
+                    {'nutrient': {'id': nutrient_id}, 'amount': amount}
+                    for nutrient_id, amount in db.execute(
+                        'SELECT nutrient_id, amount FROM nutrient WHERE fdc_id = ? ORDER BY rowid', (fdc_id,))]
+                food_portions = [
+                    {'id': portion_id, 'sequenceNumber': seq_num, 'amount': amount, 'gramWeight': gram_weight,
+                     'modifier': modifier, 'portionDescription': description,
+                     'measureUnit': {'id': int(unit_id) if unit_id.isdigit() else None,
+                                     'name': units.get(unit_id, 'undetermined')}}
+                    for portion_id, seq_num, amount, gram_weight, modifier, description, unit_id in db.execute(
+                        'SELECT id, seq_num, amount, gram_weight, modifier, description, unit_id FROM portion '
+                        'WHERE fdc_id = ? ORDER BY coalesce(seq_num, 0), rowid', (fdc_id,))]
+                yield {
+                    'fdcId': fdc_id,
+                    'description': row['description'],
+                    'dataType': CSV_DATA_TYPES.get(row.get('data_type'), row.get('data_type')),
+                    'publicationDate': row.get('publication_date'),
+                    'foodNutrients': food_nutrients,
+                    'foodPortions': food_portions,
+                }
+
+
+def iter_dump_foods(source):
+    return iter_csv_foods(source) if source.format == 'csv' else iter_json_foods(source)
+
+
+# --- Import ---
+def import_foods(foods, batch_size=DUMP_BATCH_SIZE, progress=None):
+    """
+    Parses and upserts `foods` (API-shaped dicts) in batches of `batch_size`, one transaction
+    per batch. Calls progress(stats) after each batch and returns the final stats.
+    """
+    stats = {'read': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0, 'seconds': 0.0}
+    start = time.perf_counter()
+
+    def flushed(created, updated, unchanged):
+        stats['created'] += len(created)
+        stats['updated'] += len(updated)
+        stats['unchanged'] += len(unchanged)
+        stats['seconds'] = time.perf_counter() - start
+        if progress is not None:
+            progress(stats)
+
+    with IngredientWriter(batch_size, on_flush=flushed) as writer:
+        for food in foods:
+            stats['read'] += 1
+            fields = parse_food(food) if food.get('fdcId') is not None else None
+            if fields is None or not fields['name']:
+                stats['skipped'] += 1
+                continue
+            writer.add(food['fdcId'], fields)
+    stats['seconds'] = time.perf_counter() - start
+    logger.info(
+        f"Imported FDC foods: {stats['created']} created, {stats['updated']} updated, "
+        f"{stats['unchanged']} unchanged, {stats['skipped']} skipped in {stats['seconds']:.1f}s.")
+    return stats
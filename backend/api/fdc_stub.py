@@ -0,0 +1,158 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .fdc import MAX_IDS_PER_REQUEST
+
+
+# --- Local stand-in for the FoodData Central API ---
+# Serves `food/<fdc_id>`, the multi-food `foods` endpoint (GET ?fdcIds=1,2 or POST
+# {"fdcIds": [...]}) and the paged, abridged `foods/list` from an in-memory dict of payloads on
+# 127.0.0.1, so the fetcher can be tested and benchmarked without network access or API quota.
+# Failures can be scripted with fail_next(), latency with latency_seconds, and every request
+# is recorded.
+class StubFDCServer:
+    """
+    with StubFDCServer({171688: {...}}) as server:
+        client = FDCClient('test-key', base_url=server.base_url)
+    """
+
+    def __init__(self, foods=None, latency_seconds=0.0):
+        self.foods = dict(foods or {})
+        self.latency_seconds = latency_seconds
+        self.requests = []
+        self._failures = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/fdc/v1/"
+
+    def fail_next(self, status, count=1, retry_after=None, body=None):
+        """
+        The next `count` requests get `status` instead of their payload, with `body` (text/html)
+        if given, e.g. a 200 maintenance page.
+        """
+        with self._lock:
+            self._failures.extend([(status, retry_after, body)] * count)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _next_failure(self):
+        with self._lock:
+            return self._failures.pop(0) if self._failures else None
+
+    def _record(self, method, path, query):
+        with self._lock:
+            self.requests.append((method, path, query))
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status, body, headers=None):
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def send_html(self, status, body):
+                payload = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def begin(self, method):
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                stub._record(method, parsed.path, query)
+                if stub.latency_seconds:
+                    threading.Event().wait(stub.latency_seconds)
+                failure = stub._next_failure()
+                if failure is not None:
+                    status, retry_after, body = failure
+                    headers = {'Retry-After': str(retry_after)} if retry_after is not None else None
+                    if body is None:
+                        self.send_json(status, {'error': 'scripted failure'}, headers)
+                    else:
+                        self.send_html(status, body)
+                    return None, None
+                return parsed.path, query
+
+            def send_foods(self, fdc_ids):
+                if len(fdc_ids) > MAX_IDS_PER_REQUEST:
+                    return self.send_json(400, {'error': 'too many fdcIds'})
+                return self.send_json(200, [stub.foods[fdc_id] for fdc_id in fdc_ids if fdc_id in stub.foods])
+
+            def do_GET(self):
+                path, query = self.begin('GET')
+                if path is None:
+                    return
+                if path == '/fdc/v1/foods':
+                    raw_ids = ','.join(query.get('fdcIds', []))
+                    return self.send_foods([int(value) for value in raw_ids.split(',') if value])
+
+                match = re.fullmatch(r'/fdc/v1/food/(\d+)', path)
+                if match is None:
+                    return self.send_json(404, {'error': 'unknown endpoint'})
+                food = stub.foods.get(int(match.group(1)))
+                if food is None:
+                    return self.send_json(404, {'error': 'food not found'})
+                return self.send_json(200, food)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+                path, _ = self.begin('POST')
+                if path is None:
+                    return
+                if path == '/fdc/v1/foods/list':
+                    return self.send_list(body)
+                if path != '/fdc/v1/foods':
+                    return self.send_json(404, {'error': 'unknown endpoint'})
+                return self.send_foods([int(fdc_id) for fdc_id in body.get('fdcIds', [])])
+
+            def send_list(self, body):
+                data_types = set(body.get('dataType') or ())
+                page_size = int(body.get('pageSize', 50))
+                page_number = int(body.get('pageNumber', 1))
+                listed = [food for fdc_id, food in sorted(stub.foods.items())
+                          if not data_types or food.get('dataType') in data_types]
+                page = listed[(page_number - 1) * page_size:page_number * page_size]
+                abridged_keys = ('fdcId', 'description', 'dataType', 'publicationDate', 'modifiedDate')
+                return self.send_json(200, [{key: food[key] for key in abridged_keys if key in food}
+                                            for food in page])
+
+        return Handler
@@ -0,0 +1,63 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Recipe
+from .search import search_recipes
+
+
+# --- Recipe filtering ---
+# Query parameter prefix -> Recipe field. Each accepts <prefix>_min and <prefix>_max.
+RECIPE_RANGE_FILTERS = {
+    'calories': 'total_calories',
+    'protein': 'total_protein_g',
+    'carbs': 'total_carbs_g',
+    'fat': 'total_fat_g',
+}
+
+
+class RecipeFilterBackend(BaseFilterBackend):
+    """
+    ?meal_type=lunch,dinner and inclusive nutrient ranges such as ?calories_min=300&protein_max=40.
+    Served by the (meal_type, total_*) indexes on Recipe.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        meal_types = [value.strip() for value in params.get(
+            'meal_type', '').split(',') if value.strip()]
+        if meal_types:
+            valid = {choice for choice, _ in Recipe.MEAL_TYPE_CHOICES}
+            unknown = [value for value in meal_types if value not in valid]
+            if unknown:
+                raise ValidationError(
+                    {"meal_type": f"Unknown meal type(s): {', '.join(unknown)}"})
+            queryset = queryset.filter(meal_type__in=meal_types)
+
+        errors = {}
+        for prefix, field in RECIPE_RANGE_FILTERS.items():
+            for suffix, lookup in (('min', 'gte'), ('max', 'lte')):
+                param = f"{prefix}_{suffix}"
+                if param not in params:
+                    continue
+                try:
+                    value = float(params[param])
+                except ValueError:
+                    errors[param] = "Must be a number."
+                    continue
+                queryset = queryset.filter(**{f"{field}__{lookup}": value})
+        if errors:
+            raise ValidationError(errors)
+        return queryset
+
+
+class RecipeSearchBackend(BaseFilterBackend):
+    """
+    ?search=<words> over recipe name, description and ingredient names (see api/search.py).
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return search_recipes(queryset, query)
@@ -0,0 +1,70 @@
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Recipe
+from .renderers import RawJSON, dumps_json
+
+logger = logging.getLogger(__name__)
+
+
+# --- Pre-rendered recipe fragments ---
+# Serialized recipes are cached as JSON bytes keyed by (recipe id, recipe updated_at, fieldset).
+# Writes to a recipe, its ingredient lines or their ingredients stamp the recipe's updated_at
+# (see api/models.py), so its stale fragments are never read again and age out of the cache,
+# while writes elsewhere in the catalog leave it warm.
+FRAGMENT_TIMEOUT_SECONDS = 24 * 60 * 60
+
+
+def _fragment_cache():
+    return caches[getattr(settings, 'RECIPE_FRAGMENT_CACHE', 'default')]
+
+
+def fieldset_key(fields):
+    return hashlib.sha256(','.join(fields).encode()).hexdigest()[:12]
+
+
+def fragment_key(recipe_id, updated_at, fields):
+    return f"recipe-fragment:{fieldset_key(fields)}:{recipe_id}:{int(updated_at.timestamp() * 1_000_000)}"
+
+
+def recipe_stamps(recipe_ids):
+    """
+    {recipe_id: updated_at} for the given IDs, in their order; IDs of missing recipes are dropped.
+    """
+    stamps = dict(Recipe.objects.filter(pk__in=recipe_ids).values_list('id', 'updated_at'))
+    return {recipe_id: stamps[recipe_id] for recipe_id in recipe_ids if recipe_id in stamps}
+
+
+def get_recipe_fragments(recipe_stamps, fields, render_missing):
+    """
+    Returns {recipe_id: RawJSON} for the recipes in recipe_stamps ({recipe_id: updated_at}).
+    Cache misses are rendered in one batch by render_missing(missing_ids), which must return
+    (recipe_id, serialized_dict) pairs; IDs it doesn't return (e.g. deleted recipes) are omitted.
+    """
+    cache = _fragment_cache()
+    keys = {recipe_id: fragment_key(recipe_id, updated_at, fields)
+            for recipe_id, updated_at in recipe_stamps.items()}
+    cached = cache.get_many(keys.values())
+
+    fragments = {}
+    missing_ids = []
+    for recipe_id, key in keys.items():
+        if key in cached:
+            fragments[recipe_id] = RawJSON(cached[key])
+        else:
+            missing_ids.append(recipe_id)
+
+    if missing_ids:
+        rendered = {}
+        for recipe_id, data in render_missing(missing_ids):
+            content = dumps_json(data)
+            rendered[keys[recipe_id]] = content
+            fragments[recipe_id] = RawJSON(content)
+        cache.set_many(rendered, timeout=FRAGMENT_TIMEOUT_SECONDS)
+
+    logger.debug(
+        f"Recipe fragments: {len(keys) - len(missing_ids)} cached, {len(missing_ids)} rendered.")
+    return fragments
@@ -0,0 +1,343 @@
+import heapq
+import logging
+import math
+import re
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+from .autocomplete import ProcessWideIndex, normalize
+from .models import Ingredient
+
+logger = logging.getLogger(__name__)
+
+
+# --- Ingredient line parsing ---
+# "1 1/2 cups all-purpose flour, sifted" -> (1.5, 'cup', 'all-purpose flour'). Quantities may be
+# integers, decimals, fractions, mixed numbers, unicode fractions, ranges (averaged) or words
+# ("a", "two"). Units are normalized to RecipeIngredient.UNIT_CHOICES, scaling the quantity when
+# the unit is only convertible (2 lb -> 907.2 g); a count with no unit is 'piece'.
+UNICODE_FRACTIONS = {
+    '½': 1 / 2, '⅓': 1 / 3, '⅔': 2 / 3, '¼': 1 / 4, '¾': 3 / 4, '⅕': 1 / 5, '⅖': 2 / 5,
+    '⅗': 3 / 5, '⅘': 4 / 5, '⅙': 1 / 6, '⅚': 5 / 6, '⅛': 1 / 8, '⅜': 3 / 8, '⅝': 5 / 8, '⅞': 7 / 8,
+}
+QUANTITY_WORDS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7,
+    'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12, 'dozen': 12, 'half': 0.5,
+}
+# Spelling -> (unit in RecipeIngredient.UNIT_CHOICES, factor applied to the quantity)
+UNIT_ALIASES = {
+    'g': ('g', 1), 'gr': ('g', 1), 'gram': ('g', 1), 'grams': ('g', 1),
+    'kg': ('g', 1000), 'kilo': ('g', 1000), 'kilos': ('g', 1000),
+    'kilogram': ('g', 1000), 'kilograms': ('g', 1000),
+    'mg': ('g', 0.001), 'milligram': ('g', 0.001), 'milligrams': ('g', 0.001),
+    'oz': ('g', 28.349523125), 'ounce': ('g', 28.349523125), 'ounces': ('g', 28.349523125),
+    'lb': ('g', 453.59237), 'lbs': ('g', 453.59237), 'pound': ('g', 453.59237), 'pounds': ('g', 453.59237),
+    'ml': ('ml', 1), 'milliliter': ('ml', 1), 'milliliters': ('ml', 1),
+    'millilitre': ('ml', 1), 'millilitres': ('ml', 1),
+    'cl': ('ml', 10), 'dl': ('ml', 100),
+    'l': ('ml', 1000), 'liter': ('ml', 1000), 'liters': ('ml', 1000), 'litre': ('ml', 1000), 'litres': ('ml', 1000),
+    'fl oz': ('ml', 29.5735295625), 'fluid ounce': ('ml', 29.5735295625), 'fluid ounces': ('ml', 29.5735295625),
+    'cup': ('cup', 1), 'cups': ('cup', 1), 'c': ('cup', 1),
+    'pint': ('cup', 2), 'pints': ('cup', 2), 'pt': ('cup', 2),
+    'quart': ('cup', 4), 'quarts': ('cup', 4), 'qt': ('cup', 4),
+    'gallon': ('cup', 16), 'gallons': ('cup', 16), 'gal': ('cup', 16),
+    'tbsp': ('tbsp', 1), 'tbsps': ('tbsp', 1), 'tbs': ('tbsp', 1), 'tbl': ('tbsp', 1),
+    'tablespoon': ('tbsp', 1), 'tablespoons': ('tbsp', 1),
+    'tsp': ('tsp', 1), 'tsps': ('tsp', 1), 'teaspoon': ('tsp', 1), 'teaspoons': ('tsp', 1),
+    'pinch': ('tsp', 1 / 16), 'pinches': ('tsp', 1 / 16), 'dash': ('tsp', 1 / 8), 'dashes': ('tsp', 1 / 8),
+    'piece': ('piece', 1), 'pieces': ('piece', 1), 'pc': ('piece', 1), 'pcs': ('piece', 1),
+    'each': ('piece', 1), 'whole': ('piece', 1), 'clove': ('piece', 1), 'cloves': ('piece', 1),
+    'slice': ('piece', 1), 'slices': ('piece', 1), 'can': ('piece', 1), 'cans': ('piece', 1),
+}
+# Abbreviations whose case matters: 'T' is a tablespoon, 't' a teaspoon
+CASED_UNIT_ALIASES = {'T': ('tbsp', 1), 't': ('tsp', 1)}
+DEFAULT_COUNT_UNIT = 'piece'
+
+# Mixed numbers come first, so "1-1/2" is one and a half rather than the range 1 to 1/2
+_NUMBER = r'(?:\d+(?:\s+|\s*-\s*)\d+\s*/\s*\d+|\d+\s*/\s*\d+|\d*\.\d+|\d+(?:\s*[{fractions}])?|[{fractions}])'.format(
+    fractions=''.join(UNICODE_FRACTIONS))
+# Quantity words must stand alone, so "apple" and "tenderloin" aren't "a pple" and "ten derloin"
+_QUANTITY = r'(?:{number}|(?:{words})(?=\s|$))'.format(
+    number=_NUMBER, words='|'.join(sorted(QUANTITY_WORDS, key=len, reverse=True)))
+_UNITS = '|'.join(re.escape(alias).replace(r'\ ', r'\s+') for alias in sorted(
+    [*UNIT_ALIASES, *CASED_UNIT_ALIASES], key=len, reverse=True))
+_RANGE = r'{quantity}(?:\s*(?:-|–|to)\s*{quantity})?'.format(quantity=_QUANTITY)
+_LINE_RE = re.compile(
+    r'^\s*(?P<quantity>{range})?\s*'
+    r'(?:(?P<unit>{units})\.?(?=\s|$))?\s*(?:of\s+)?(?P<name>.*?)\s*$'.format(
+        range=_RANGE, units=_UNITS),
+    re.IGNORECASE)
+_RANGE_RE = re.compile(r'^({quantity})(?:\s*(?:-|–|to)\s*({quantity}))?$'.format(quantity=_QUANTITY),
+                       re.IGNORECASE)
+_MIXED_RE = re.compile(r'^(\d+)(?:\s+|\s*-\s*)(\d+)\s*/\s*(\d+)$')
+_FRACTION_RE = re.compile(r'^(\d+)\s*/\s*(\d+)$')
+_PARENTHESES_RE = re.compile(r'\([^)]*\)|\[[^\]]*\]')
+# Preparation notes: "flour, sifted", "onion; diced", "butter - softened"
+_NOTE_RE = re.compile(r'\s*(?:[,;]|\s-\s).*$')
+
+
+def parse_number(text):
+    text = text.strip().lower()
+    if text in QUANTITY_WORDS:
+        return float(QUANTITY_WORDS[text])
+    if text[-1] in UNICODE_FRACTIONS:
+        whole = text[:-1].strip()
+        return (float(whole) if whole else 0.0) + UNICODE_FRACTIONS[text[-1]]
+    mixed = _MIXED_RE.match(text)
+    if mixed:
+        whole, numerator, denominator = map(int, mixed.groups())
+        return whole + numerator / denominator if denominator else None
+    fraction = _FRACTION_RE.match(text)
+    if fraction:
+        numerator, denominator = map(int, fraction.groups())
+        return numerator / denominator if denominator else None
+    return float(text)
+
+
+def parse_quantity(text):
+    """
+    Parses a quantity or range ("1-2" averages to 1.5, "1-1/2" is a mixed number); None when
+    there is none.
+    """
+    match = _RANGE_RE.match(text.strip()) if text else None
+    if match is None:
+        return None
+    values = [parse_number(part) for part in match.groups() if part]
+    if None in values:
+        return None
+    return sum(values) / len(values)
+
+
+def parse_line(line):
+    """
+    Returns (quantity, unit, name): quantity is a float or None, unit one of
+    RecipeIngredient.UNIT_CHOICES or None, name the ingredient text without notes.
+    """
+    text = _PARENTHESES_RE.sub(' ', line)
+    match = _LINE_RE.match(text)
+    quantity = parse_quantity(match.group('quantity'))
+    unit_text = match.group('unit')
+    name = _NOTE_RE.sub('', match.group('name')).strip()
+    if unit_text and not name:
+        # "2 c" is a quantity of something called "c", not two cups of nothing
+        name, unit_text = unit_text, None
+
+    unit = None
+    if unit_text:
+        unit_text = ' '.join(unit_text.split())
+        unit, factor = CASED_UNIT_ALIASES.get(unit_text) or UNIT_ALIASES[unit_text.lower()]
+        if quantity is not None:
+            quantity *= factor
+    elif quantity is not None:
+        unit = DEFAULT_COUNT_UNIT
+    return quantity, unit, name
+
+
+# --- Ingredient matching ---
+# An inverted index from name token to the IDs of ingredients containing it. A query scores
+# candidates by the IDF weight of the query tokens they contain (rare words like "flour" count
+# more than "raw"), accumulated from the posting lists of the tokens that aren't too common;
+# the best few are then re-ranked by how much of the ingredient's own name the query covers,
+# so "flour" prefers "Wheat flour, white" over "Cookies, made with wheat flour, chocolate".
+MATCH_MIN_SCORE = 0.5
+MATCH_CANDIDATES = 32
+# Matches are memoized per normalized query; recipes repeat the same few thousand ingredients
+MATCH_CACHE_SIZE = 100_000
+# Tokens in more than this share of names are only used to re-rank candidates
+MAX_POSTING_SHARE = 0.05
+
+# Preparation and size words that say nothing about which food it is
+QUERY_STOPWORDS = frozenset(
+    'chopped diced minced sliced grated shredded crushed peeled seeded cubed halved '
+    'quartered julienned mashed melted softened beaten sifted packed heaping level rounded '
+    'finely roughly coarsely thinly thickly freshly lightly large medium small optional '
+    'to taste and or for the of about into cut plus more divided room temperature serving'.split())
+
+_TOKEN_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def match_tokens(text):
+    """
+    Normalized, singularized word tokens: 'Tomatoes, raw' -> ['tomato', 'raw'].
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(normalize(text)):
+        if len(token) > 3 and not token.isdigit():
+            if token.endswith('ies'):
+                token = token[:-3] + 'y'
+            elif token.endswith('oes'):
+                token = token[:-2]
+            elif token.endswith('s') and not token.endswith('ss'):
+                token = token[:-1]
+        tokens.append(sys.intern(token))
+    return tokens
+
+
+class IngredientMatcher:
+    """
+    Best-match lookup of free-text ingredient names against Ingredient.name.
+    """
+
+    def __init__(self, rows=()):
+        # rows: iterable of (id, name)
+        self._lock = threading.RLock()
+        self._entries = {}  # id -> (name, token set)
+        for ingredient_id, name in rows:
+            self._entries[ingredient_id] = (name, frozenset(match_tokens(name)))
+        # Posting lists hold the shortest names first, so candidates tied on score are the most
+        # generic foods
+        postings = defaultdict(list)
+        for ingredient_id in sorted(self._entries, key=self._posting_key):
+            for token in self._entries[ingredient_id][1]:
+                postings[token].append(ingredient_id)
+        self._postings = {token: array('q', ids) for token, ids in postings.items()}
+        self._idf = {token: self._token_idf(ids) for token, ids in self._postings.items()}
+        self._max_postings = max(50, int(len(self._entries) * MAX_POSTING_SHARE))
+        self._cache = {}
+
+    @classmethod
+    def from_db(cls):
+        start = time.perf_counter()
+        matcher = cls(Ingredient.objects.values_list('id', 'name').iterator(chunk_size=5000))
+        logger.info(
+            f"Built ingredient matcher: {len(matcher)} ingredients in {time.perf_counter() - start:.2f}s.")
+        return matcher
+
+    def __len__(self):
+        return len(self._entries)
+
+    # --- Incremental updates ---
+    def _posting_key(self, ingredient_id):
+        return (len(self._entries[ingredient_id][1]), ingredient_id)
+
+    def _token_idf(self, ids):
+        return math.log((len(self._entries) + 1) / (len(ids) + 0.5))
+
+    def add(self, ingredient_id, name):
+        with self._lock:
+            if ingredient_id in self._entries:
+                self.remove(ingredient_id)
+            tokens = frozenset(match_tokens(name))
+            self._entries[ingredient_id] = (name, tokens)
+            key = self._posting_key(ingredient_id)
+            for token in tokens:
+                ids = self._postings.setdefault(token, array('q'))
+                ids.insert(bisect_left(ids, key, key=self._posting_key), ingredient_id)
+                self._idf[token] = self._token_idf(ids)
+            self._cache.clear()
+
+    def remove(self, ingredient_id):
+        with self._lock:
+            entry = self._entries.get(ingredient_id)
+            if entry is None:
+                return
+            key = self._posting_key(ingredient_id)
+            for token in entry[1]:
+                ids = self._postings[token]
+                del ids[bisect_left(ids, key, key=self._posting_key)]
+                if ids:
+                    self._idf[token] = self._token_idf(ids)
+                else:
+                    del self._postings[token]
+                    del self._idf[token]
+            del self._entries[ingredient_id]
+            self._cache.clear()
+
+    # --- Lookups ---
+    def match(self, text):
+        """
+        Returns (ingredient_id, name, score) for the best match of `text`, or None when no
+        ingredient scores at least MATCH_MIN_SCORE. Scores run from 0 to 1.
+        """
+        query = tuple(token for token in dict.fromkeys(match_tokens(text)) if token not in QUERY_STOPWORDS)
+        with self._lock:
+            try:
+                return self._cache[query]
+            except KeyError:
+                pass
+            if len(self._cache) >= MATCH_CACHE_SIZE:
+                self._cache.clear()
+            result = self._cache[query] = self._match(query)
+            return result
+
+    def _match(self, query):
+        weights = {token: self._idf.get(token, 0.0) for token in query}
+        total = sum(weights.values())
+        if not total:
+            return None
+
+        # Accumulate IDF from the selective posting lists; fall back to the rarest known token
+        known = sorted((token for token in query if token in self._postings),
+                       key=lambda token: len(self._postings[token]))
+        selective = [token for token in known if len(self._postings[token]) <= self._max_postings] or known[:1]
+        if len(selective) == 1:
+            # Every candidate scores the same so far; the postings are already shortest-first
+            candidates = self._postings[selective[0]][:MATCH_CANDIDATES]
+        else:
+            accumulated = defaultdict(float)
+            for token in selective:
+                weight = weights[token]
+                for ingredient_id in self._postings[token]:
+                    accumulated[ingredient_id] += weight
+            # nlargest() keeps the first-seen order on ties, i.e. shortest names first
+            candidates = heapq.nlargest(MATCH_CANDIDATES, accumulated, key=accumulated.__getitem__)
+
+        best = None
+        for ingredient_id in candidates:
+            name, tokens = self._entries[ingredient_id]
+            matched = [token for token in query if token in tokens]
+            query_coverage = sum(weights[token] for token in matched) / total
+            name_coverage = len(matched) / len(tokens)
+            score = 0.8 * query_coverage + 0.2 * name_coverage
+            key = (score, -len(name), -ingredient_id)
+            if best is None or key > best[0]:
+                best = (key, ingredient_id, name, score)
+        if best is None or best[3] < MATCH_MIN_SCORE:
+            return None
+        return best[1], best[2], round(best[3], 3)
+
+
+def parse_ingredient_lines(lines, matcher=None):
+    """
+    Parses and matches a batch of lines. Returns one dict per line with 'line', 'quantity',
+    'unit', 'name', 'ingredient_id', 'ingredient_name' and 'score' (ingredient fields are None
+    when nothing matched).
+    """
+    matcher = matcher or get_ingredient_matcher()
+    results = []
+    for line in lines:
+        quantity, unit, name = parse_line(line)
+        match = matcher.match(name) if name else None
+        results.append({
+            'line': line,
+            'quantity': quantity,
+            'unit': unit,
+            'name': name,
+            'ingredient_id': match[0] if match else None,
+            'ingredient_name': match[1] if match else None,
+            'score': match[2] if match else None,
+        })
+    return results
+
+
+# --- Process-wide matcher ---
+# Kept current like the autocomplete index: Ingredient writes in this process update it in place
+# (see the receivers in models.py and fdc.upsert_ingredients()), and writes made elsewhere are
+# picked up by a background rebuild once the ingredient table has changed.
+_ingredient_matcher = ProcessWideIndex(IngredientMatcher.from_db)
+
+
+def get_ingredient_matcher():
+    return _ingredient_matcher.get()
+
+
+def loaded_ingredient_matcher():
+    return _ingredient_matcher.loaded()
+
+
+def reset_ingredient_matcher():
+    _ingredient_matcher.reset()
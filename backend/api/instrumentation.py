@@ -0,0 +1,117 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+# Structured, one-JSON-object-per-line records meant for log shipping / metrics pipelines
+metrics_logger = logging.getLogger('api.metrics')
+
+
+class PhaseTimer:
+    """
+    Accumulates wall time and DB query counts per named phase.
+    Re-entering a phase adds to its totals, so it can wrap code inside loops. Wrap the whole
+    request in recording() so the query counter is installed once rather than on every phase;
+    a nested phase counts its queries for itself only, and its time towards total_ms only
+    through the phase enclosing it.
+    """
+
+    def __init__(self):
+        # phase name -> {'ms': float, 'queries': int, 'query_ms': float}, in first-seen order
+        self.phases = {}
+        self._active = None
+        self._recording = False
+        # Wall time spent in top-level phases, which already includes their nested ones
+        self._total_ms = 0.0
+
+    @contextmanager
+    def recording(self):
+        """
+        Counts the queries made on this thread's connection into the active phase. Reentrant.
+        """
+        if self._recording:
+            yield self
+            return
+
+        def count_queries(execute, sql, params, many, context):
+            stats = self._active
+            if stats is None:
+                return execute(sql, params, many, context)
+            query_started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                stats['queries'] += 1
+                stats['query_ms'] += (time.perf_counter() - query_started) * 1000.0
+
+        self._recording = True
+        try:
+            with connection.execute_wrapper(count_queries):
+                yield self
+        finally:
+            self._recording = False
+
+    @contextmanager
+    def phase(self, name):
+        if not self._recording:
+            with self.recording(), self.phase(name) as stats:
+                yield stats
+            return
+
+        stats = self.phases.setdefault(
+            name, {'ms': 0.0, 'queries': 0, 'query_ms': 0.0})
+        previous = self._active
+        self._active = stats
+        started = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            stats['ms'] += elapsed_ms
+            if previous is None:
+                self._total_ms += elapsed_ms
+            self._active = previous
+
+    @property
+    def total_ms(self):
+        return self._total_ms
+
+    @property
+    def query_count(self):
+        return sum(stats['queries'] for stats in self.phases.values())
+
+    @property
+    def query_ms(self):
+        return sum(stats['query_ms'] for stats in self.phases.values())
+
+    def as_dict(self):
+        return {
+            'phases_ms': {name: round(stats['ms'], 3) for name, stats in self.phases.items()},
+            'phase_queries': {name: stats['queries'] for name, stats in self.phases.items()},
+            'queries': self.query_count,
+            'query_ms': round(self.query_ms, 3),
+            'total_ms': round(self.total_ms, 3),
+        }
+
+    def server_timing_header(self):
+        """
+        Renders the phases as a Server-Timing header value, e.g.
+        'catalog;dur=3.1, scoring;dur=12.4, db;dur=2.8;desc="4 queries", total;dur=19.0'
+        """
+        metrics = [f"{name};dur={stats['ms']:.1f}" for name,
+                   stats in self.phases.items()]
+        metrics.append(
+            f'db;dur={self.query_ms:.1f};desc="{self.query_count} queries"')
+        metrics.append(f"total;dur={self.total_ms:.1f}")
+        return ", ".join(metrics)
+
+    def emit(self, event, **fields):
+        """
+        Logs one structured metrics record for this timer, with any extra fields attached.
+        """
+        record = {'event': event, **fields, **self.as_dict()}
+        metrics_logger.info(json.dumps(record, sort_keys=True, default=str))
+        return record
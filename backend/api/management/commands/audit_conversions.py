@@ -0,0 +1,67 @@
+from api.conversion_audit import AUDIT_CHUNK_SIZE, ISSUES, audit_conversions
+from django.core.management.base import BaseCommand, CommandError
+import csv
+import io
+import json
+
+CSV_COLUMNS = ['issue', 'ingredient_id', 'ingredient_name', 'fdc_id', 'unit', 'lines', 'density',
+               'sample_recipe_ids']
+
+
+class Command(BaseCommand):
+    help = ('Converts every recipe ingredient line to grams without per-row logging and reports the '
+            'problems grouped by (ingredient, unit): unconvertible units, milliliter density fallbacks and '
+            'zero quantities, with the number of recipes each affects.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['json', 'csv'], default='json')
+        parser.add_argument('--output', default=None,
+                            help='File to write; defaults to stdout.')
+        parser.add_argument('--chunk-size', type=int, default=AUDIT_CHUNK_SIZE,
+                            help='Recipes loaded per query.')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Report only the N largest groups of each issue.')
+
+    def _write(self, report, format, out):
+        if format == 'csv':
+            writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+            for issue in ISSUES:
+                for group in report[issue]:
+                    writer.writerow({**group, 'issue': issue,
+                                     'sample_recipe_ids': ' '.join(map(str, group['sample_recipe_ids']))})
+        else:
+            json.dump(report, out, indent=2)
+            out.write('\n')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive.')
+
+        def progress(summary):
+            # Progress goes to stderr so stdout stays a valid report
+            self.stderr.write(
+                f"{summary['recipes']:,} recipes | {summary['lines']:,} lines | "
+                f"{summary['lines_by_method'].get('unconvertible', 0):,} unconvertible", ending='\r')
+
+        report = audit_conversions(options['chunk_size'], progress)
+        self.stderr.write('')
+        if options['limit'] is not None:
+            for issue in ISSUES:
+                report[issue] = report[issue][:options['limit']]
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+                self._write(report, options['format'], f)
+        else:
+            # The report holds one row per (ingredient, unit) group, so buffering it is cheap
+            buffer = io.StringIO()
+            self._write(report, options['format'], buffer)
+            self.stdout.write(buffer.getvalue(), ending='')
+
+        summary = report['summary']
+        self.stderr.write(self.style.SUCCESS(
+            f"Audited {summary['lines']:,} lines in {summary['recipes']:,} recipes in {summary['seconds']:.1f}s: "
+            f"{summary['recipes_with_unconvertible']:,} recipes with unconvertible lines, "
+            f"{summary['recipes_with_density_fallback']:,} using a density fallback, "
+            f"{summary['recipes_with_zero_quantity']:,} with zero quantities."))
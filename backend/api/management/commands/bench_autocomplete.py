@@ -0,0 +1,91 @@
+from api.autocomplete import IngredientPrefixIndex
+from api.benchmarking import latency_summary, run_metadata, write_report
+from django.core.management.base import BaseCommand
+import random
+import time
+
+# Word pools for USDA-style descriptions ("Chicken, broilers or fryers, breast, raw")
+FOOD_WORDS = ['chicken', 'beef', 'pork', 'turkey', 'salmon', 'tuna', 'egg', 'milk', 'cheese', 'yogurt',
+              'butter', 'bread', 'rice', 'pasta', 'oats', 'wheat', 'flour', 'apple', 'banana', 'orange',
+              'tomato', 'potato', 'carrot', 'onion', 'garlic', 'spinach', 'broccoli', 'beans', 'lentils',
+              'almonds', 'peanut', 'walnuts', 'chocolate', 'cookies', 'crackers', 'cereal', 'juice', 'soup',
+              'sauce', 'oil', 'sugar', 'honey', 'coffee', 'tea', 'pizza', 'burrito', 'sandwich', 'salad']
+MODIFIER_WORDS = ['raw', 'cooked', 'boiled', 'roasted', 'fried', 'grilled', 'frozen', 'canned', 'dried',
+                  'fresh', 'whole', 'skim', 'low fat', 'reduced sodium', 'unsalted', 'sweetened',
+                  'unsweetened', 'organic', 'enriched', 'breast', 'thigh', 'ground', 'sliced', 'diced',
+                  'prepared', 'ready-to-eat', 'with skin', 'without salt', 'plain', 'vanilla']
+
+
+def synthetic_food_name(rng, index):
+    words = [rng.choice(FOOD_WORDS).title()]
+    words += rng.sample(MODIFIER_WORDS, rng.randint(1, 4))
+    # Branded foods carry a product line or brand token, which makes names mostly unique
+    words.append(f"brand{index % 9973}")
+    return ', '.join(words)
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks the ingredient autocomplete prefix index on a synthetic USDA-sized food list: '
+            'build time, per-keystroke latency and incremental update cost.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=400_000,
+                            help='Number of synthetic foods to index.')
+        parser.add_argument('--queries', type=int, default=500,
+                            help='Number of typed queries; every prefix of each is timed as a keystroke.')
+        parser.add_argument('--limit', type=int, default=10,
+                            help='Results per autocomplete request.')
+        parser.add_argument('--seed', type=int, default=7)
+        parser.add_argument('--output', default=None,
+                            help='Write the JSON report to this path.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        size = options['size']
+        rows = [(i, synthetic_food_name(rng, i), 100000 + i) for i in range(1, size + 1)]
+
+        start = time.perf_counter()
+        index = IngredientPrefixIndex(rows)
+        build_s = time.perf_counter() - start
+        self.stdout.write(f"Built index over {size:,} foods in {build_s:.2f}s")
+
+        # Users type a food word, then a modifier: 'c', 'ch', ..., 'chicken r', 'chicken ro', ...
+        typed = []
+        for _ in range(options['queries']):
+            phrase = f"{rng.choice(FOOD_WORDS)} {rng.choice(MODIFIER_WORDS)}"
+            typed.extend(phrase[:n] for n in range(1, len(phrase) + 1) if not phrase[:n].endswith(' '))
+        typed += [str(100000 + rng.randint(1, size))[:n] for n in range(1, 7) for _ in range(20)]
+
+        samples = []
+        for query in typed:
+            start = time.perf_counter()
+            index.search(query, limit=options['limit'])
+            samples.append((time.perf_counter() - start) * 1000.0)
+        keystrokes = latency_summary(samples)
+        self.stdout.write(
+            f"Keystrokes: {keystrokes['runs']:,} | p50 {keystrokes['p50_ms']:.4f} ms | "
+            f"p95 {keystrokes['p95_ms']:.4f} ms | p99 {keystrokes['p99_ms']:.4f} ms")
+
+        update_samples = []
+        for i in range(200):
+            ingredient_id = size + 1 + i
+            start = time.perf_counter()
+            index.add(ingredient_id, synthetic_food_name(rng, ingredient_id), 100000 + ingredient_id)
+            update_samples.append((time.perf_counter() - start) * 1000.0)
+        updates = latency_summary(update_samples)
+        self.stdout.write(
+            f"Incremental adds: p50 {updates['p50_ms']:.4f} ms | p99 {updates['p99_ms']:.4f} ms")
+
+        report = {
+            'benchmark': 'autocomplete',
+            'size': size,
+            'limit': options['limit'],
+            'seed': options['seed'],
+            'metadata': run_metadata(),
+            'build_seconds': round(build_s, 3),
+            'keystrokes': keystrokes,
+            'incremental_adds': updates,
+        }
+        if options['output']:
+            write_report(options['output'], report)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
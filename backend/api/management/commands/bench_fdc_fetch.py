@@ -0,0 +1,76 @@
+from api.benchmarking import run_metadata, synthetic_fdc_foods, write_report
+from api.fdc import MAX_IDS_PER_REQUEST, FDCClient, fetch_food_batches, parse_food
+from api.fdc_stub import StubFDCServer
+from django.core.management.base import BaseCommand, CommandError
+import random
+import time
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks fetching and parsing USDA foods at several batch sizes against a local stub '
+            'FDC server with simulated latency, without network access or API quota. '
+            'Nothing is written to the database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--foods', type=int, default=1000,
+                            help='Number of synthetic foods to fetch per run.')
+        parser.add_argument('--batch-sizes', default=f'1,5,10,{MAX_IDS_PER_REQUEST}',
+                            help='Comma-separated FDC IDs per request to compare.')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Maximum number of requests in flight.')
+        parser.add_argument('--latency-ms', type=float, default=50.0,
+                            help='Simulated server latency per request.')
+        parser.add_argument('--extra-nutrients', type=int, default=150,
+                            help='Unrelated foodNutrients entries per food (real foods carry ~150).')
+        parser.add_argument('--seed', type=int, default=7)
+        parser.add_argument('--output', default=None,
+                            help='Write the JSON report to this path.')
+
+    def handle(self, *args, **options):
+        try:
+            batch_sizes = [int(value) for value in options['batch_sizes'].split(',') if value.strip()]
+        except ValueError:
+            raise CommandError('--batch-sizes must be a comma-separated list of integers.')
+        if not batch_sizes or not all(1 <= size <= MAX_IDS_PER_REQUEST for size in batch_sizes):
+            raise CommandError(f'Batch sizes must be between 1 and {MAX_IDS_PER_REQUEST}.')
+
+        foods = synthetic_fdc_foods(options['foods'], random.Random(options['seed']),
+                                    extra_nutrients=options['extra_nutrients'])
+        runs = []
+        with StubFDCServer(foods, latency_seconds=options['latency_ms'] / 1000.0) as server:
+            for batch_size in batch_sizes:
+                client = FDCClient('bench-key', base_url=server.base_url, pool_size=options['workers'])
+                parsed = 0
+                start = time.perf_counter()
+                try:
+                    for _, batch, error in fetch_food_batches(client, foods, batch_size, options['workers']):
+                        if error is not None:
+                            raise CommandError(f"Stub request failed: {error}")
+                        parsed += sum(1 for data in batch if parse_food(data) is not None)
+                finally:
+                    client.close()
+                seconds = time.perf_counter() - start
+                runs.append({
+                    'batch_size': batch_size,
+                    'requests': client.requests_made,
+                    'foods_parsed': parsed,
+                    'seconds': round(seconds, 3),
+                    'foods_per_second': round(parsed / seconds, 1) if seconds else None,
+                })
+                self.stdout.write(
+                    f"Batch size {batch_size:>2}: {client.requests_made:,} requests, {parsed:,} foods in "
+                    f"{seconds:.2f}s ({runs[-1]['foods_per_second']:,} foods/s)")
+
+        report = {
+            'benchmark': 'fdc_fetch',
+            'foods': options['foods'],
+            'workers': options['workers'],
+            'latency_ms': options['latency_ms'],
+            'extra_nutrients': options['extra_nutrients'],
+            'seed': options['seed'],
+            'metadata': run_metadata(),
+            'runs': runs,
+        }
+        if options['output']:
+            write_report(options['output'], report)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
@@ -0,0 +1,82 @@
+from api.benchmarking import FIXTURE_INGREDIENTS, latency_summary, run_metadata, write_report
+from api.ingredient_lines import IngredientMatcher, parse_ingredient_lines
+from api.management.commands.bench_autocomplete import FOOD_WORDS, MODIFIER_WORDS, synthetic_food_name
+from django.core.management.base import BaseCommand
+import random
+import time
+
+# Recipe-style quantities and units, spelled the ways recipes spell them
+LINE_AMOUNTS = ['1', '2', '3', '1/2', '1 1/2', '½', '¾', '2-3', '250', 'a', 'one', '0.5']
+LINE_UNITS = ['cups', 'cup', 'tbsp', 'T', 'tsp', 'teaspoons', 'g', 'grams', 'oz', 'lb', 'ml', 'pinch of',
+              'cloves', 'large', '']
+LINE_NOTES = ['', '', ', chopped', ', finely diced', ' (about 200 g)', ', to taste', '; divided']
+
+
+def synthetic_line(rng):
+    words = [rng.choice(FOOD_WORDS)]
+    if rng.random() < 0.5:
+        words.insert(0, rng.choice(MODIFIER_WORDS))
+    return f"{rng.choice(LINE_AMOUNTS)} {rng.choice(LINE_UNITS)} {' '.join(words)}{rng.choice(LINE_NOTES)}"
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks free-text ingredient line parsing and matching against a synthetic USDA-sized '
+            'food list: matcher build time and recipes parsed per second.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=400_000,
+                            help='Number of synthetic foods to match against.')
+        parser.add_argument('--recipes', type=int, default=10_000,
+                            help='Number of synthetic recipes to parse.')
+        parser.add_argument('--lines-per-recipe', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=7)
+        parser.add_argument('--output', default=None,
+                            help='Write the JSON report to this path.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        size = options['size']
+        rows = [(i, synthetic_food_name(rng, i)) for i in range(1, size + 1)]
+        rows += [(size + i, food['name']) for i, food in enumerate(FIXTURE_INGREDIENTS.values(), start=1)]
+
+        start = time.perf_counter()
+        matcher = IngredientMatcher(rows)
+        build_s = time.perf_counter() - start
+        self.stdout.write(f"Built matcher over {len(rows):,} foods in {build_s:.2f}s")
+
+        recipes = [[synthetic_line(rng) for _ in range(options['lines_per_recipe'])]
+                   for _ in range(options['recipes'])]
+        samples = []
+        matched = lines = 0
+        start = time.perf_counter()
+        for recipe_lines in recipes:
+            recipe_start = time.perf_counter()
+            results = parse_ingredient_lines(recipe_lines, matcher)
+            samples.append((time.perf_counter() - recipe_start) * 1000.0)
+            lines += len(results)
+            matched += sum(1 for result in results if result['ingredient_id'] is not None)
+        parse_s = time.perf_counter() - start
+        per_recipe = latency_summary(samples)
+        recipes_per_s = len(recipes) / parse_s if parse_s else 0.0
+        self.stdout.write(
+            f"Parsed {len(recipes):,} recipes ({lines:,} lines, {matched / lines:.1%} matched) in {parse_s:.2f}s | "
+            f"{recipes_per_s:,.0f} recipes/s | p50 {per_recipe['p50_ms']:.3f} ms | p99 {per_recipe['p99_ms']:.3f} ms")
+        if recipes_per_s:
+            self.stdout.write(f"Projected 100,000 recipes: {100_000 / recipes_per_s / 60:.1f} min")
+
+        report = {
+            'benchmark': 'ingredient_lines',
+            'size': len(rows),
+            'recipes': len(recipes),
+            'lines': lines,
+            'matched': matched,
+            'seed': options['seed'],
+            'metadata': run_metadata(),
+            'build_seconds': round(build_s, 3),
+            'parse_seconds': round(parse_s, 3),
+            'recipes_per_second': round(recipes_per_s, 1),
+            'per_recipe': per_recipe,
+        }
+        if options['output']:
+            write_report(options['output'], report)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
@@ -0,0 +1,98 @@
+from api.benchmarking import fixture_fdc_payload, run_metadata, write_report
+from api.fdc import parse_food
+from api.nutrients import NUTRIENT_MAP, REQUIRED_NUTRIENTS, default_parser
+from django.core.management.base import BaseCommand
+import logging
+import timeit
+
+# Foundation foods report Atwater energy, NLEA fat and carbohydrate by summation instead
+FOUNDATION_IDS = {1008: 2047, 1004: 1085, 1005: 1050}
+
+
+def legacy_extract(food_nutrients):
+    """
+    The extraction parse_food() used before nutrients.py: for each field and each candidate ID,
+    scan the whole list. Kept here as the baseline.
+    """
+    values = {}
+    for field, sources in NUTRIENT_MAP.items():
+        found = False
+        for source in sources:
+            nutrient_id = source[0] if isinstance(source, tuple) else source
+            for entry in food_nutrients:
+                if entry.get('nutrient', {}).get('id') == nutrient_id:
+                    values[field] = entry.get('amount', 0.0)
+                    found = True
+                    break
+            if found:
+                break
+        if not found and field in REQUIRED_NUTRIENTS:
+            return None
+    return values
+
+
+def payload_cases(extra_nutrients):
+    sr_legacy = fixture_fdc_payload('flour', extra_nutrients=extra_nutrients)
+    foundation = fixture_fdc_payload('chicken', extra_nutrients=extra_nutrients)
+    for entry in foundation['foodNutrients']:
+        nutrient = entry['nutrient']
+        nutrient['id'] = FOUNDATION_IDS.get(nutrient['id'], nutrient['id'])
+    missing_core = fixture_fdc_payload('apple', extra_nutrients=extra_nutrients)
+    missing_core['foodNutrients'] = [entry for entry in missing_core['foodNutrients']
+                                     if entry['nutrient']['id'] != 1005]
+    return [('sr_legacy', sr_legacy), ('foundation_fallbacks', foundation), ('missing_core', missing_core)]
+
+
+class Command(BaseCommand):
+    help = ('Micro-benchmarks nutrient extraction on FDC-sized payloads: the indexed parser against '
+            'the per-field list scan it replaced, plus the whole parse_food().')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--extra-nutrients', type=int, default=150,
+                            help='Unrelated foodNutrients entries per food (real foods carry ~150).')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Timing repeats; the fastest one is reported.')
+        parser.add_argument('--output', default=None,
+                            help='Write the JSON report to this path.')
+
+    def _ns_per_op(self, func, repeat):
+        timer = timeit.Timer(func)
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat=repeat, number=number))
+        return round(best / number * 1e9, 1)
+
+    def handle(self, *args, **options):
+        # parse_food() warns about rejected foods; keep that off the console but still evaluated
+        logging.disable(logging.CRITICAL)
+        results = []
+        try:
+            for case, food in payload_cases(options['extra_nutrients']):
+                food_nutrients = food['foodNutrients']
+                indexed_ns = self._ns_per_op(lambda: default_parser.parse(food_nutrients), options['repeat'])
+                legacy_ns = self._ns_per_op(lambda: legacy_extract(food_nutrients), options['repeat'])
+                parse_food_ns = self._ns_per_op(lambda: parse_food(food), options['repeat'])
+                results.append({
+                    'case': case,
+                    'food_nutrients': len(food_nutrients),
+                    'indexed_ns_per_food': indexed_ns,
+                    'legacy_scan_ns_per_food': legacy_ns,
+                    'speedup': round(legacy_ns / indexed_ns, 2),
+                    'parse_food_ns_per_food': parse_food_ns,
+                })
+                self.stdout.write(
+                    f"{case:<22} {len(food_nutrients):>4} nutrients | indexed {indexed_ns:>9,.0f} ns | "
+                    f"legacy scan {legacy_ns:>9,.0f} ns ({legacy_ns / indexed_ns:.1f}x) | "
+                    f"parse_food {parse_food_ns:>9,.0f} ns")
+        finally:
+            logging.disable(logging.NOTSET)
+
+        report = {
+            'benchmark': 'nutrient_parser',
+            'extra_nutrients': options['extra_nutrients'],
+            'repeat': options['repeat'],
+            'metadata': run_metadata(),
+            'cases': results,
+        }
+        if options['output']:
+            write_report(options['output'], report)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
@@ -0,0 +1,124 @@
+from api.benchmarking import FIXTURE_INGREDIENTS, fixture_ingredient, rolled_back, run_metadata, write_report
+from api.models import Ingredient, Recipe, RecipeIngredient
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import logging
+import timeit
+
+# (case name, fixture ingredient, quantity, unit) for each path through get_ingredient_grams
+CONVERSION_CASES = [
+    ('weight_g', 'flour', 100, 'g'),
+    ('weight_kg', 'chicken', 0.5, 'kg'),
+    ('weight_oz', 'chicken', 6, 'oz'),
+    ('weight_lb', 'chicken', 1, 'lb'),
+    ('usda_portion_cup', 'flour', 2, 'cup'),
+    ('usda_portion_tbsp_modifier', 'olive_oil', 1, 'tbsp'),
+    ('usda_portion_tsp_last', 'sugar', 1, 'tsp'),
+    ('piece_direct_unit', 'egg', 2, 'piece'),
+    ('piece_name_match', 'apple', 1, 'piece'),
+    ('ml_fallback_oil', 'olive_oil', 30, 'ml'),
+    ('ml_fallback_water', 'milk', 250, 'ml'),
+    ('fail_unknown_unit', 'sugar', 1, 'fling'),
+    ('fail_no_portions', 'chicken', 1, 'cup'),
+    ('zero_quantity', 'flour', 0, 'g'),
+]
+
+UNITS_FOR_SIZES = ['g', 'cup', 'tbsp', 'ml', 'piece']
+
+
+class Command(BaseCommand):
+    help = ('Micro-benchmarks Recipe.get_ingredient_grams for every conversion path and Recipe.calculate_nutrition '
+            'across recipe sizes, reporting ns/op and queries per recipe.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,5,10,25,50',
+                            help='Comma-separated ingredient counts per recipe for calculate_nutrition.')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Timing repeats; the fastest one is reported.')
+        parser.add_argument('--output', default=None,
+                            help='Write the JSON report to this path.')
+
+    def handle(self, *args, **options):
+        # Logging is part of the hot path, but emitting records to the console would swamp the
+        # numbers; disabling it still evaluates the f-string arguments, like production does.
+        logging.disable(logging.CRITICAL)
+        try:
+            report = {
+                'benchmark': 'nutrition',
+                'repeat': options['repeat'],
+                'metadata': run_metadata(),
+                'conversions': self._bench_conversions(options['repeat']),
+                'recipes': self._bench_recipes(
+                    [int(size) for size in options['sizes'].split(',') if size.strip()], options['repeat']),
+            }
+        finally:
+            logging.disable(logging.NOTSET)
+
+        if options['output']:
+            write_report(options['output'], report)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def _ns_per_op(self, func, repeat):
+        timer = timeit.Timer(func)
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat=repeat, number=number))
+        return round(best / number * 1e9, 1)
+
+    def _bench_conversions(self, repeat):
+        self.stdout.write("get_ingredient_grams:")
+        recipe = Recipe(name='Benchmark recipe')
+        results = []
+        for case, ingredient_key, quantity, unit in CONVERSION_CASES:
+            ri = RecipeIngredient(recipe=recipe, ingredient=fixture_ingredient(ingredient_key),
+                                  quantity=quantity, unit=unit)
+            grams = recipe.get_ingredient_grams(ri)
+            ns = self._ns_per_op(lambda: recipe.get_ingredient_grams(ri), repeat)
+            results.append({'case': case, 'ingredient': ingredient_key, 'quantity': quantity,
+                            'unit': unit, 'grams': grams, 'ns_per_op': ns})
+            self.stdout.write(f"  {case:<28} {ns:>12,.0f} ns/op  -> {grams}")
+        return results
+
+    def _bench_recipes(self, sizes, repeat):
+        self.stdout.write("calculate_nutrition:")
+        results = []
+        with rolled_back():
+            # Enough distinct ingredients for the largest recipe (an ingredient appears once per recipe)
+            keys = list(FIXTURE_INGREDIENTS)
+            ingredients = Ingredient.objects.bulk_create([
+                fixture_ingredient(keys[i % len(keys)], fdc_id=None,
+                                   name=f"{FIXTURE_INGREDIENTS[keys[i % len(keys)]]['name']} #{i}")
+                for i in range(max(sizes))
+            ])
+            for size in sizes:
+                recipe = Recipe.objects.create(
+                    name=f"Benchmark recipe ({size} ingredients)", instructions='', meal_type='dinner')
+                RecipeIngredient.objects.bulk_create([
+                    RecipeIngredient(recipe=recipe, ingredient=ingredient, quantity=1 + i % 3,
+                                     unit=UNITS_FOR_SIZES[i % len(UNITS_FOR_SIZES)])
+                    for i, ingredient in enumerate(ingredients[:size])
+                ])
+
+                with CaptureQueriesContext(connection) as cold:
+                    recipe.calculate_nutrition(save_to_instance=True)
+                # Bulk callers (admin action, imports) prefetch; only the writes should remain
+                prefetched = Recipe.objects.prefetch_related(
+                    'ingredient_details__ingredient').get(pk=recipe.pk)
+                with CaptureQueriesContext(connection) as warm:
+                    prefetched.calculate_nutrition(save_to_instance=True)
+
+                ns = self._ns_per_op(
+                    lambda: recipe.calculate_nutrition(save_to_instance=False), repeat)
+                ns_prefetched = self._ns_per_op(
+                    lambda: prefetched.calculate_nutrition(save_to_instance=False), repeat)
+                results.append({
+                    'ingredients': size,
+                    'ns_per_op': ns,
+                    'ns_per_op_prefetched': ns_prefetched,
+                    'queries_per_recipe': len(cold.captured_queries),
+                    'queries_per_recipe_prefetched': len(warm.captured_queries),
+                })
+                self.stdout.write(
+                    f"  {size:>3} ingredients: {ns:>14,.0f} ns/op ({ns_prefetched:,.0f} prefetched), "
+                    f"{len(cold.captured_queries)} queries/recipe ({len(warm.captured_queries)} prefetched)")
+        return results
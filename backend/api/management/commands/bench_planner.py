@@ -0,0 +1,155 @@
+from api.benchmarking import (
+    create_synthetic_catalog, exact_daily_optimum, latency_summary, rolled_back, run_metadata, write_report)
+from api.catalog import PlannerCatalog
+from api.catalog_snapshot import CatalogSnapshot
+from api.meal_planner_logic import calculate_daily_plan_fitness_score
+from api.models import Ingredient, Recipe, UserProfile
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils.module_loading import import_string
+import logging
+import random
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENGINE = 'api.meal_planner_logic.generate_daily_meal_plan_v1'
+
+# (target_calories, protein %, carbs %, fat %)
+TARGET_MATRIX = [
+    (1600, 30.0, 40.0, 30.0),
+    (2000, 25.0, 50.0, 25.0),
+    (2500, 35.0, 35.0, 30.0),
+    (3200, 20.0, 55.0, 25.0),
+]
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks a meal plan engine against synthetic recipe catalogs of several sizes and a matrix of user '
+            'targets, reporting latency percentiles, peak memory and plan quality versus the exact optimum. '
+            'All data is created inside a transaction that is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='100,1000,10000',
+            help='Comma-separated catalog sizes (e.g. 100,1000,10000,100000,1000000).')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Timed runs per size and target.')
+        parser.add_argument('--seed', type=int, default=42,
+                            help='Seed for the synthetic catalog generator.')
+        parser.add_argument(
+            '--engine', default=DEFAULT_ENGINE,
+            help='Dotted path of the plan function to benchmark; it is called as engine(user_profile).')
+        parser.add_argument(
+            '--snapshot', default=None,
+            help='Benchmark a catalog snapshot (see export_catalog_snapshot) instead of synthetic catalogs.')
+        parser.add_argument(
+            '--exact-limit', type=int, default=1_000_000,
+            help='Skip the exact optimum when either half of the meet-in-the-middle search has more combinations than this.')
+        parser.add_argument('--output', default=None,
+                            help='Write the JSON report to this path.')
+
+    def handle(self, *args, **options):
+        try:
+            engine = import_string(options['engine'])
+        except ImportError as e:
+            raise CommandError(f"Could not import engine: {e}")
+
+        # The per-call logging of the planner would dominate the timings
+        logging.getLogger('api').setLevel(logging.WARNING)
+
+        report = {
+            'benchmark': 'planner',
+            'engine': options['engine'],
+            'repeat': options['repeat'],
+            'seed': options['seed'],
+            'metadata': run_metadata(),
+            'results': [],
+        }
+
+        if options['snapshot']:
+            datasets = [('snapshot', options['snapshot'])]
+        else:
+            try:
+                sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+            except ValueError:
+                raise CommandError("--sizes must be a comma-separated list of integers.")
+            datasets = [('synthetic', size) for size in sizes]
+
+        # Always benchmark against a private, freshly built catalog
+        with override_settings(PLANNER_SHARED_CATALOG=False):
+            for kind, dataset in datasets:
+                with rolled_back():
+                    Recipe.objects.all().delete()
+                    started = time.perf_counter()
+                    if kind == 'snapshot':
+                        Ingredient.objects.all().delete()
+                        with CatalogSnapshot(dataset) as snapshot:
+                            snapshot.restore_to_db()
+                    else:
+                        create_synthetic_catalog(dataset, random.Random(options['seed']))
+                    setup_seconds = time.perf_counter() - started
+                    catalog = PlannerCatalog.from_db()
+                    self.stdout.write(
+                        f"Catalog {dataset}: {len(catalog)} recipes (setup {setup_seconds:.1f}s)")
+
+                    for target in TARGET_MATRIX:
+                        result = self._bench_target(engine, catalog, target, options)
+                        result.update({'dataset': kind, 'catalog_size': len(catalog)})
+                        report['results'].append(result)
+                        self._print_result(result)
+
+        if options['output']:
+            write_report(options['output'], report)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def _bench_target(self, engine, catalog, target, options):
+        calories, protein_pct, carbs_pct, fat_pct = target
+        profile = UserProfile(target_calories=calories, target_protein_percent=protein_pct,
+                              target_carbs_percent=carbs_pct, target_fat_percent=fat_pct)
+
+        # Warm-up run, also used for the quality numbers
+        plan = engine(profile)
+
+        samples_ms = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            engine(profile)
+            samples_ms.append((time.perf_counter() - started) * 1000.0)
+
+        # Separate run: tracemalloc slows allocation-heavy code down considerably
+        tracemalloc.start()
+        engine(profile)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        result = {
+            'target': {'calories': calories, 'protein_percent': protein_pct,
+                       'carbs_percent': carbs_pct, 'fat_percent': fat_pct},
+            'latency': latency_summary(samples_ms),
+            'peak_memory_kb': round(peak_bytes / 1024, 1),
+            'plan_found': plan is not None,
+            'plan_score': None,
+            'optimum_score': None,
+            'quality_gap': None,
+        }
+        if plan is None:
+            return result
+
+        plan_score = calculate_daily_plan_fitness_score(plan['plan_totals'], plan['user_targets'])
+        optimum = exact_daily_optimum(catalog, plan['user_targets'], options['exact_limit'])
+        result['plan_score'] = round(plan_score, 3)
+        if optimum is not None:
+            result['optimum_score'] = round(optimum, 3)
+            # Absolute distance from the optimum, in the same units as the fitness score
+            result['quality_gap'] = round(plan_score - optimum, 3)
+        return result
+
+    def _print_result(self, result):
+        latency = result['latency']
+        target = result['target']
+        self.stdout.write(
+            f"  {target['calories']} kcal: p50 {latency['p50_ms']}ms, p95 {latency['p95_ms']}ms, "
+            f"p99 {latency['p99_ms']}ms, peak {result['peak_memory_kb']}KB, "
+            f"score {result['plan_score']} (optimum {result['optimum_score']})")
@@ -0,0 +1,98 @@
+from api.benchmarking import FIXTURE_INGREDIENTS, fixture_ingredient, rolled_back, run_metadata, write_report
+from api.models import Ingredient, Recipe, RecipeIngredient
+from api.recipe_import import IMPORT_BATCH_SIZE, import_recipe_stream
+from django.core.management.base import BaseCommand
+import logging
+import random
+import time
+
+LINE_UNITS = ['g', 'cup', 'tbsp', 'tsp', 'ml', 'piece']
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks the bulk recipe import (validation, in-memory nutrition, bulk inserts) against '
+            'creating recipes one at a time with calculate_nutrition(), inside a rolled-back transaction.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=20_000,
+                            help='Recipes for the bulk import.')
+        parser.add_argument('--baseline-recipes', type=int, default=500,
+                            help='Recipes for the one-at-a-time baseline.')
+        parser.add_argument('--lines-per-recipe', type=int, default=8)
+        parser.add_argument('--ingredients', type=int, default=2000,
+                            help='Distinct ingredients to draw lines from.')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--seed', type=int, default=7)
+        parser.add_argument('--output', default=None,
+                            help='Write the JSON report to this path.')
+
+    def records(self, rng, count, ingredient_ids, lines_per_recipe, prefix):
+        for i in range(count):
+            yield {
+                'name': f"{prefix} recipe {i}",
+                'instructions': 'Mix and cook.',
+                'meal_type': rng.choice(['breakfast', 'lunch', 'dinner', 'snack']),
+                'ingredients': [
+                    {'ingredient': ingredient_id, 'quantity': rng.choice([0.5, 1, 2, 100]),
+                     'unit': rng.choice(LINE_UNITS)}
+                    for ingredient_id in rng.sample(ingredient_ids, lines_per_recipe)
+                ],
+            }
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        lines_per_recipe = options['lines_per_recipe']
+        # The baseline's calculate_nutrition() logs every line; keep that off the console
+        logging.disable(logging.CRITICAL)
+        try:
+            with rolled_back():
+                keys = list(FIXTURE_INGREDIENTS)
+                ingredients = Ingredient.objects.bulk_create([
+                    fixture_ingredient(keys[i % len(keys)], fdc_id=None,
+                                       name=f"{FIXTURE_INGREDIENTS[keys[i % len(keys)]]['name']} #{i}")
+                    for i in range(options['ingredients'])
+                ])
+                ingredient_ids = [ingredient.pk for ingredient in ingredients]
+
+                start = time.perf_counter()
+                for record in self.records(rng, options['baseline_recipes'], ingredient_ids,
+                                           lines_per_recipe, 'Baseline'):
+                    recipe = Recipe.objects.create(
+                        name=record['name'], instructions=record['instructions'], meal_type=record['meal_type'])
+                    for line in record['ingredients']:
+                        RecipeIngredient.objects.create(
+                            recipe=recipe, ingredient_id=line['ingredient'], quantity=line['quantity'],
+                            unit=line['unit'])
+                    recipe.calculate_nutrition(save_to_instance=True)
+                baseline_s = time.perf_counter() - start
+                baseline_rate = options['baseline_recipes'] / baseline_s if baseline_s else 0.0
+
+                stats = import_recipe_stream(
+                    self.records(rng, options['recipes'], ingredient_ids, lines_per_recipe, 'Bulk'),
+                    options['batch_size'])
+                bulk_rate = stats['created'] / stats['seconds'] if stats['seconds'] else 0.0
+        finally:
+            logging.disable(logging.NOTSET)
+
+        self.stdout.write(
+            f"One at a time: {options['baseline_recipes']:,} recipes in {baseline_s:.2f}s "
+            f"({baseline_rate:,.0f} recipes/s)")
+        self.stdout.write(
+            f"Bulk import:   {stats['created']:,} recipes ({stats['lines']:,} lines) in {stats['seconds']:.2f}s "
+            f"({bulk_rate:,.0f} recipes/s, {bulk_rate / baseline_rate if baseline_rate else 0:.0f}x)")
+
+        report = {
+            'benchmark': 'recipe_import',
+            'recipes': options['recipes'],
+            'baseline_recipes': options['baseline_recipes'],
+            'lines_per_recipe': lines_per_recipe,
+            'batch_size': options['batch_size'],
+            'seed': options['seed'],
+            'metadata': run_metadata(),
+            'baseline_recipes_per_second': round(baseline_rate, 1),
+            'bulk_recipes_per_second': round(bulk_rate, 1),
+            'bulk_seconds': round(stats['seconds'], 3),
+        }
+        if options['output']:
+            write_report(options['output'], report)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
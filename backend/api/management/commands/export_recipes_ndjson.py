@@ -0,0 +1,33 @@
+from api.export import EXPORT_CHUNK_SIZE, iter_recipe_ndjson
+from django.core.management.base import BaseCommand
+import sys
+import time
+
+
+class Command(BaseCommand):
+    help = 'Streams every recipe with nutrition and ingredients as newline-delimited JSON, in constant memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None,
+                            help='File to write; defaults to stdout.')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help='Recipes loaded per query.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        lines = 0
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for block in iter_recipe_ndjson(options['chunk_size']):
+                out.write(block)
+                lines += block.count(b'\n')
+        finally:
+            if options['output']:
+                out.close()
+            else:
+                out.flush()
+
+        elapsed = time.perf_counter() - start
+        # Progress goes to stderr so stdout stays valid NDJSON
+        self.stderr.write(self.style.SUCCESS(
+            f"Exported {lines} recipes in {elapsed:.2f}s ({lines / elapsed if elapsed else 0:,.0f} recipes/s)."))
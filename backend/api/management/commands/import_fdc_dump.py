@@ -0,0 +1,42 @@
+from api.fdc_dump import DUMP_BATCH_SIZE, DumpFormatError, DumpSource, import_foods, iter_dump_foods
+from django.core.management.base import BaseCommand, CommandError
+import os
+
+
+class Command(BaseCommand):
+    help = ('Imports ingredients from a USDA FoodData Central bulk download (JSON or CSV, optionally '
+            'zipped) in bounded memory, without network access or API quota.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path',
+                            help='FDC .json file, CSV directory, or the downloaded .zip of either.')
+        parser.add_argument('--batch-size', type=int, default=DUMP_BATCH_SIZE,
+                            help='Foods upserted per transaction.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"'{path}' does not exist.")
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        def progress(stats):
+            rate = stats['read'] / stats['seconds'] if stats['seconds'] else 0
+            self.stdout.write(
+                f"{stats['read']:,} foods read | {stats['created']:,} created | {stats['updated']:,} updated | "
+                f"{stats['unchanged']:,} unchanged | {stats['skipped']:,} skipped | {rate:,.0f} rows/s")
+
+        source = DumpSource(path)
+        try:
+            self.stdout.write(f"Importing {source.format.upper()} dump '{path}'...")
+            stats = import_foods(iter_dump_foods(source), options['batch_size'], progress)
+        except DumpFormatError as e:
+            raise CommandError(str(e))
+        finally:
+            source.close()
+
+        rate = stats['read'] / stats['seconds'] if stats['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['created'] + stats['updated']:,} ingredients ({stats['created']:,} created, "
+            f"{stats['updated']:,} updated, {stats['unchanged']:,} unchanged, {stats['skipped']:,} skipped) "
+            f"in {stats['seconds']:.1f}s ({rate:,.0f} rows/s)."))
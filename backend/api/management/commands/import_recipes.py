@@ -0,0 +1,62 @@
+from api.fdc_dump import DumpFormatError
+from api.recipe_import import (
+    IMPORT_BATCH_SIZE, ON_CONFLICT_ERROR, ON_CONFLICT_SKIP, RecipeImportError, import_recipe_stream,
+    iter_recipe_records)
+from django.core.management.base import BaseCommand, CommandError
+import os
+import sys
+
+# Validation errors printed before giving up on a batch
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = ('Bulk-imports recipes from JSON or NDJSON (the recipes/export/ shape, with ingredient lines '
+            'as IDs, FDC IDs or free text), validating each batch before inserting it in one transaction.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="JSON array or NDJSON file; '-' reads NDJSON from stdin.")
+        parser.add_argument('--format', choices=['json', 'ndjson'], default=None,
+                            help='Input format; defaults to the file extension (.json is a JSON array).')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help='Recipes validated and inserted per transaction.')
+        parser.add_argument('--skip-existing', action='store_true',
+                            help='Skip recipes whose name already exists instead of failing, e.g. to resume.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if path != '-' and not os.path.exists(path):
+            raise CommandError(f"'{path}' does not exist.")
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        format = options['format'] or ('json' if path.lower().endswith('.json') else 'ndjson')
+        on_conflict = ON_CONFLICT_SKIP if options['skip_existing'] else ON_CONFLICT_ERROR
+
+        def progress(stats):
+            rate = stats['read'] / stats['seconds'] if stats['seconds'] else 0
+            self.stdout.write(
+                f"{stats['read']:,} recipes read | {stats['created']:,} created | {stats['skipped']:,} skipped | "
+                f"{stats['lines']:,} lines ({stats['unconvertible_lines']:,} unconvertible) | {rate:,.0f} recipes/s")
+
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8-sig')
+        try:
+            stats = import_recipe_stream(
+                iter_recipe_records(stream, format), options['batch_size'], on_conflict, progress)
+        except RecipeImportError as e:
+            for error in e.errors[:MAX_REPORTED_ERRORS]:
+                self.stderr.write(f"Recipe #{error['index']} ({error['name']!r}): {error['errors']}")
+            if len(e.errors) > MAX_REPORTED_ERRORS:
+                self.stderr.write(f"... and {len(e.errors) - MAX_REPORTED_ERRORS} more.")
+            raise CommandError(
+                f"{e} The batch was not imported; earlier batches were. Fix the input and rerun with "
+                f"--skip-existing to resume.")
+        except (ValueError, DumpFormatError) as e:
+            raise CommandError(f"Invalid input: {e}")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        rate = stats['read'] / stats['seconds'] if stats['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['created']:,} recipes ({stats['skipped']:,} skipped, {stats['lines']:,} ingredient "
+            f"lines, {stats['unconvertible_lines']:,} unconvertible) in {stats['seconds']:.1f}s ({rate:,.0f} recipes/s)."))
@@ -0,0 +1,44 @@
+from api.catalog import publish_catalog
+from api.catalog_snapshot import CatalogSnapshot
+from api.models import Ingredient, Recipe
+from django.core.management.base import BaseCommand, CommandError
+import time
+
+
+class Command(BaseCommand):
+    help = 'Loads a binary catalog snapshot and publishes it as the shared planner catalog (or restores it into an empty database).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Snapshot file written by export_catalog_snapshot.')
+        parser.add_argument(
+            '--into-db', action='store_true',
+            help='Restore recipes and ingredients into the (empty) database instead of publishing to shared memory.')
+        parser.add_argument(
+            '--name', default=None,
+            help='Shared memory segment name (defaults to settings.PLANNER_CATALOG_SHM_NAME).')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            snapshot = CatalogSnapshot(options['path'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not open snapshot: {e}")
+
+        with snapshot:
+            if options['into_db']:
+                if Recipe.objects.exists() or Ingredient.objects.exists():
+                    raise CommandError(
+                        "--into-db requires an empty recipe and ingredient catalog.")
+                counts = snapshot.restore_to_db()
+                elapsed = time.perf_counter() - started
+                self.stdout.write(self.style.SUCCESS(
+                    f"Restored {counts['recipes']} recipes, {counts['ingredients']} ingredients and "
+                    f"{counts['recipe_ingredients']} recipe ingredients in {elapsed:.2f}s."))
+                return
+
+            catalog = snapshot.to_planner_catalog()
+            generation = publish_catalog(catalog, name=options['name'])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f"Published {len(catalog)} recipes from snapshot as planner catalog generation {generation} "
+                f"in {elapsed * 1000:.1f}ms."))
@@ -1,8 +1,14 @@
-
 from .pre_vetted_ingredients import PRE_VETTED_INGREDIENTS
+from api.fdc import (
+    API_BASE_URL, DEFAULT_BURST, DEFAULT_MAX_RETRIES, DEFAULT_WORKERS, MAX_IDS_PER_REQUEST,
+    FDC_VERSION_FIELDS, USDA_HOURLY_QUOTA, WRITE_BATCH_SIZE, FDCClient, FDCError, IngredientWriter,
+    TokenBucket, fetch_food_batches, iter_listed_versions, parse_food,
+)
 from api.models import Ingredient
+from api.fdc_cache import FDCResponseCache, IngestionJournal
+from django.conf import settings
 from django.core.management.base import BaseCommand
-import requests
+import json
 import time
 import logging
 from dotenv import load_dotenv
@@ -19,133 +25,232 @@ logger = logging.getLogger(__name__)
 # --- CONFIGURATION ---
 
 USDA_API_KEY = os.getenv("USDA_API_KEY")
-if not USDA_API_KEY:
-    logger.error("USDA_API_KEY not found in .env file.")
-    exit()
-
-# Nutrient IDs we are interested in
-NUTRIENT_MAP = {
-    # Energy (kcal), Energy Atwater Specific, Energy Atwater General
-    'calories': (1008, 2048, 2047),
-    'protein': (1003,),
-    'fat': (1004,),      # Total lipid (fat)
-    'carbs': (1005,)     # Carbohydrate, by difference
-}
-
-API_BASE_URL = "https://api.nal.usda.gov/fdc/v1/food/"
-REQUEST_DELAY_SECONDS = 2
+JOURNAL_FILE_NAME = 'populate_ingredients.journal'
 
 
 class Command(BaseCommand):
     help = 'Populates the Ingredient database with data from USDA FDC API using a pre-vetted list of FDC IDs.'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                            help='Maximum number of requests in flight.')
+        parser.add_argument('--hourly-quota', type=int, default=USDA_HOURLY_QUOTA,
+                            help='Requests allowed per rolling hour by the API key.')
+        parser.add_argument('--burst', type=int, default=DEFAULT_BURST,
+                            help='Requests that may be sent back to back before the hourly rate applies.')
+        parser.add_argument('--batch-size', type=int, default=MAX_IDS_PER_REQUEST,
+                            help=f'FDC IDs per request to the multi-food endpoint (1-{MAX_IDS_PER_REQUEST}).')
+        parser.add_argument('--write-batch-size', type=int, default=WRITE_BATCH_SIZE,
+                            help='Ingredients upserted per database transaction.')
+        parser.add_argument('--max-retries', type=int, default=DEFAULT_MAX_RETRIES,
+                            help='Retries per request on 429/5xx responses and connection errors.')
+        parser.add_argument('--base-url', default=API_BASE_URL,
+                            help='FDC API base URL (e.g. a local stub server).')
+        parser.add_argument('--api-key', default=None,
+                            help='Overrides USDA_API_KEY from the environment.')
+        parser.add_argument('--cache-dir', default=str(settings.FDC_CACHE_DIR),
+                            help='Directory of raw API responses and the checkpoint journal.')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore the checkpoint journal of an interrupted run and process every ID.')
+        parser.add_argument('--refresh', action='store_true',
+                            help='Fetch every food from the API even when a cached response exists.')
+        parser.add_argument('--offline', action='store_true',
+                            help='Only re-parse cached responses; never call the API '
+                                 '(with --restart: re-derive all ingredients after a parser change).')
+        parser.add_argument('--sync', action='store_true',
+                            help='Check foods/list for publication/modified dates and only fetch foods that '
+                                 'changed since they were stored (or were never stored).')
+        parser.add_argument('--changed-ids-output', default=None,
+                            help='Write the IDs of ingredients whose values changed to this JSON file, '
+                                 'for downstream recipe recomputation.')
+
     def handle(self, *args, **options):
-        if not USDA_API_KEY:
+        api_key = options['api_key'] or USDA_API_KEY
+        if not api_key and not options['offline']:
             logger.error("Exiting: USDA_API_KEY is not configured.")
             return
+        batch_size = options['batch_size']
+        if not 1 <= batch_size <= MAX_IDS_PER_REQUEST:
+            logger.error(f"Exiting: --batch-size must be between 1 and {MAX_IDS_PER_REQUEST}.")
+            return
+        if options['offline'] and (options['refresh'] or options['sync']):
+            logger.error("Exiting: --offline can't be combined with --refresh or --sync.")
+            return
 
         logger.info("Starting ingredient population process...")
-        ingredients_added = 0
-        ingredients_updated = 0
+        start = time.perf_counter()
         ingredients_failed = 0
+        # Failures a rerun can fix (fetch errors, missing cached responses) keep the journal alive
+        ingredients_retryable = 0
 
+        common_names = {}
         for common_name, fdc_id_str in PRE_VETTED_INGREDIENTS:
             try:
-                current_fdc_id = int(fdc_id_str)
+                common_names[int(fdc_id_str)] = common_name
             except ValueError:
                 logger.error(
                     f"Invalid FDC ID format: {fdc_id_str} for {common_name}. Skipping.")
                 ingredients_failed += 1
-                continue
 
-            logger.info(
-                f"Processing: {common_name} (FDC ID: {current_fdc_id})")
+        # --- Resume state ---
+        cache = FDCResponseCache(options['cache_dir'])
+        journal = IngestionJournal(os.path.join(options['cache_dir'], JOURNAL_FILE_NAME))
+        if options['restart']:
+            journal.clear()
+        elif len(journal):
+            logger.warning(f"Resuming: skipping {len(journal)} FDC IDs completed by an earlier run "
+                           f"(--restart processes them again).")
+        pending_ids = [fdc_id for fdc_id in common_names if fdc_id not in journal]
+
+        client = None
+        if options['sync']:
+            client = self.make_client(api_key, options)
+            pending_ids = self.changed_fdc_ids(client, pending_ids)
+        # Foods that changed upstream must be refetched, not re-parsed from the cache
+        cached_ids = [] if options['refresh'] or options['sync'] else [
+            fdc_id for fdc_id in pending_ids if fdc_id in cache]
+        cached = set(cached_ids)
+        fetch_ids = [fdc_id for fdc_id in pending_ids if fdc_id not in cached]
+
+        def store(data):
+            current_fdc_id = data.get('fdcId')
+            common_name = common_names.get(current_fdc_id)
+            if common_name is None:
+                return 0
+            fields = parse_food(data, fallback_name=common_name)
+            if fields is None:
+                logger.warning(
+                    f"Skipping {common_name} (FDC ID: {current_fdc_id}): missing a core nutrient.")
+                return 1
+            writer.add(current_fdc_id, fields)
+            return 0
+
+        changed_ingredient_ids = set()
+
+        def log_written(created, updated, unchanged):
+            for ingredient_obj in created:
+                logger.info(f"CREATED: {ingredient_obj.name} with FDC ID {ingredient_obj.fdc_id}")
+            for ingredient_obj in updated:
+                logger.info(f"UPDATED: {ingredient_obj.name} with FDC ID {ingredient_obj.fdc_id}")
+            changed_ingredient_ids.update(ingredient_obj.pk for ingredient_obj in created + updated)
+            journal.mark_completed(ingredient_obj.fdc_id for ingredient_obj in created + updated + unchanged)
+
+        writer = IngredientWriter(options['write_batch_size'], on_flush=log_written)
+        # Parsed foods are written in chunks of --write-batch-size, one transaction each
+        with writer:
+            if cached_ids:
+                logger.info(f"Re-parsing {len(cached_ids)} cached responses.")
+            for current_fdc_id in cached_ids:
+                data = cache.get(current_fdc_id)
+                if data is None:
+                    fetch_ids.append(current_fdc_id)
+                    continue
+                ingredients_failed += store(data)
+
+            if options['offline']:
+                for current_fdc_id in fetch_ids:
+                    logger.error(
+                        f"No cached response for {common_names[current_fdc_id]} (FDC ID: {current_fdc_id}).")
+                ingredients_failed += len(fetch_ids)
+                ingredients_retryable += len(fetch_ids)
+                fetch_ids = []
+
+            if fetch_ids and client is None:
+                client = self.make_client(api_key, options)
             try:
-                params = {
-                    'api_key': USDA_API_KEY,
-                    'format': 'full'
-                }
-                response = requests.get(
-                    f"{API_BASE_URL}{current_fdc_id}", params=params)
-                response.raise_for_status()  # Raises an HTTPError for bad responses (4XX or 5XX)
-                data = response.json()
-
-                # --- Extract required nutrients ---
-                nutrients_data = {}
-                found_all_core_macros = True
-
-                for key, ids_tuple in NUTRIENT_MAP.items():
-                    nutrient_found = False
-                    for nutrient_id_to_check in ids_tuple:
-                        for nutrient_entry in data.get('foodNutrients', []):
-                            if nutrient_entry.get('nutrient', {}).get('id') == nutrient_id_to_check:
-                                # We assume data is per 100g as per USDA standard for these core nutrients
-                                nutrients_data[key] = nutrient_entry.get(
-                                    'amount', 0.0)
-                                nutrient_found = True
-                                break  # Found the preferred ID for this nutrient type
-                        if nutrient_found:
-                            # Moved to the next nutrient type (calories, protein, etc.)
-                            break
-
-                    # Core macros
-                    if not nutrient_found and key in ['protein', 'fat', 'carbs']:
-                        logger.warning(
-                            f"Core nutrient '{key}' not found for {common_name} (FDC ID: {current_fdc_id}). Skipping this ingredient.")
-                        found_all_core_macros = False
-                        break  # Stop processing this ingredient if a core macro is missing
-
-                if not found_all_core_macros:
-                    ingredients_failed += 1
-                    continue  # Skip to the next ingredient in the pre-vetted list
-
-                # --- Extract and store foodPortions ---
-                food_portions_data = data.get('foodPortions', [])
-
-                # Get the official description from API
-                ingredient_api_description = data.get(
-                    'description', common_name).strip()
-
-                # Create or update the ingredient in the database
-                ingredient_obj, created = Ingredient.objects.update_or_create(
-                    fdc_id=current_fdc_id,
-                    defaults={
-                        'name': ingredient_api_description,
-                        'calories_per_100g': nutrients_data.get('calories', 0.0),
-                        'protein_per_100g': nutrients_data.get('protein', 0.0),
-                        'fat_per_100g': nutrients_data.get('fat', 0.0),
-                        'carbs_per_100g': nutrients_data.get('carbs', 0.0),
-                        'usda_food_portions': food_portions_data,
-                        # 'base_unit' is already 'g' by default
-                    }
-                )
-
-                if created:
-                    logger.info(
-                        f"CREATED: {ingredient_obj.name} with FDC ID {current_fdc_id}")
-                    ingredients_added += 1
-                else:
-                    logger.info(
-                        f"UPDATED: {ingredient_obj.name} with FDC ID {current_fdc_id}")
-                    ingredients_updated += 1
-
-            except requests.exceptions.HTTPError as e:
-                logger.error(
-                    f"HTTP error for {common_name} (FDC ID: {current_fdc_id}): {e.response.status_code} - {e.response.text}")
-                ingredients_failed += 1
-            except requests.exceptions.RequestException as e:
-                logger.error(
-                    f"Request failed for {common_name} (FDC ID: {current_fdc_id}): {e}")
-                ingredients_failed += 1
-            except Exception as e:
-                logger.error(
-                    f"An unexpected error occurred for {common_name} (FDC ID: {current_fdc_id}): {e}")
-                ingredients_failed += 1
+                if fetch_ids:
+                    failed, retryable = self.fetch_and_store(
+                        client, fetch_ids, batch_size, options['workers'], common_names, cache, store)
+                    ingredients_failed += failed
+                    ingredients_retryable += retryable
+            finally:
+                if client is not None:
+                    client.close()
+        ingredients_added = writer.created
+        ingredients_updated = writer.updated
+
+        changed_ingredient_ids.discard(None)
+        if options['changed_ids_output']:
+            with open(options['changed_ids_output'], 'w') as f:
+                json.dump(sorted(changed_ingredient_ids), f)
+        logger.info(f"{len(changed_ingredient_ids)} ingredients changed; {writer.unchanged} were already up to date.")
 
-            logger.info(
-                f"Waiting for {REQUEST_DELAY_SECONDS} seconds before next request...")
-            time.sleep(REQUEST_DELAY_SECONDS)
+        # Without fetch failures the next run starts from scratch: foods missing a core nutrient
+        # or unknown to the API would fail again and must not pin the journal forever
+        if ingredients_retryable == 0:
+            journal.clear()
+        else:
+            logger.warning(f"{len(journal)} FDC IDs checkpointed; rerun to retry the "
+                           f"{ingredients_retryable} that could not be fetched.")
 
         logger.info("Ingredient population process finished.")
         logger.info(
-            f"Summary: Added: {ingredients_added}, Updated: {ingredients_updated}, Failed: {ingredients_failed}")
+            f"Summary: Added: {ingredients_added}, Updated: {ingredients_updated}, Failed: {ingredients_failed} "
+            f"({client.requests_made if client else 0} requests in {time.perf_counter() - start:.1f}s)")
+
+    def make_client(self, api_key, options):
+        return FDCClient(
+            api_key,
+            base_url=options['base_url'],
+            rate_limiter=TokenBucket.for_hourly_quota(options['hourly_quota'], options['burst']),
+            pool_size=options['workers'],
+            max_retries=options['max_retries'],
+        )
+
+    def changed_fdc_ids(self, client, fdc_ids):
+        """
+        The subset of `fdc_ids` whose publication/modified dates in foods/list differ from the
+        stored ones, plus IDs that were never stored or aren't listed.
+        """
+        rows = Ingredient.objects.filter(fdc_id__in=fdc_ids).values_list('fdc_id', *FDC_VERSION_FIELDS)
+        stored = {fdc_id: (publication_date, modified_date)
+                  for fdc_id, _, publication_date, modified_date in rows}
+        data_types = sorted({data_type for _, data_type, _, _ in rows if data_type})
+        wanted = set(fdc_ids)
+        listed = {}
+        if data_types and wanted:
+            last_wanted = max(wanted)
+            try:
+                # Listed in FDC ID order, so paging stops after the highest ID we track
+                for fdc_id, publication_date, modified_date in iter_listed_versions(client, data_types):
+                    if fdc_id in wanted:
+                        listed[fdc_id] = (publication_date, modified_date)
+                    if fdc_id >= last_wanted:
+                        break
+            except FDCError as e:
+                logger.error(f"Listing {', '.join(data_types)} foods failed ({e}); fetching every food.")
+                return list(fdc_ids)
+
+        changed = [fdc_id for fdc_id in fdc_ids
+                   if fdc_id not in listed or listed[fdc_id] != stored.get(fdc_id)]
+        logger.info(
+            f"Sync: {len(changed)} of {len(fdc_ids)} foods are new or changed "
+            f"({client.requests_made} list requests).")
+        return changed
+
+    def fetch_and_store(self, client, fetch_ids, batch_size, workers, common_names, cache, store):
+        """
+        Fetches `fetch_ids` in batches, caching each raw food before storing it.
+        Returns the number of failed IDs and how many of them failed to fetch (worth retrying).
+        """
+        failed = retryable = 0
+        # Requests run on a thread pool; caching, parsing and DB writes stay on this thread
+        for batch_ids, foods, error in fetch_food_batches(client, fetch_ids, batch_size, workers):
+            if error is not None:
+                logger.error(f"Fetch failed for FDC IDs {', '.join(map(str, batch_ids))}: {error}")
+                failed += len(batch_ids)
+                retryable += len(batch_ids)
+                continue
+
+            for data in foods:
+                if data.get('fdcId') in common_names:
+                    cache.put(data)
+                failed += store(data)
+
+            returned = {data.get('fdcId') for data in foods}
+            for current_fdc_id in batch_ids:
+                if current_fdc_id not in returned:
+                    logger.error(
+                        f"FDC ID {current_fdc_id} ({common_names[current_fdc_id]}) was not returned by the API.")
+                    failed += 1
+        return failed, retryable
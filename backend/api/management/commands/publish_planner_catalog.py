@@ -0,0 +1,33 @@
+from api.catalog import publish_catalog, unlink_catalog, get_shared_catalog
+from django.core.management.base import BaseCommand
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Publishes the meal planner catalog (per-meal-type recipe IDs and macros) into shared memory for all workers on this node.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--name', default=None,
+            help='Shared memory segment name (defaults to settings.PLANNER_CATALOG_SHM_NAME).')
+        parser.add_argument(
+            '--unlink', action='store_true',
+            help='Remove the published catalog instead of publishing a new generation.')
+
+    def handle(self, *args, **options):
+        if options['unlink']:
+            if unlink_catalog(options['name']):
+                self.stdout.write(self.style.SUCCESS(
+                    "Removed the shared planner catalog."))
+            else:
+                self.stdout.write("No shared planner catalog is published.")
+            return
+
+        generation = publish_catalog(name=options['name'])
+        catalog = get_shared_catalog(options['name'])
+        counts = ", ".join(
+            f"{meal_type}: {len(ids)}" for meal_type, ids in catalog.ids.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Published planner catalog generation {generation} ({counts})."))
@@ -0,0 +1,22 @@
+from api.search import rebuild_index, search_vendor
+from django.core.management.base import BaseCommand
+from django.db import transaction
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the recipe full-text search index (name, description, ingredient names) from the database.'
+
+    def handle(self, *args, **options):
+        if not search_vendor():
+            self.stdout.write(
+                "This database backend has no full-text index; search falls back to icontains lookups.")
+            return
+        start = time.perf_counter()
+        with transaction.atomic():
+            count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} recipes in {time.perf_counter() - start:.2f}s."))
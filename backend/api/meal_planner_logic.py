@@ -1,5 +1,7 @@
 import random
 from .models import Recipe
+from .catalog import load_planner_catalog
+from .instrumentation import PhaseTimer
 import logging
 
 logger = logging.getLogger(__name__)
@@ -54,7 +56,16 @@ def calculate_daily_plan_fitness_score(plan_totals, user_daily_targets):
     return score
 
 
-def generate_daily_meal_plan_v1(user_profile):
+def generate_daily_meal_plan_v1(user_profile, timer=None):
+    # Pass a PhaseTimer to collect per-phase timings and query counts;
+    # they are also returned under "timings" when a plan is found.
+    if timer is None:
+        timer = PhaseTimer()
+    with timer.recording():
+        return _generate_daily_meal_plan(user_profile, timer)
+
+
+def _generate_daily_meal_plan(user_profile, timer):
     target_calories = user_profile.target_calories
     # Convert percentages to grams
     target_protein_g = (
@@ -74,28 +85,26 @@ def generate_daily_meal_plan_v1(user_profile):
     logger.info(
         f"Attempting to generate meal plan for targets: {user_daily_targets}")
 
-    # Fetch all relevant recipes once
-    all_recipes = list(Recipe.objects.filter(
-        total_calories__isnull=False  # Ensure recipes have calculated nutrition
-    ))
+    # Fetch all relevant recipes once, as a flat per-meal-type catalog of IDs and macros
+    # (the catalog is bucketed by meal type while it is read, so this phase covers both)
+    with timer.phase('catalog'):
+        catalog = load_planner_catalog()
 
-    if not all_recipes:
+    if not len(catalog):
         logger.warning(
             "No recipes with calculated nutrition found in the database.")
         return None  # Or raise an error
 
-    recipes_by_meal_type = {
-        meal_type: [r for r in all_recipes if r.meal_type == meal_type]
-        for meal_type in MEAL_SLOTS_ORDER
-    }
-
     best_plan = None
     best_plan_score = float('inf')
     best_plan_totals = {}
+    best_plan_nutrition = {}
 
     for attempt in range(NUM_ATTEMPTS):
-        # Stores Recipe objects: {'breakfast': recipe_obj, ...}
+        # Stores recipe IDs: {'breakfast': recipe_id, ...}
         current_day_plan_recipes = {}
+        # Nutrition of each chosen recipe, by meal slot
+        current_day_nutrition = {}
         current_day_totals = {'calories': 0,
                               'protein': 0, 'carbs': 0, 'fat': 0}
 
@@ -104,7 +113,7 @@ def generate_daily_meal_plan_v1(user_profile):
 
         possible_attempt = True
         for meal_slot in MEAL_SLOTS_ORDER:
-            if not recipes_by_meal_type.get(meal_slot):
+            if not catalog.count(meal_slot):
                 logger.debug(
                     f"Attempt {attempt+1}: No recipes for meal slot {meal_slot}. Skipping slot.")
                 # Mark slot as empty
@@ -130,23 +139,18 @@ def generate_daily_meal_plan_v1(user_profile):
             }
 
             candidate_recipes = []
-            for recipe in recipes_by_meal_type[meal_slot]:
-                recipe_nutrition = {
-                    'calories': recipe.total_calories or 0,
-                    'protein': recipe.total_protein_g or 0,
-                    'carbs': recipe.total_carbs_g or 0,
-                    'fat': recipe.total_fat_g or 0,
-                }
-                # Simple check: don't pick a recipe that alone exceeds remaining daily calories by too much
-                # This constraint needs careful tuning.
-                if recipe_nutrition['calories'] > remaining_targets_for_attempt['calories'] * 1.5 and \
-                   sum(1 for r in current_day_plan_recipes.values() if r is not None) < len(MEAL_SLOTS_ORDER) - 1:  # if not the last meal
-                    continue  # Too big for this slot given what's remaining
-
-                score = calculate_recipe_fitness_score(
-                    recipe_nutrition, meal_slot_ideal_targets)
-                candidate_recipes.append(
-                    {'recipe': recipe, 'score': score, 'nutrition': recipe_nutrition})
+            with timer.phase('scoring'):
+                for recipe_id, recipe_nutrition in catalog.iter_recipes(meal_slot):
+                    # Simple check: don't pick a recipe that alone exceeds remaining daily calories by too much
+                    # This constraint needs careful tuning.
+                    if recipe_nutrition['calories'] > remaining_targets_for_attempt['calories'] * 1.5 and \
+                       sum(1 for r in current_day_plan_recipes.values() if r is not None) < len(MEAL_SLOTS_ORDER) - 1:  # if not the last meal
+                        continue  # Too big for this slot given what's remaining
+
+                    score = calculate_recipe_fitness_score(
+                        recipe_nutrition, meal_slot_ideal_targets)
+                    candidate_recipes.append(
+                        {'recipe_id': recipe_id, 'score': score, 'nutrition': recipe_nutrition})
 
             if not candidate_recipes:
                 logger.debug(
@@ -154,18 +158,20 @@ def generate_daily_meal_plan_v1(user_profile):
                 possible_attempt = False
                 break  # This attempt failed to fill a slot
 
-            candidate_recipes.sort(key=lambda x: x['score'])
+            with timer.phase('selection'):
+                candidate_recipes.sort(key=lambda x: x['score'])
 
-            # Selection strategy: pick best, or one of top few randomly
-            # For now, let's pick the best one that fits reasonably
-            selected_candidate = None
-            for cand in candidate_recipes[:5]:  # Check top 5
-                # A more refined check against remaining_targets_for_attempt could go here
-                selected_candidate = cand
-                break
+                # Selection strategy: pick best, or one of top few randomly
+                # For now, let's pick the best one that fits reasonably
+                selected_candidate = None
+                for cand in candidate_recipes[:5]:  # Check top 5
+                    # A more refined check against remaining_targets_for_attempt could go here
+                    selected_candidate = cand
+                    break
 
             if selected_candidate:
-                current_day_plan_recipes[meal_slot] = selected_candidate['recipe']
+                current_day_plan_recipes[meal_slot] = selected_candidate['recipe_id']
+                current_day_nutrition[meal_slot] = selected_candidate['nutrition']
                 for key in current_day_totals:
                     current_day_totals[key] += selected_candidate['nutrition'][key]
                 # Update remaining targets (simplified: just subtract from total for fitness check)
@@ -178,8 +184,9 @@ def generate_daily_meal_plan_v1(user_profile):
 
         # Ensure main meals are filled
         if possible_attempt and all(current_day_plan_recipes.get(slot) for slot in ['breakfast', 'lunch', 'dinner']):
-            daily_score = calculate_daily_plan_fitness_score(
-                current_day_totals, user_daily_targets)
+            with timer.phase('selection'):
+                daily_score = calculate_daily_plan_fitness_score(
+                    current_day_totals, user_daily_targets)
             logger.debug(
                 f"Attempt {attempt+1}: Plan generated with score {daily_score:.2f}. Totals: C:{current_day_totals['calories']:.0f}, P:{current_day_totals['protein']:.0f}, C:{current_day_totals['carbs']:.0f}, F:{current_day_totals['fat']:.0f}")
 
@@ -195,6 +202,7 @@ def generate_daily_meal_plan_v1(user_profile):
                 best_plan_score = daily_score
                 best_plan = current_day_plan_recipes
                 best_plan_totals = current_day_totals
+                best_plan_nutrition = current_day_nutrition
         else:
             logger.debug(
                 f"Attempt {attempt+1}: Failed to generate a complete plan (main meals not filled or early exit).")
@@ -202,10 +210,24 @@ def generate_daily_meal_plan_v1(user_profile):
     if best_plan:
         logger.info(
             f"Best plan found with score {best_plan_score:.2f}. Totals: C:{best_plan_totals['calories']:.0f}, P:{best_plan_totals['protein']:.0f}, C:{best_plan_totals['carbs']:.0f}, F:{best_plan_totals['fat']:.0f}")
+        # Hydrate the chosen recipe IDs into Recipe objects in one query
+        with timer.phase('hydration'):
+            chosen_recipes = Recipe.objects.in_bulk(
+                [recipe_id for recipe_id in best_plan.values() if recipe_id is not None])
+        plan_recipes = {}
+        for meal_slot, recipe_id in best_plan.items():
+            plan_recipes[meal_slot] = chosen_recipes.get(recipe_id) if recipe_id is not None else None
+            if recipe_id is not None and plan_recipes[meal_slot] is None:
+                # Deleted since the catalog was built; drop the slot and its share of the totals
+                logger.warning(
+                    f"Recipe ID {recipe_id} chosen for {meal_slot} no longer exists. Dropping it from the plan.")
+                for key in best_plan_totals:
+                    best_plan_totals[key] -= best_plan_nutrition[meal_slot][key]
         return {
-            "plan_recipes": best_plan,  # Dict of {'breakfast': RecipeObj, ...}
+            "plan_recipes": plan_recipes,  # Dict of {'breakfast': RecipeObj, ...}
             "plan_totals": best_plan_totals,
-            "user_targets": user_daily_targets
+            "user_targets": user_daily_targets,
+            "timings": timer.as_dict()
         }
     else:
         logger.warning(
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:51
+
+from django.db import migrations, models
+
+from api.search import FTS_TABLE, POSTGRES_SEARCH_CONFIG, create_index_table, drop_index_table
+
+
+def create_search_index(apps, schema_editor):
+    create_index_table(schema_editor)
+    vendor = schema_editor.connection.vendor
+    # Backfill existing recipes in one statement
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description, ingredients) "
+            f"SELECT r.id, r.name, COALESCE(r.description, ''), COALESCE(("
+            f"SELECT group_concat(i.name, ' ') FROM api_recipeingredient ri "
+            f"JOIN api_ingredient i ON i.id = ri.ingredient_id WHERE ri.recipe_id = r.id), '') "
+            f"FROM api_recipe r")
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (recipe_id, document) "
+            f"SELECT r.id, "
+            f"setweight(to_tsvector('{POSTGRES_SEARCH_CONFIG}', r.name), 'A') || "
+            f"setweight(to_tsvector('{POSTGRES_SEARCH_CONFIG}', COALESCE(r.description, '')), 'C') || "
+            f"setweight(to_tsvector('{POSTGRES_SEARCH_CONFIG}', COALESCE(("
+            f"SELECT string_agg(i.name, ' ') FROM api_recipeingredient ri "
+            f"JOIN api_ingredient i ON i.id = ri.ingredient_id WHERE ri.recipe_id = r.id), '')), 'B') "
+            f"FROM api_recipe r")
+
+
+def drop_search_index(apps, schema_editor):
+    drop_index_table(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_catalogversion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['meal_type', 'total_calories'], name='recipe_meal_calories_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['meal_type', 'total_protein_g'], name='recipe_meal_protein_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['meal_type', 'total_carbs_g'], name='recipe_meal_carbs_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['meal_type', 'total_fat_g'], name='recipe_meal_fat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['total_calories'], name='recipe_calories_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
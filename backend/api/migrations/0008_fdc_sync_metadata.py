@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_change_tracking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='fdc_content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='fdc_data_type',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='fdc_modified_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='fdc_publication_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
@@ -1,5 +1,9 @@
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
 import logging
 logger = logging.getLogger(__name__)
 
@@ -15,6 +19,14 @@ class Ingredient(models.Model):
     base_unit = models.CharField(max_length=10, default='g')
     usda_food_portions = models.JSONField(
         null=True, blank=True, help_text="Raw foodPortions array from USDA API, used for unit conversions")
+    # FoodData Central version metadata and a hash of the stored nutrient/portion values, so
+    # incremental syncs (populate_ingredients --sync) only refetch and rewrite changed foods
+    fdc_data_type = models.CharField(max_length=32, blank=True, default='')
+    fdc_publication_date = models.DateField(null=True, blank=True)
+    fdc_modified_date = models.DateField(null=True, blank=True)
+    fdc_content_hash = models.CharField(max_length=64, blank=True, default='')
+    # Change tracking for delta sync (recipes/changes/)
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
 
     def __str__(self):
         return f"{self.name} (FDC ID: {self.fdc_id})" if self.fdc_id else self.name
@@ -39,6 +51,9 @@ class Recipe(models.Model):
     total_carbs_g = models.FloatField(null=True, blank=True)
     total_fat_g = models.FloatField(null=True, blank=True)
 
+    # Change tracking for delta sync (recipes/changes/)
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
+
     # Ingredients will be linked via the RecipeIngredient model
     ingredients = models.ManyToManyField(
         Ingredient, through='RecipeIngredient', related_name='recipes')
@@ -48,6 +63,16 @@ class Recipe(models.Model):
     # cook_time_minutes = models.PositiveIntegerField(null=True, blank=True)
     # servings = models.PositiveIntegerField(default=1, null=True, blank=True)
 
+    class Meta:
+        # Server-side filtering by meal type plus a nutrient range (see api/filters.py)
+        indexes = [
+            models.Index(fields=['meal_type', 'total_calories'], name='recipe_meal_calories_idx'),
+            models.Index(fields=['meal_type', 'total_protein_g'], name='recipe_meal_protein_idx'),
+            models.Index(fields=['meal_type', 'total_carbs_g'], name='recipe_meal_carbs_idx'),
+            models.Index(fields=['meal_type', 'total_fat_g'], name='recipe_meal_fat_idx'),
+            models.Index(fields=['total_calories'], name='recipe_calories_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -286,7 +311,13 @@ class Recipe(models.Model):
         processed_ingredients_count = 0
 
         # 'ingredient_details' is the related_name from RecipeIngredient.recipe FK
-        recipe_ingredients = self.ingredient_details.all()
+        # Reuse prefetched rows if the caller prefetched them, otherwise join the ingredient
+        # in the same query instead of fetching it lazily per RecipeIngredient (N+1).
+        if 'ingredient_details' in getattr(self, '_prefetched_objects_cache', {}):
+            recipe_ingredients = self.ingredient_details.all()
+        else:
+            recipe_ingredients = self.ingredient_details.select_related(
+                'ingredient')
         logger.debug(
             f"Recipe '{self.name}' has {len(recipe_ingredients)} ingredient instance(s).")
 
@@ -378,7 +409,7 @@ class Recipe(models.Model):
             self.total_carbs_g = round(total_nutrition['carbs'], 2)
 
             update_fields_list = [
-                'total_calories', 'total_protein_g', 'total_fat_g', 'total_carbs_g']
+                'total_calories', 'total_protein_g', 'total_fat_g', 'total_carbs_g', 'updated_at']
             # Assuming self.save exists
             self.save(update_fields=update_fields_list)
             logger.info(
@@ -416,6 +447,8 @@ class RecipeIngredient(models.Model):
         Ingredient, on_delete=models.CASCADE, related_name='used_in_recipes')
     quantity = models.FloatField()
     unit = models.CharField(max_length=20, choices=UNIT_CHOICES)
+    # Change tracking for delta sync (recipes/changes/)
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
 
     class Meta:
         # Ensure an ingredient is not listed twice for the same recipe
@@ -425,6 +458,52 @@ class RecipeIngredient(models.Model):
         return f"{self.quantity} {self.unit} of {self.ingredient.name} for {self.recipe.name}"
 
 
+class CatalogVersion(models.Model):
+    """
+    Single-row, monotonically increasing version of the recipe catalog.
+    Bumped on every Recipe, RecipeIngredient and Ingredient write (see the signal receivers below);
+    bulk writers that bypass signals must call CatalogVersion.bump() themselves.
+    Used for ETag / Last-Modified headers on the recipe endpoints.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    SINGLETON_ID = 1
+
+    def __str__(self):
+        return f"Catalog version {self.version} ({self.updated_at:%Y-%m-%d %H:%M:%S})"
+
+    @property
+    def cache_token(self):
+        # The timestamp keeps tokens unique if the table is ever reset and the counter restarts
+        return f"{self.version}-{int(self.updated_at.timestamp() * 1_000_000)}"
+
+    @classmethod
+    def current(cls):
+        version, _ = cls.objects.get_or_create(pk=cls.SINGLETON_ID)
+        return version
+
+    @classmethod
+    def bump(cls):
+        updated = cls.objects.filter(pk=cls.SINGLETON_ID).update(
+            version=F('version') + 1, updated_at=timezone.now())
+        if not updated:
+            cls.objects.get_or_create(
+                pk=cls.SINGLETON_ID, defaults={'version': 1})
+
+
+class RecipeTombstone(models.Model):
+    """
+    Records deleted recipes so delta-sync clients (recipes/changes/) can drop them locally.
+    Written by the post_delete receiver below; bulk deletes must create tombstones themselves.
+    """
+    recipe_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Recipe {self.recipe_id} deleted at {self.deleted_at:%Y-%m-%d %H:%M:%S}"
+
+
 class UserProfile(models.Model):
     user = models.OneToOneField(
         User, on_delete=models.CASCADE, related_name='profile')
@@ -450,3 +529,150 @@ class UserProfile(models.Model):
 #     if created:
 #         UserProfile.objects.create(user=instance)
 #     instance.profile.save()
+
+
+# --- Catalog version bookkeeping ---
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def bump_catalog_version(sender, **kwargs):
+    CatalogVersion.bump()
+
+
+# --- Delta sync bookkeeping ---
+# updated_at is stamped here rather than with auto_now, so that raw saves (loaddata) keep the
+# fixture's value or fall back to the field default instead of writing NULL
+@receiver(pre_save, sender=Ingredient)
+@receiver(pre_save, sender=Recipe)
+@receiver(pre_save, sender=RecipeIngredient)
+def stamp_updated_at(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is None or 'updated_at' in update_fields:
+        instance.updated_at = timezone.now()
+
+
+@receiver(post_delete, sender=Recipe)
+def record_recipe_tombstone(sender, instance, **kwargs):
+    RecipeTombstone.objects.create(recipe_id=instance.pk)
+
+
+def touch_recipes_using_ingredients(ingredient_ids):
+    """
+    Stamps updated_at on every recipe with a line for one of `ingredient_ids`: recipes render
+    their ingredients nested, so cached recipe fragments (api/fragments.py) must be re-rendered.
+    """
+    Recipe.objects.filter(pk__in=RecipeIngredient.objects.filter(
+        ingredient_id__in=ingredient_ids).values('recipe_id')).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def touch_recipe_of_ingredient_line(sender, instance, raw=False, **kwargs):
+    # The recipe renders its lines, and a removed line leaves no row behind, so mark the recipe
+    # as changed too
+    if raw:
+        return
+    Recipe.objects.filter(pk=instance.recipe_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Ingredient)
+def touch_recipes_of_ingredient(sender, instance, created, raw=False, **kwargs):
+    # A new ingredient isn't used by any recipe yet
+    if created or raw:
+        return
+    touch_recipes_using_ingredients([instance.pk])
+
+
+# --- Search index bookkeeping ---
+# Keeps the recipe full-text index (api/search.py) in sync with single-row writes
+SEARCHABLE_RECIPE_FIELDS = {'name', 'description'}
+
+
+@receiver(post_save, sender=Recipe)
+def index_saved_recipe(sender, instance, update_fields=None, **kwargs):
+    # Nutrition recalculations only save the totals, which aren't searchable
+    if update_fields is not None and not SEARCHABLE_RECIPE_FIELDS & set(update_fields):
+        return
+    from .search import index_recipes
+    index_recipes([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_deleted_recipe(sender, instance, **kwargs):
+    from .search import unindex_recipes
+    unindex_recipes([instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def index_recipe_of_ingredient_line(sender, instance, **kwargs):
+    from .search import index_recipes
+    index_recipes([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def index_recipes_using_ingredient(sender, instance, created, update_fields=None, **kwargs):
+    # A new ingredient isn't used by any recipe yet; only renames change the indexed text
+    if created or (update_fields is not None and 'name' not in update_fields):
+        return
+    from .search import index_recipes
+    index_recipes(RecipeIngredient.objects.filter(
+        ingredient=instance).values_list('recipe_id', flat=True).distinct())
+
+
+# --- Ingredient autocomplete bookkeeping ---
+# Updates this process's prefix index (api/autocomplete.py) in place, if it has been built, once
+# the write commits: the refresh stamp can't tell that a rolled-back write never happened
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_index(sender, instance, **kwargs):
+    from .autocomplete import loaded_ingredient_index
+    pk, name, fdc_id = instance.pk, instance.name, instance.fdc_id
+
+    def add_to_index():
+        index = loaded_ingredient_index()
+        if index is not None:
+            index.add(pk, name, fdc_id)
+    transaction.on_commit(add_to_index)
+
+
+@receiver(post_delete, sender=Ingredient)
+def remove_from_ingredient_index(sender, instance, **kwargs):
+    from .autocomplete import loaded_ingredient_index
+    pk = instance.pk
+
+    def remove_from_index():
+        index = loaded_ingredient_index()
+        if index is not None:
+            index.remove(pk)
+    transaction.on_commit(remove_from_index)
+
+
+# --- Ingredient line matcher bookkeeping ---
+# Same for the free-text ingredient matcher (api/ingredient_lines.py): a rolled-back write
+# would otherwise leave lines resolving to an ingredient that doesn't exist
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_matcher(sender, instance, **kwargs):
+    from .ingredient_lines import loaded_ingredient_matcher
+    pk, name = instance.pk, instance.name
+
+    def add_to_matcher():
+        matcher = loaded_ingredient_matcher()
+        if matcher is not None:
+            matcher.add(pk, name)
+    transaction.on_commit(add_to_matcher)
+
+
+@receiver(post_delete, sender=Ingredient)
+def remove_from_ingredient_matcher(sender, instance, **kwargs):
+    from .ingredient_lines import loaded_ingredient_matcher
+    pk = instance.pk
+
+    def remove_from_matcher():
+        matcher = loaded_ingredient_matcher()
+        if matcher is not None:
+            matcher.remove(pk)
+    transaction.on_commit(remove_from_matcher)
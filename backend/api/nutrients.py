@@ -0,0 +1,78 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# --- FDC nutrient map ---
+# Ingredient field -> FDC nutrient IDs to take its value from, in order of preference. A source
+# is a nutrient ID, or an (ID, factor) pair for nutrients reported in another unit. Foods list
+# a nutrient once per ID, so a food's foodNutrients are indexed by ID in one pass and each
+# field then costs a dict lookup per candidate.
+# Extend it by passing a bigger map to NutrientParser, e.g.
+#     NutrientParser({**NUTRIENT_MAP, 'fiber_per_100g': (1079,)})
+KJ_PER_KCAL = 4.184
+
+NUTRIENT_MAP = {
+    # Energy (kcal), Energy Atwater Specific, Energy Atwater General, then Energy (kJ)
+    'calories_per_100g': (1008, 2048, 2047, (1062, 1 / KJ_PER_KCAL)),
+    'protein_per_100g': (1003,),
+    # Total lipid (fat), then Total fat (NLEA) as reported by some Foundation foods
+    'fat_per_100g': (1004, 1085),
+    # Carbohydrate, by difference, then by summation
+    'carbs_per_100g': (1005, 1050),
+}
+# Foods missing any of these are rejected; other fields default to 0.0
+REQUIRED_NUTRIENTS = ('protein_per_100g', 'fat_per_100g', 'carbs_per_100g')
+
+
+class NutrientParser:
+    """
+    Extracts per-100g nutrient values from FDC foodNutrients lists (full or abridged format).
+    """
+
+    def __init__(self, nutrient_map=NUTRIENT_MAP, required=REQUIRED_NUTRIENTS):
+        self.required = tuple(required)
+        # field -> ((nutrient_id, factor), ...)
+        self.sources = {
+            field: tuple(source if isinstance(source, tuple) else (source, None) for source in sources)
+            for field, sources in nutrient_map.items()
+        }
+        self.nutrient_ids = frozenset(
+            nutrient_id for sources in self.sources.values() for nutrient_id, _ in sources)
+
+    def index(self, food_nutrients):
+        """
+        {nutrient_id: amount} for the mapped nutrients, from one pass over the list. The first
+        entry wins when an ID repeats.
+        """
+        wanted = self.nutrient_ids
+        amounts = {}
+        for entry in food_nutrients:
+            nutrient = entry.get('nutrient')
+            nutrient_id = nutrient.get('id') if nutrient else entry.get('nutrientId')
+            if nutrient_id in wanted and nutrient_id not in amounts:
+                amounts[nutrient_id] = entry['amount'] if 'amount' in entry else entry.get('value', 0.0)
+        return amounts
+
+    def parse(self, food_nutrients):
+        """
+        Returns ({field: value}, [missing required fields]). Values are per 100g, as USDA
+        reports them for these nutrients.
+        """
+        amounts = self.index(food_nutrients)
+        values = {}
+        missing = []
+        for field, sources in self.sources.items():
+            for nutrient_id, factor in sources:
+                if nutrient_id in amounts:
+                    amount = amounts[nutrient_id]
+                    values[field] = amount * factor if factor is not None and amount is not None else amount
+                    break
+            else:
+                values[field] = 0.0
+                if field in self.required:
+                    missing.append(field)
+        return values, missing
+
+
+default_parser = NutrientParser()
@@ -0,0 +1,34 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+# --- Recipe list pagination ---
+# Page-number mode is the default (?page=2&page_size=50). Cursor mode (?pagination=cursor,
+# then follow the returned `next` links) skips the COUNT query and stays fast on deep pages.
+class RecipePageNumberPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class RecipeCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    # Recipe names are unique, the id keeps the ordering total for the cursor
+    ordering = ('name', 'id')
+
+
+def recipe_paginator_for(request):
+    """
+    Picks the paginator for a recipe list request based on its query parameters.
+    """
+    if request is not None and (request.query_params.get('pagination') == 'cursor'
+                                or 'cursor' in request.query_params):
+        return RecipeCursorPagination()
+    return RecipePageNumberPagination()
+
+
+class IngredientPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
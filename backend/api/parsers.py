@@ -0,0 +1,18 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from .recipe_import import iter_ndjson_records
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline-delimited JSON into a list of objects (e.g. a recipes/export/ download).
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding') or 'utf-8'
+        try:
+            return list(iter_ndjson_records(stream.read().decode(encoding).splitlines()))
+        except ValueError as e:
+            raise ParseError(f"NDJSON parse error - {e}")
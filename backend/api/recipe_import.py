@@ -0,0 +1,345 @@
+import json
+import logging
+import math
+import time
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .conversions import ConversionTable
+from .fdc_dump import iter_json_array
+from .ingredient_lines import parse_ingredient_lines
+from .models import CatalogVersion, Ingredient, Recipe, RecipeIngredient
+from .search import index_documents
+
+logger = logging.getLogger(__name__)
+
+
+# --- Bulk recipe import ---
+# Recipes arrive as JSON objects, the same shape recipes/export/ writes (so an export can be
+# loaded back), with each ingredient line given as any of:
+#   {"ingredient": {"id": 12, "fdc_id": 169761, ...}, "quantity": 2, "unit": "cup"}
+#   {"ingredient": 12, "quantity": 2, "unit": "cup"} or {"fdc_id": 169761, ...}
+#   "2 cups all-purpose flour"  (parsed and matched by api/ingredient_lines.py)
+# A batch is validated completely before anything is written: ingredients are resolved with one
+# in_bulk() per key (fdc_id is preferred, as it is portable between databases), nutrition is
+# computed in memory through the batch conversion path, and Recipe and RecipeIngredient rows are
+# inserted with bulk_create() in one transaction. Totals are set before the insert, so no
+# update pass is needed. Unconvertible lines are kept and left out of the totals, as
+# Recipe.calculate_nutrition() does.
+IMPORT_BATCH_SIZE = 1000
+WRITE_BATCH_SIZE = 500
+
+ON_CONFLICT_ERROR = 'error'
+ON_CONFLICT_SKIP = 'skip'
+
+RECIPE_TEXT_FIELDS = ('description', 'health_insights')
+MEAL_TYPES = {value for value, _ in Recipe.MEAL_TYPE_CHOICES}
+UNITS = {value for value, _ in RecipeIngredient.UNIT_CHOICES}
+NAME_MAX_LENGTH = Recipe._meta.get_field('name').max_length
+
+IMPORT_INGREDIENT_COLUMNS = (
+    'id', 'name', 'fdc_id', 'calories_per_100g', 'protein_per_100g', 'carbs_per_100g',
+    'fat_per_100g', 'usda_food_portions')
+
+
+class RecipeImportError(Exception):
+    """
+    Raised with every validation error of a batch; nothing from the batch was written.
+    errors: [{'index': position in the input, 'name': recipe name, 'errors': {field: message}}]
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)} invalid recipe(s).")
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _line_reference(entry):
+    """
+    ('fdc_id' | 'id', key) for a structured line, or None when it names no ingredient.
+    """
+    ingredient = entry.get('ingredient')
+    if isinstance(ingredient, dict):
+        fdc_id, ingredient_id = ingredient.get('fdc_id'), ingredient.get('id')
+    else:
+        fdc_id, ingredient_id = entry.get('fdc_id'), ingredient
+    if fdc_id is not None:
+        return ('fdc_id', fdc_id) if isinstance(fdc_id, int) and not isinstance(fdc_id, bool) else None
+    if isinstance(ingredient_id, int) and not isinstance(ingredient_id, bool):
+        return 'id', ingredient_id
+    return None
+
+
+def _validate_recipe(record):
+    errors = {}
+    name = record.get('name')
+    if not isinstance(name, str) or not name.strip():
+        errors['name'] = 'Required.'
+    elif len(name) > NAME_MAX_LENGTH:
+        errors['name'] = f"At most {NAME_MAX_LENGTH} characters."
+    if not isinstance(record.get('instructions'), str) or not record['instructions'].strip():
+        errors['instructions'] = 'Required.'
+    if record.get('meal_type') not in MEAL_TYPES:
+        errors['meal_type'] = f"Must be one of: {', '.join(sorted(MEAL_TYPES))}."
+    for field in RECIPE_TEXT_FIELDS:
+        if record.get(field) is not None and not isinstance(record[field], str):
+            errors[field] = 'Must be a string.'
+    return errors
+
+
+def _insert_recipe_ingredients(rows):
+    """
+    Inserts (recipe_id, ingredient_id, quantity, unit) rows with executemany(). Building a model
+    instance per line and compiling it through bulk_create() costs more than the insert itself
+    at import volumes. Returns the number of rows.
+    """
+    table = connection.ops.quote_name(RecipeIngredient._meta.db_table)
+    updated_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    rows = [(*row, updated_at) for row in rows]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), WRITE_BATCH_SIZE):
+            cursor.executemany(
+                f"INSERT INTO {table} (recipe_id, ingredient_id, quantity, unit, updated_at) "
+                f"VALUES (%s, %s, %s, %s, %s)", rows[start:start + WRITE_BATCH_SIZE])
+    return len(rows)
+
+
+class RecipeImporter:
+    """
+    Validates and inserts batches of recipe dicts, each atomically. Ingredients and unit
+    conversions resolved for one batch are reused by the next, so an import only loads each
+    ingredient once (edits made to an ingredient during a long import may go unseen).
+    """
+
+    def __init__(self, on_conflict=ON_CONFLICT_ERROR, matcher=None):
+        self.on_conflict = on_conflict
+        self.matcher = matcher
+        self.conversions = ConversionTable()
+        self.ingredients = {'id': {}, 'fdc_id': {}}
+
+    def _resolve(self, key, values):
+        known = self.ingredients[key]
+        missing = [value for value in values if value not in known]
+        if missing:
+            loaded = Ingredient.objects.only(*IMPORT_INGREDIENT_COLUMNS).in_bulk(missing, field_name=key)
+            for ingredient in loaded.values():
+                self.ingredients['id'][ingredient.pk] = ingredient
+                if ingredient.fdc_id is not None:
+                    self.ingredients['fdc_id'][ingredient.fdc_id] = ingredient
+        return known
+
+    def import_batch(self, records, first_index=0):
+        """
+        Raises RecipeImportError when any record is invalid, with nothing written. Recipes whose
+        name already exists are errors, or skipped when on_conflict is ON_CONFLICT_SKIP.
+        Returns {'created', 'skipped', 'lines', 'unconvertible_lines', 'recipe_ids'}.
+        """
+        records = list(records)
+        errors = {}  # index -> {field: message}
+
+        def error(index, field, message):
+            errors.setdefault(index, {})[field] = message
+
+        # Structural checks, and the ingredient keys and free-text lines to resolve in bulk
+        parsed = []  # (index, record, [(position, reference or text, quantity, unit), ...])
+        keys = {'id': set(), 'fdc_id': set()}
+        texts = []
+        for offset, record in enumerate(records):
+            index = first_index + offset
+            if not isinstance(record, dict):
+                error(index, 'non_field_errors', 'Must be an object.')
+                continue
+            for field, message in _validate_recipe(record).items():
+                error(index, field, message)
+
+            entries = record.get('ingredient_details', record.get('ingredients', []))
+            if not isinstance(entries, list):
+                error(index, 'ingredients', 'Must be a list.')
+                continue
+            lines = []
+            for position, entry in enumerate(entries):
+                if isinstance(entry, str):
+                    texts.append(entry)
+                    lines.append((position, entry, None, None))
+                elif isinstance(entry, dict):
+                    reference = _line_reference(entry)
+                    if reference is None:
+                        error(index, f'ingredients[{position}]', 'Names no ingredient (id or fdc_id).')
+                        continue
+                    keys[reference[0]].add(reference[1])
+                    lines.append((position, reference, entry.get('quantity'), entry.get('unit')))
+                else:
+                    error(index, f'ingredients[{position}]', 'Must be an object or a string.')
+            parsed.append((index, record, lines))
+
+        # Resolve ingredients with one in_bulk() per key, and free-text lines in one parse
+        parsed_texts = {}
+        if texts:
+            parsed_texts = {result['line']: result for result in parse_ingredient_lines(texts, self.matcher)}
+            keys['id'].update(result['ingredient_id'] for result in parsed_texts.values()
+                              if result['ingredient_id'] is not None)
+        by_key = {key: self._resolve(key, values) for key, values in keys.items()}
+
+        names = [record['name'] for _, record, _ in parsed if isinstance(record.get('name'), str)]
+        existing_names = set(Recipe.objects.filter(name__in=names).values_list('name', flat=True)) if names else set()
+
+        # Line checks and nutrition, in memory
+        recipes, recipe_lines = [], []
+        seen_names = set()
+        skipped = unconvertible_lines = 0
+        for index, record, lines in parsed:
+            name = record.get('name')
+            if isinstance(name, str):
+                if name in seen_names:
+                    error(index, 'name', 'Duplicated in this import.')
+                seen_names.add(name)
+
+            resolved = []
+            used = set()
+            for position, reference, quantity, unit in lines:
+                field = f'ingredients[{position}]'
+                if isinstance(reference, str):
+                    result = parsed_texts[reference]
+                    if result['ingredient_id'] is None:
+                        error(index, field, f"No ingredient matches '{result['name']}'.")
+                        continue
+                    if result['quantity'] is None:
+                        error(index, field, 'No quantity given.')
+                        continue
+                    reference = ('id', result['ingredient_id'])
+                    quantity, unit = result['quantity'], result['unit']
+                ingredient = by_key[reference[0]].get(reference[1])
+                if ingredient is None:
+                    error(index, field, f"Unknown ingredient {reference[0]} {reference[1]}.")
+                elif not _is_number(quantity) or quantity < 0:
+                    error(index, field, 'Quantity must be a non-negative number.')
+                elif unit not in UNITS:
+                    error(index, field, f"Unit must be one of: {', '.join(sorted(UNITS))}.")
+                elif ingredient.pk in used:
+                    error(index, field, f"Ingredient '{ingredient.name}' is listed twice.")
+                else:
+                    used.add(ingredient.pk)
+                    resolved.append((ingredient, float(quantity), unit))
+
+            if index in errors:
+                continue
+            if name in existing_names:
+                if self.on_conflict == ON_CONFLICT_SKIP:
+                    skipped += 1
+                    continue
+                error(index, 'name', 'A recipe with this name already exists.')
+                continue
+
+            totals, unconvertible = self.conversions.nutrition(resolved)
+            unconvertible_lines += unconvertible
+            recipes.append(Recipe(
+                name=name,
+                description=record.get('description'),
+                instructions=record['instructions'],
+                meal_type=record['meal_type'],
+                health_insights=record.get('health_insights'),
+                total_calories=totals['calories'],
+                total_protein_g=totals['protein'],
+                total_fat_g=totals['fat'],
+                total_carbs_g=totals['carbs'],
+            ))
+            recipe_lines.append(resolved)
+
+        if errors:
+            names_by_index = {index: record.get('name') for index, record, _ in parsed}
+            raise RecipeImportError([
+                {'index': index, 'name': names_by_index.get(index), 'errors': errors[index]}
+                for index in sorted(errors)
+            ])
+
+        with transaction.atomic():
+            Recipe.objects.bulk_create(recipes, batch_size=WRITE_BATCH_SIZE)
+            line_count = _insert_recipe_ingredients(
+                (recipe.pk, ingredient.pk, quantity, unit)
+                for recipe, lines in zip(recipes, recipe_lines)
+                for ingredient, quantity, unit in lines)
+            if recipes:
+                # Neither bulk_create() nor raw inserts send the signals that normally bump the
+                # catalog version and keep the search index in sync
+                CatalogVersion.bump()
+                index_documents({
+                    recipe.pk: (recipe.name, recipe.description or '',
+                                ' '.join(ingredient.name for ingredient, _, _ in lines))
+                    for recipe, lines in zip(recipes, recipe_lines)
+                })
+        return {
+            'created': len(recipes),
+            'skipped': skipped,
+            'lines': line_count,
+            'unconvertible_lines': unconvertible_lines,
+            'recipe_ids': [recipe.pk for recipe in recipes],
+        }
+
+
+def import_recipes(records, on_conflict=ON_CONFLICT_ERROR, matcher=None):
+    """
+    Validates and inserts one batch of recipe dicts atomically; see RecipeImporter.import_batch().
+    """
+    return RecipeImporter(on_conflict, matcher).import_batch(records)
+
+
+# --- Import sources ---
+def iter_ndjson_records(stream):
+    """
+    Yields one object per non-blank line.
+    """
+    for number, line in enumerate(stream, start=1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"Invalid JSON on line {number}: {e}")
+
+
+def iter_recipe_records(stream, format='ndjson'):
+    """
+    Yields recipe dicts from a text stream holding NDJSON or a JSON array (streamed). Raises
+    ValueError (or DumpFormatError) on malformed input.
+    """
+    if format == 'json':
+        yield from iter_json_array(stream)
+    else:
+        yield from iter_ndjson_records(stream)
+
+
+def import_recipe_stream(records, batch_size=IMPORT_BATCH_SIZE, on_conflict=ON_CONFLICT_ERROR, progress=None):
+    """
+    Imports an iterable of recipe dicts in batches of `batch_size`, one transaction each. A
+    RecipeImportError stops the import at the failing batch (earlier batches stay written).
+    Calls progress(stats) after each batch and returns the final stats.
+    """
+    stats = {'read': 0, 'created': 0, 'skipped': 0, 'lines': 0, 'unconvertible_lines': 0, 'seconds': 0.0}
+    start = time.perf_counter()
+    batch = []
+    importer = RecipeImporter(on_conflict)
+
+    def flush():
+        result = importer.import_batch(batch, first_index=stats['read'] - len(batch))
+        for key in ('created', 'skipped', 'lines', 'unconvertible_lines'):
+            stats[key] += result[key]
+        stats['seconds'] = time.perf_counter() - start
+        batch.clear()
+        if progress is not None:
+            progress(stats)
+
+    for record in records:
+        stats['read'] += 1
+        batch.append(record)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    stats['seconds'] = time.perf_counter() - start
+    logger.info(
+        f"Imported recipes: {stats['created']} created, {stats['skipped']} skipped, {stats['lines']} "
+        f"ingredient lines ({stats['unconvertible_lines']} unconvertible) in {stats['seconds']:.1f}s.")
+    return stats
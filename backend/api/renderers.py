@@ -0,0 +1,83 @@
+import json
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the standard library encoder
+    orjson = None
+
+
+class RawJSON:
+    """
+    Already-rendered JSON (bytes) to be spliced verbatim into a response,
+    e.g. a cached recipe fragment or a list of them.
+    """
+    __slots__ = ('content',)
+
+    def __init__(self, content):
+        self.content = content
+
+    @classmethod
+    def array(cls, fragments):
+        return cls(b'[' + b','.join(fragment.content for fragment in fragments) + b']')
+
+    def __repr__(self):
+        return f"RawJSON({self.content[:40]!r}...)"
+
+
+_encoder = JSONEncoder()
+
+
+def dumps_json(data):
+    """
+    Compact UTF-8 JSON bytes, using orjson when installed.
+    Types orjson doesn't know (Decimal, lazy strings, ...) go through DRF's encoder.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=_encoder.default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def render_json(data):
+    """
+    Renders data that may contain RawJSON values anywhere inside dicts or lists.
+    """
+    if isinstance(data, RawJSON):
+        return data.content
+    if isinstance(data, dict):
+        return b'{' + b','.join(
+            dumps_json(str(key)) + b':' + render_json(value) for key, value in data.items()) + b'}'
+    if isinstance(data, (list, tuple)):
+        return b'[' + b','.join(render_json(item) for item in data) + b']'
+    return dumps_json(data)
+
+
+def _contains_raw(data):
+    if isinstance(data, RawJSON):
+        return True
+    if isinstance(data, dict):
+        return any(_contains_raw(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(_contains_raw(item) for item in data)
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Compact JSON renderer backed by orjson (when installed) that also splices RawJSON fragments.
+    Falls back to DRF's JSONRenderer for indented output (e.g. ?indent / browsable API).
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            if _contains_raw(data):
+                data = json.loads(render_json(data))
+            return super().render(data, accepted_media_type, renderer_context)
+        if _contains_raw(data):
+            return render_json(data)
+        return dumps_json(data)
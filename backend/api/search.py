@@ -0,0 +1,173 @@
+import logging
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Recipe, RecipeIngredient
+
+logger = logging.getLogger(__name__)
+
+
+# --- Recipe full-text index ---
+# One row per recipe holding its name, description and ingredient names.
+#   SQLite:     an FTS5 virtual table; the rowid is the recipe ID.
+#   PostgreSQL: a plain table with a precomputed tsvector column and a GIN index.
+# Other backends have no index and fall back to icontains lookups.
+# The table is created by migration 0006 and kept in sync by the receivers in models.py;
+# bulk writers that bypass signals must call index_recipes() or rebuild_index() themselves.
+FTS_TABLE = 'api_recipe_fts'
+POSTGRES_SEARCH_CONFIG = 'simple'
+INDEX_BATCH_SIZE = 2000
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_vendor(conn=None):
+    """
+    'sqlite' or 'postgresql' when the backend has a full-text index, else None.
+    """
+    vendor = (conn or connection).vendor
+    return vendor if vendor in ('sqlite', 'postgresql') else None
+
+
+def create_index_table(schema_editor):
+    vendor = search_vendor(schema_editor.connection)
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"name, description, ingredients, tokenize = 'unicode61 remove_diacritics 2')")
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {FTS_TABLE} ("
+            f"recipe_id bigint PRIMARY KEY REFERENCES api_recipe (id) ON DELETE CASCADE, "
+            f"document tsvector NOT NULL)")
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {FTS_TABLE}_document_idx ON {FTS_TABLE} USING GIN (document)")
+
+
+def drop_index_table(schema_editor):
+    if search_vendor(schema_editor.connection):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def search_tokens(query):
+    return _TOKEN_RE.findall(query.lower())
+
+
+def recipe_documents(recipe_ids):
+    """
+    {recipe_id: (name, description, ingredient names)} in two queries.
+    """
+    documents = {
+        recipe_id: [name, description or '', []]
+        for recipe_id, name, description in Recipe.objects.filter(
+            pk__in=recipe_ids).values_list('id', 'name', 'description')
+    }
+    ingredient_rows = RecipeIngredient.objects.filter(
+        recipe_id__in=documents).values_list('recipe_id', 'ingredient__name')
+    for recipe_id, ingredient_name in ingredient_rows:
+        documents[recipe_id][2].append(ingredient_name)
+    return {recipe_id: (name, description, ' '.join(ingredients))
+            for recipe_id, (name, description, ingredients) in documents.items()}
+
+
+def unindex_recipes(recipe_ids):
+    vendor = search_vendor()
+    recipe_ids = list(recipe_ids)
+    if not vendor or not recipe_ids:
+        return
+    key = 'rowid' if vendor == 'sqlite' else 'recipe_id'
+    with connection.cursor() as cursor:
+        for start in range(0, len(recipe_ids), INDEX_BATCH_SIZE):
+            batch = recipe_ids[start:start + INDEX_BATCH_SIZE]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE {key} IN ({placeholders})", batch)
+
+
+def index_recipes(recipe_ids):
+    """
+    (Re)indexes the given recipes; IDs that no longer exist are removed from the index.
+    """
+    vendor = search_vendor()
+    recipe_ids = list(recipe_ids)
+    if not vendor or not recipe_ids:
+        return
+    for start in range(0, len(recipe_ids), INDEX_BATCH_SIZE):
+        batch = recipe_ids[start:start + INDEX_BATCH_SIZE]
+        documents = recipe_documents(batch)
+        unindex_recipes(batch)
+        _insert_documents(vendor, documents)
+
+
+def index_documents(documents):
+    """
+    (Re)indexes recipes from {recipe_id: (name, description, ingredient names)} the caller
+    already holds, e.g. a bulk import, without reading them back.
+    """
+    vendor = search_vendor()
+    if not vendor or not documents:
+        return
+    unindex_recipes(documents)
+    _insert_documents(vendor, documents)
+
+
+def _insert_documents(vendor, documents):
+    if not documents:
+        return
+    with connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description, ingredients) VALUES (%s, %s, %s, %s)",
+                [(recipe_id, *document) for recipe_id, document in documents.items()])
+        else:
+            # Name weighs more than ingredients, which weigh more than the description
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (recipe_id, document) VALUES (%s, "
+                f"setweight(to_tsvector('{POSTGRES_SEARCH_CONFIG}', %s), 'A') || "
+                f"setweight(to_tsvector('{POSTGRES_SEARCH_CONFIG}', %s), 'C') || "
+                f"setweight(to_tsvector('{POSTGRES_SEARCH_CONFIG}', %s), 'B'))",
+                [(recipe_id, *document) for recipe_id, document in documents.items()])
+
+
+def rebuild_index():
+    """
+    Clears and repopulates the whole index. Returns the number of recipes indexed.
+    """
+    if not search_vendor():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+    recipe_ids = list(Recipe.objects.order_by('pk').values_list('pk', flat=True))
+    index_recipes(recipe_ids)
+    logger.info(f"Rebuilt recipe search index with {len(recipe_ids)} recipes.")
+    return len(recipe_ids)
+
+
+def search_recipes(queryset, query):
+    """
+    Narrows a Recipe queryset to recipes matching every word of `query` (as prefixes)
+    in their name, description or ingredient names.
+    """
+    tokens = search_tokens(query)
+    if not tokens:
+        return queryset
+    vendor = search_vendor()
+    if vendor == 'sqlite':
+        match = ' AND '.join(f'"{token}"*' for token in tokens)
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]))
+    if vendor == 'postgresql':
+        ts_query = ' & '.join(f'{token}:*' for token in tokens)
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT recipe_id FROM {FTS_TABLE} "
+            f"WHERE document @@ to_tsquery('{POSTGRES_SEARCH_CONFIG}', %s)", [ts_query]))
+
+    # No full-text index on this backend
+    for token in tokens:
+        queryset = queryset.filter(
+            Q(name__icontains=token) | Q(description__icontains=token) |
+            Q(ingredients__name__icontains=token))
+    return queryset.distinct()
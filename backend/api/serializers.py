@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db.models import Prefetch
 from .models import UserProfile, Ingredient, RecipeIngredient, Recipe
 
 
@@ -79,10 +80,26 @@ class UserProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ['user']
 
 
+# --- Sparse fieldsets ---
+class DynamicFieldsMixin:
+    """
+    Lets callers restrict a ModelSerializer to a subset of its fields:
+    MySerializer(instance, fields=['id', 'name']).
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+
 # --- Ingredient & RecipeIngredient Serializers (for nested display in Recipe) ---
 class IngredientSerializer(serializers.ModelSerializer):
     """
-    Serializer for Ingredient model (primarily for read-only display within recipes).
+    Full serializer for Ingredient model, including the raw USDA portions.
+    Only used by the ingredient detail endpoint, since portions can be kilobytes per ingredient.
     """
     class Meta:
         model = Ingredient
@@ -92,13 +109,39 @@ class IngredientSerializer(serializers.ModelSerializer):
         # read_only_fields = fields # If it's purely for display within a recipe
 
 
+class IngredientSummarySerializer(serializers.ModelSerializer):
+    """
+    Ingredient without USDA portions, for lists and for nesting within recipes.
+    """
+    class Meta:
+        model = Ingredient
+        fields = ['id', 'name', 'fdc_id', 'calories_per_100g', 'protein_per_100g',
+                  'carbs_per_100g', 'fat_per_100g', 'base_unit']
+
+
+# Model columns needed to render IngredientSummarySerializer
+INGREDIENT_SUMMARY_COLUMNS = IngredientSummarySerializer.Meta.fields
+
+
+def ingredient_details_prefetch():
+    """
+    Prefetch for Recipe.ingredient_details as RecipeSerializer renders it: RecipeIngredients joined
+    with their Ingredient (minus USDA portions), in one query for any number of recipes.
+    """
+    return Prefetch(
+        'ingredient_details',
+        queryset=RecipeIngredient.objects.select_related('ingredient').only(
+            'id', 'recipe', 'quantity', 'unit',
+            *[f'ingredient__{column}' for column in INGREDIENT_SUMMARY_COLUMNS]))
+
+
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     """
     Serializer for RecipeIngredient model.
     Shows ingredient details when nested in a Recipe.
     """
-    # Nest the full Ingredient details instead of just its ID
-    ingredient = IngredientSerializer(read_only=True)
+    # Nest the Ingredient details (without USDA portions) instead of just its ID
+    ingredient = IngredientSummarySerializer(read_only=True)
     # Or, if you only want the ingredient name:
     # ingredient_name = serializers.CharField(source='ingredient.name', read_only=True)
 
@@ -110,11 +153,29 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         # ingredient = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
 
 
-# --- Recipe Serializer ---
-class RecipeSerializer(serializers.ModelSerializer):
+# --- Recipe Serializers ---
+class RecipeSummarySerializer(serializers.ModelSerializer):
+    """
+    Compact Recipe representation used by list views: identity, meal type and nutrition totals.
+    """
+    class Meta:
+        model = Recipe
+        fields = [
+            'id',
+            'name',
+            'meal_type',
+            'total_calories',
+            'total_protein_g',
+            'total_carbs_g',
+            'total_fat_g',
+        ]
+
+
+class RecipeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for Recipe model.
     Includes calculated nutrition and nested ingredient details.
+    Accepts fields=[...] to render a sparse fieldset.
     """
     # Nest RecipeIngredient details, which in turn nest Ingredient details
     ingredient_details = RecipeIngredientSerializer(many=True, read_only=True)
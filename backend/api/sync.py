@@ -0,0 +1,57 @@
+from datetime import timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Recipe, RecipeIngredient, RecipeTombstone
+
+
+# --- Delta sync ---
+# A watermark is the server time at which a changes query started (ISO 8601). Queries look a
+# little further back than the watermark, so rows written by transactions that were still in
+# flight when the previous query ran aren't missed; clients must treat changes as idempotent
+# upserts. When more than CHANGES_MAX_RECIPES recipes changed, clients are told to resync
+# from the list or export endpoints instead.
+CHANGES_SAFETY_WINDOW = timedelta(seconds=5)
+CHANGES_MAX_RECIPES = 1000
+
+
+def format_watermark(moment):
+    # UTC with a 'Z' suffix, so the watermark survives unencoded in a query string
+    return moment.astimezone(dt_timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def parse_watermark(value):
+    """
+    Returns an aware datetime, or None when `value` isn't a valid watermark.
+    """
+    try:
+        moment = parse_datetime(value)
+    except ValueError:
+        return None
+    if moment is None:
+        return None
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, dt_timezone.utc)
+    return moment
+
+
+def changed_recipe_ids(since):
+    """
+    IDs of recipes whose row, ingredient lines or ingredients changed after `since`.
+    Each part is a separate query on an indexed updated_at column.
+    """
+    cutoff = since - CHANGES_SAFETY_WINDOW
+    recipe_ids = set(Recipe.objects.filter(
+        updated_at__gt=cutoff).values_list('id', flat=True))
+    recipe_ids.update(RecipeIngredient.objects.filter(
+        updated_at__gt=cutoff).values_list('recipe_id', flat=True))
+    recipe_ids.update(RecipeIngredient.objects.filter(
+        ingredient__updated_at__gt=cutoff).values_list('recipe_id', flat=True))
+    return recipe_ids
+
+
+def deleted_recipe_ids(since):
+    cutoff = since - CHANGES_SAFETY_WINDOW
+    return set(RecipeTombstone.objects.filter(
+        deleted_at__gt=cutoff).values_list('recipe_id', flat=True))
@@ -1,3 +1,1618 @@
+import csv
+import io
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import tempfile
+import tracemalloc
+import zipfile
+from array import array
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from . import renderers
+from .autocomplete import IngredientPrefixIndex, ProcessWideIndex, get_ingredient_index, reset_ingredient_index
+from .conversions import ConversionTable
+from .catalog import (PlannerCatalog, catalog_version_key, get_shared_catalog, load_planner_catalog,
+                      publish_catalog, unlink_catalog)
+from .catalog_snapshot import CatalogSnapshot
+from .benchmarking import (FIXTURE_INGREDIENTS, exact_daily_optimum, fixture_fdc_payload, fixture_ingredient,
+                           latency_summary, percentile, synthetic_fdc_foods)
+from .fdc import (FDCClient, FDCError, IngredientWriter, TokenBucket, fetch_food_batches, fetch_foods, parse_food,
+                  upsert_ingredients)
+from .fdc_dump import DumpSource, iter_csv_foods, iter_json_array
+from .fdc_stub import StubFDCServer
+from .instrumentation import PhaseTimer
+from .ingredient_lines import (IngredientMatcher, get_ingredient_matcher, parse_ingredient_lines, parse_line,
+                               reset_ingredient_matcher)
+from .meal_planner_logic import calculate_daily_plan_fitness_score, generate_daily_meal_plan_v1
+from .models import CatalogVersion, Ingredient, Recipe, RecipeIngredient, UserProfile
+from .nutrients import NUTRIENT_MAP, NutrientParser, default_parser
+from .recipe_import import import_recipes
+from .export import iter_recipe_chunks
+from .renderers import FastJSONRenderer, RawJSON
+from .sync import format_watermark
+
+
+# --- Unit conversion ---
+class IngredientGramsTests(TestCase):
+    """
+    Covers each conversion path of Recipe.get_ingredient_grams using USDA-shaped fixture ingredients.
+    """
+
+    def grams(self, ingredient_key, quantity, unit):
+        recipe = Recipe(name='Conversion test')
+        ri = RecipeIngredient(recipe=recipe, ingredient=fixture_ingredient(ingredient_key),
+                              quantity=quantity, unit=unit)
+        return recipe.get_ingredient_grams(ri)
+
+    def test_weight_units(self):
+        self.assertEqual(self.grams('flour', 100, 'g'), 100.0)
+        self.assertEqual(self.grams('chicken', 0.5, 'kg'), 500.0)
+        self.assertAlmostEqual(self.grams('chicken', 1, 'oz'), 28.349523125)
+        self.assertAlmostEqual(self.grams('chicken', 1, 'lb'), 453.59237)
+
+    def test_usda_portions(self):
+        self.assertEqual(self.grams('flour', 2, 'cup'), 250.0)
+        self.assertEqual(self.grams('olive_oil', 1, 'tbsp'), 13.5)
+        self.assertEqual(self.grams('sugar', 1, 'tsp'), 4.2)
+
+    def test_piece_like_units(self):
+        self.assertEqual(self.grams('egg', 2, 'piece'), 100.0)
+        # Matched through the ingredient name appearing in the portion modifier
+        self.assertEqual(self.grams('apple', 1, 'piece'), 182.0)
+
+    def test_ml_fallback_uses_density(self):
+        self.assertAlmostEqual(self.grams('olive_oil', 30, 'ml'), 27.6)
+        self.assertEqual(self.grams('milk', 250, 'ml'), 250.0)
+
+    def test_failures_and_zero_quantity(self):
+        self.assertIsNone(self.grams('sugar', 1, 'fling'))
+        self.assertIsNone(self.grams('chicken', 1, 'cup'))
+        self.assertEqual(self.grams('flour', 0, 'g'), 0.0)
+
+    def test_batch_path_matches(self):
+        table = ConversionTable()
+        units = ['g', 'kg', 'oz', 'lb', 'cup', 'tbsp', 'tsp', 'piece', 'slice', 'ml', 'fl oz', 'fling']
+        # get_ingredient_grams() logs each failed conversion
+        with self.assertLogs('api.models', level='ERROR'):
+            for ingredient_id, key in enumerate(FIXTURE_INGREDIENTS, start=1):
+                for unit in units:
+                    for quantity in (0, 1, 2.5):
+                        grams, _ = table.grams(fixture_ingredient(key, id=ingredient_id), quantity, unit)
+                        self.assertEqual(grams, self.grams(key, quantity, unit), (key, quantity, unit))
+
+
+# --- Nutrition query budget ---
+class CalculateNutritionQueryTests(TestCase):
+    """
+    calculate_nutrition must not issue a query per ingredient (N+1).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipe = Recipe.objects.create(
+            name='Pancakes', instructions='Mix and cook.', meal_type='breakfast')
+        for key, quantity, unit in [('flour', 2, 'cup'), ('sugar', 1, 'tsp'), ('egg', 2, 'piece'),
+                                    ('milk', 250, 'ml'), ('olive_oil', 1, 'tbsp')]:
+            RecipeIngredient.objects.create(
+                recipe=cls.recipe, ingredient=Ingredient.objects.create(**FIXTURE_INGREDIENTS[key]),
+                quantity=quantity, unit=unit)
+
+    def test_query_count_is_constant(self):
+        # One SELECT joining ingredients, one UPDATE for the totals, one catalog version bump
+        with self.assertNumQueries(3):
+            totals = self.recipe.calculate_nutrition(save_to_instance=True)
+        self.assertAlmostEqual(totals['calories'], 1341.094, places=2)
+
+    def test_prefetched_recipe_only_saves(self):
+        recipe = Recipe.objects.prefetch_related(
+            'ingredient_details__ingredient').get(pk=self.recipe.pk)
+        with self.assertNumQueries(2):
+            recipe.calculate_nutrition(save_to_instance=True)
+
+
+# --- Recipe API ---
+class CatalogAPITestCase(TestCase):
+    """
+    Starts every test with an empty fragment cache; catalog versions repeat across rolled-back tests.
+    """
+
+    def setUp(self):
+        caches['default'].clear()
+
+
+class RecipeListQueryTests(CatalogAPITestCase):
+    """
+    The recipe list must be paginated and keep a constant query plan regardless of page size.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        ingredients = [Ingredient.objects.create(**fields) for fields in FIXTURE_INGREDIENTS.values()]
+        for i in range(30):
+            recipe = Recipe.objects.create(
+                name=f"Recipe {i:02d}", instructions='Cook.', meal_type='lunch', total_calories=500.0)
+            for ingredient in ingredients[:3]:
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, quantity=100, unit='g')
+
+    def test_page_number_query_budget(self):
+        for page_size in (5, 30):
+            # Catalog version, COUNT, page IDs, then the uncached recipes and their
+            # recipe ingredients joined with their ingredient
+            with self.assertNumQueries(5):
+                response = self.client.get(
+                    '/api/v1/recipes/', {'page_size': page_size, 'expand': 'ingredients'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['count'], 30)
+            self.assertEqual(len(response.json()['results']), page_size)
+            self.assertEqual(len(response.json()['results'][0]['ingredient_details']), 3)
+
+    def test_cursor_pagination(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                '/api/v1/recipes/', {'pagination': 'cursor', 'page_size': 20, 'expand': 'ingredients'})
+        self.assertEqual(len(response.json()['results']), 20)
+        self.assertNotIn('count', response.data)
+
+        response = self.client.get(response.json()['next'])
+        names = [recipe['name'] for recipe in response.json()['results']]
+        self.assertEqual(names, [f"Recipe {i:02d}" for i in range(20, 30)])
+        self.assertIsNone(response.json()['next'])
+
+
+class RecipeFieldsetTests(CatalogAPITestCase):
+    """
+    Lists render a summary by default; ?fields= and ?expand= pick what is rendered and loaded.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.flour = Ingredient.objects.create(**FIXTURE_INGREDIENTS['flour'])
+        cls.recipe = Recipe.objects.create(
+            name='Bread', description='Crusty.', instructions='Bake.', meal_type='lunch', total_calories=910.0)
+        RecipeIngredient.objects.create(recipe=cls.recipe, ingredient=cls.flour, quantity=2, unit='cup')
+
+    def test_list_defaults_to_summary(self):
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/v1/recipes/')
+        recipe = response.json()['results'][0]
+        self.assertEqual(set(recipe), {'id', 'name', 'meal_type', 'total_calories',
+                                       'total_protein_g', 'total_carbs_g', 'total_fat_g'})
+
+    def test_sparse_fields_only_load_needed_columns(self):
+        with self.assertNumQueries(4) as context:
+            response = self.client.get('/api/v1/recipes/', {'fields': 'id,total_calories'})
+        self.assertEqual(response.json()['results'], [{'id': self.recipe.pk, 'total_calories': 910.0}])
+        self.assertNotIn('instructions', context.captured_queries[-1]['sql'])
+
+    def test_expanded_ingredients_omit_usda_portions(self):
+        response = self.client.get('/api/v1/recipes/', {'expand': 'ingredients'})
+        ingredient = response.json()['results'][0]['ingredient_details'][0]['ingredient']
+        self.assertEqual(ingredient['name'], self.flour.name)
+        self.assertNotIn('usda_food_portions', ingredient)
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/api/v1/recipes/', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_portions_served_by_ingredient_detail(self):
+        response = self.client.get(f'/api/v1/ingredients/{self.flour.pk}/')
+        self.assertEqual(response.json()['usda_food_portions'], FIXTURE_INGREDIENTS['flour']['usda_food_portions'])
+        response = self.client.get('/api/v1/ingredients/')
+        self.assertNotIn('usda_food_portions', response.json()['results'][0])
+
+
+class CatalogConditionalGetTests(CatalogAPITestCase):
+    """
+    Recipe responses carry a catalog-version ETag and are answered with 304 when unchanged.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipe = Recipe.objects.create(
+            name='Oats', instructions='Soak.', meal_type='breakfast', total_calories=350.0)
+
+    def test_if_none_match_returns_304_after_version_check_only(self):
+        response = self.client.get('/api/v1/recipes/')
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/recipes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Each URL gets its own tag
+        detail = self.client.get(f'/api/v1/recipes/{self.recipe.pk}/')
+        self.assertNotEqual(detail['ETag'], etag)
+
+    def test_catalog_write_changes_etag(self):
+        etag = self.client.get('/api/v1/recipes/')['ETag']
+        self.recipe.total_calories = 360.0
+        self.recipe.save()
+        response = self.client.get('/api/v1/recipes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class RecipeFragmentCacheTests(CatalogAPITestCase):
+    """
+    Rendered recipes are cached per recipe updated_at and fieldset and shared between endpoints.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='planner', password='secret-pass')
+        UserProfile.objects.get_or_create(user=cls.user)
+        flour = Ingredient.objects.create(**FIXTURE_INGREDIENTS['flour'])
+        cls.recipes = {}
+        for meal_type in ('breakfast', 'lunch', 'dinner', 'snack'):
+            recipe = Recipe.objects.create(
+                name=f"{meal_type.title()} bake", instructions='Bake.', meal_type=meal_type)
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=flour, quantity=1, unit='cup')
+            recipe.calculate_nutrition(save_to_instance=True)
+            cls.recipes[meal_type] = recipe
+
+    def test_cached_page_skips_recipe_queries(self):
+        params = {'expand': 'ingredients'}
+        cold = self.client.get('/api/v1/recipes/', params)
+        # Catalog version, COUNT and page IDs only
+        with self.assertNumQueries(3):
+            warm = self.client.get('/api/v1/recipes/', params)
+        self.assertEqual(json.loads(warm.content), json.loads(cold.content))
+
+        # A different fieldset is cached separately
+        sparse = self.client.get('/api/v1/recipes/', {'fields': 'id'})
+        self.assertEqual(set(json.loads(sparse.content)['results'][0]), {'id'})
+
+    def test_catalog_write_invalidates_fragments(self):
+        recipe = self.recipes['lunch']
+        self.client.get(f'/api/v1/recipes/{recipe.pk}/')
+        recipe.name = 'Renamed bake'
+        recipe.save()
+        response = self.client.get(f'/api/v1/recipes/{recipe.pk}/')
+        self.assertEqual(json.loads(response.content)['name'], 'Renamed bake')
+        self.assertEqual(self.client.get('/api/v1/recipes/999999/').status_code, 404)
+
+    def test_unrelated_writes_keep_fragments_warm(self):
+        lunch, dinner = self.recipes['lunch'], self.recipes['dinner']
+        self.client.get(f'/api/v1/recipes/{lunch.pk}/')
+        dinner.name = 'Renamed bake'
+        dinner.save()
+        # Catalog version and recipe stamp; the recipe itself comes from the cache
+        with self.assertNumQueries(2):
+            self.client.get(f'/api/v1/recipes/{lunch.pk}/')
+
+    def test_ingredient_writes_invalidate_their_recipes(self):
+        lunch = self.recipes['lunch']
+        self.client.get(f'/api/v1/recipes/{lunch.pk}/')
+        flour = Ingredient.objects.get(fdc_id=FIXTURE_INGREDIENTS['flour']['fdc_id'])
+        flour.name = 'Wheat flour'
+        flour.save()
+        detail = json.loads(self.client.get(f'/api/v1/recipes/{lunch.pk}/').content)
+        self.assertEqual(detail['ingredient_details'][0]['ingredient']['name'], 'Wheat flour')
+
+        # Bulk upserts from the FDC importer too
+        payload = fixture_fdc_payload('flour')
+        payload['foodNutrients'][0]['amount'] += 1
+        self.assertEqual(len(upsert_ingredients({flour.fdc_id: parse_food(payload)})[1]), 1)
+        detail = json.loads(self.client.get(f'/api/v1/recipes/{lunch.pk}/').content)
+        self.assertEqual(detail['ingredient_details'][0]['ingredient']['name'], FIXTURE_INGREDIENTS['flour']['name'])
+
+        line = RecipeIngredient.objects.get(recipe=lunch)
+        line.quantity = 2
+        line.save()
+        detail = json.loads(self.client.get(f'/api/v1/recipes/{lunch.pk}/').content)
+        self.assertEqual(float(detail['ingredient_details'][0]['quantity']), 2.0)
+        line.delete()
+        detail = json.loads(self.client.get(f'/api/v1/recipes/{lunch.pk}/').content)
+        self.assertEqual(detail['ingredient_details'], [])
+
+    def test_meal_plan_reuses_detail_fragments(self):
+        self.client.force_login(self.user)
+        response = self.client.post('/api/v1/mealplan/generate/')
+        self.assertEqual(response.status_code, 200)
+        meals = json.loads(response.content)['meals']
+        for meal_type, recipe in self.recipes.items():
+            detail = json.loads(self.client.get(f'/api/v1/recipes/{recipe.pk}/').content)
+            self.assertEqual(meals[meal_type], detail)
+
+
+class FastJSONRendererTests(TestCase):
+    """
+    The fast renderer must match DRF's JSON output, with or without orjson installed.
+    """
+
+    data = {'name': 'Crème brûlée', 'grams': Decimal('12.50'), 'ids': [1, 2],
+            'nested': {'ok': True, 'missing': None}}
+
+    def test_output_matches_drf(self):
+        expected = json.loads(JSONRenderer().render(self.data))
+        for orjson_module in (renderers.orjson, None):
+            with mock.patch.object(renderers, 'orjson', orjson_module):
+                rendered = FastJSONRenderer().render(self.data)
+            self.assertEqual(json.loads(rendered), expected)
+
+    def test_splices_raw_fragments(self):
+        fragments = [RawJSON(b'{"id":1}'), RawJSON(b'{"id":2}')]
+        data = {'count': 2, 'results': RawJSON.array(fragments)}
+        rendered = FastJSONRenderer().render(data)
+        self.assertEqual(rendered, b'{"count":2,"results":[{"id":1},{"id":2}]}')
+        indented = FastJSONRenderer().render(
+            data, 'application/json; indent=2', {})
+        self.assertEqual(json.loads(indented), json.loads(rendered))
+
+
+class RecipeFilterSearchTests(CatalogAPITestCase):
+    """
+    Meal type and nutrient range filters, and full-text search kept in sync with writes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.chicken = Ingredient.objects.create(**FIXTURE_INGREDIENTS['chicken'])
+        cls.flour = Ingredient.objects.create(**FIXTURE_INGREDIENTS['flour'])
+        cls.salad = Recipe.objects.create(
+            name='Garden salad', description='Crisp greens.', instructions='Toss.',
+            meal_type='lunch', total_calories=320.0, total_protein_g=30.0)
+        cls.bread = Recipe.objects.create(
+            name='Soda bread', instructions='Bake.', meal_type='dinner',
+            total_calories=900.0, total_protein_g=20.0)
+        cls.pancakes = Recipe.objects.create(
+            name='Pancakes', description='Fluffy and golden.', instructions='Fry.',
+            meal_type='breakfast', total_calories=610.0, total_protein_g=15.0)
+        RecipeIngredient.objects.create(recipe=cls.salad, ingredient=cls.chicken, quantity=150, unit='g')
+        RecipeIngredient.objects.create(recipe=cls.bread, ingredient=cls.flour, quantity=3, unit='cup')
+        RecipeIngredient.objects.create(recipe=cls.pancakes, ingredient=cls.flour, quantity=1, unit='cup')
+
+    def names(self, **params):
+        response = self.client.get('/api/v1/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_meal_type_and_ranges(self):
+        self.assertEqual(self.names(meal_type='lunch,dinner'), ['Garden salad', 'Soda bread'])
+        self.assertEqual(self.names(calories_min=300, calories_max=700), ['Garden salad', 'Pancakes'])
+        self.assertEqual(self.names(meal_type='breakfast', protein_min=20), [])
+        self.assertEqual(self.names(protein_min=20), ['Garden salad', 'Soda bread'])
+
+    def test_invalid_filters_are_rejected(self):
+        self.assertEqual(self.client.get('/api/v1/recipes/', {'meal_type': 'brunch'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/recipes/', {'calories_max': 'lots'}).status_code, 400)
+
+    def test_search_covers_name_description_and_ingredients(self):
+        self.assertEqual(self.names(search='bread'), ['Soda bread'])
+        self.assertEqual(self.names(search='golden'), ['Pancakes'])
+        self.assertEqual(self.names(search='wheat flour'), ['Pancakes', 'Soda bread'])
+        # Prefix matching for search-as-you-type
+        self.assertEqual(self.names(search='chick'), ['Garden salad'])
+        self.assertEqual(self.names(search='wheat', meal_type='dinner'), ['Soda bread'])
+
+    def test_index_follows_writes(self):
+        self.chicken.name = 'Turkey breast'
+        self.chicken.save()
+        self.assertEqual(self.names(search='turkey'), ['Garden salad'])
+        self.assertEqual(self.names(search='chicken'), [])
+
+        RecipeIngredient.objects.filter(recipe=self.pancakes).delete()
+        self.assertEqual(self.names(search='flour'), ['Soda bread'])
+
+        self.bread.name = 'Rye loaf'
+        self.bread.save()
+        self.assertEqual(self.names(search='rye'), ['Rye loaf'])
+        self.bread.delete()
+        self.assertEqual(self.names(search='rye'), [])
+
+
+# --- Ingredient autocomplete ---
+class IngredientAutocompleteTests(TestCase):
+    """
+    The autocomplete endpoint answers from the in-memory prefix index, which follows writes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ingredients = {key: Ingredient.objects.create(**fields)
+                           for key, fields in FIXTURE_INGREDIENTS.items()}
+
+    def setUp(self):
+        reset_ingredient_index()
+        self.addCleanup(reset_ingredient_index)
+
+    def names(self, q, **params):
+        response = self.client.get('/api/v1/ingredients/autocomplete/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [match['name'] for match in response.json()]
+
+    def test_prefix_matching(self):
+        self.names('warm up')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names('chick'), [FIXTURE_INGREDIENTS['chicken']['name']])
+        # Every word must match, in any order
+        self.assertEqual(self.names('raw ap'), [FIXTURE_INGREDIENTS['apple']['name']])
+        self.assertEqual(self.names('whole milk'), [FIXTURE_INGREDIENTS['milk']['name']])
+        self.assertEqual(len(self.names('r', limit=2)), 2)
+        self.assertEqual(self.names(''), [])
+
+    def test_fdc_id_prefix(self):
+        self.assertEqual(self.names('16976'), [FIXTURE_INGREDIENTS['flour']['name']])
+
+    def test_index_follows_writes(self):
+        self.names('warm up')
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='Crème fraîche', fdc_id=999001)
+        self.assertEqual(self.names('creme'), ['Crème fraîche'])
+
+        egg = self.ingredients['egg']
+        egg.name = 'Egg, duck, whole'
+        with self.captureOnCommitCallbacks(execute=True):
+            egg.save()
+        self.assertEqual(self.names('duck'), ['Egg, duck, whole'])
+        self.assertEqual(self.names('fresh'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            egg.delete()
+        self.assertEqual(self.names('egg'), [])
+
+    def test_rolled_back_writes_leave_the_index_alone(self):
+        self.names('warm up')
+        milk = self.ingredients['milk']
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                Ingredient.objects.create(name='Crème fraîche', fdc_id=999001)
+                milk.delete()
+                Ingredient.objects.create(name='Duplicate', fdc_id=999001)
+            # Nor do bulk upserts
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                upsert_ingredients({999002: {**parse_food(fixture_fdc_payload('flour')), 'name': 'Spelt flour'}})
+                Ingredient.objects.create(name='Duplicate', fdc_id=999002)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.names('creme'), [])
+        self.assertIn(FIXTURE_INGREDIENTS['milk']['name'], self.names('milk'))
+        self.assertEqual(self.names('spelt'), [])
+
+    def test_refreshes_in_background_only_after_changes(self):
+        holder = ProcessWideIndex(IngredientPrefixIndex.from_db)
+        index = holder.get()
+        self.assertFalse(holder.refresh())
+        self.assertIs(holder.get(), index)
+
+        # A write made by another process: no signal reaches this one
+        Ingredient.objects.filter(pk=self.ingredients['egg'].pk).update(
+            name='Egg, goose, whole', updated_at=timezone.now())
+        with self.settings(INGREDIENT_INDEX_CHECK_SECONDS=0), \
+                mock.patch('api.autocomplete.threading.Thread') as thread:
+            with self.assertNumQueries(0):
+                self.assertIs(holder.get(), index)
+            thread.assert_called_once()
+            # The check is throttled while a refresh is pending
+            holder.get()
+            thread.assert_called_once()
+        self.assertTrue(holder.refresh())
+        self.assertEqual(holder.get().search_ids('goose'), [self.ingredients['egg'].pk])
+        self.assertEqual(index.search_ids('goose'), [])
+
+    def test_incremental_updates_match_a_rebuild(self):
+        rows = [(i, f"Food {i % 7} item {i}", 100000 + i) for i in range(1, 200)]
+        index = IngredientPrefixIndex(rows[:100])
+        for row in rows[100:]:
+            index.add(*row)
+        for ingredient_id in range(1, 200, 3):
+            index.remove(ingredient_id)
+        index.add(5, 'Food renamed', 100005)
+
+        expected_rows = [row for row in rows if row[0] % 3 != 1 and row[0] != 5]
+        rebuilt = IngredientPrefixIndex(expected_rows + [(5, 'Food renamed', 100005)])
+        for query in ('food', 'food 3', 'item 1', 'renamed', '1001'):
+            self.assertEqual(index.search(query, limit=50), rebuilt.search(query, limit=50))
+
+
+class IngredientLineTests(TestCase):
+    """
+    Free-text lines split into quantity, normalized unit and a matched catalog ingredient.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cook', password='pw')
+        cls.ingredients = {key: Ingredient.objects.create(**fields)
+                           for key, fields in FIXTURE_INGREDIENTS.items()}
+
+    def setUp(self):
+        reset_ingredient_matcher()
+        self.addCleanup(reset_ingredient_matcher)
+
+    def test_quantities_and_units(self):
+        cases = {
+            '2 cups all-purpose flour, sifted': (2.0, 'cup', 'all-purpose flour'),
+            '1 1/2 tbsp olive oil': (1.5, 'tbsp', 'olive oil'),
+            '1½ cups whole milk': (1.5, 'cup', 'whole milk'),
+            '2-3 apples': (2.5, 'piece', 'apples'),
+            '1-1/2 cups water': (1.5, 'cup', 'water'),
+            '1 1/2-2 cups milk': (1.75, 'cup', 'milk'),
+            '1-1/2 to 2 cups milk': (1.75, 'cup', 'milk'),
+            '1/2-3/4 cup sugar': (0.625, 'cup', 'sugar'),
+            'a pinch of salt': (1 / 16, 'tsp', 'salt'),
+            '1 (14 oz) can tomatoes': (1.0, 'piece', 'tomatoes'),
+            '2 T butter': (2.0, 'tbsp', 'butter'),
+            '1 t vanilla': (1.0, 'tsp', 'vanilla'),
+            '250ml milk': (250.0, 'ml', 'milk'),
+            'Salt to taste': (None, None, 'Salt to taste'),
+        }
+        for line, expected in cases.items():
+            self.assertEqual(parse_line(line), expected, line)
+        # Names starting with a quantity word aren't quantities
+        unquantified = ['apple', 'almonds', 'avocado, sliced', 'anchovies', 'tenderloin steak',
+                        'sixteen bean soup mix', 'onion', 'half-and-half']
+        for line in unquantified:
+            self.assertEqual(parse_line(line), (None, None, line.split(',')[0]), line)
+        self.assertEqual(parse_line('an apple'), (1.0, 'piece', 'apple'))
+        self.assertEqual(parse_line('ten almonds'), (10.0, 'piece', 'almonds'))
+        self.assertEqual(parse_line('six anchovies'), (6.0, 'piece', 'anchovies'))
+        quantity, unit, _ = parse_line('1 lb chicken breast')
+        self.assertEqual(unit, 'g')
+        self.assertAlmostEqual(quantity, 453.59237)
+
+    def test_matching_prefers_generic_foods(self):
+        matcher = IngredientMatcher([
+            (1, 'Wheat flour, white, all-purpose, enriched, bleached'),
+            (2, 'Cookies, made with wheat flour, chocolate chip, commercially prepared'),
+            (3, 'Tomatoes, red, ripe, raw'),
+            (4, 'Soup, tomato, canned, condensed'),
+        ])
+        self.assertEqual(matcher.match('all-purpose flour')[0], 1)
+        self.assertEqual(matcher.match('flour')[0], 1)
+        self.assertEqual(matcher.match('ripe tomatoes, diced')[0], 3)
+        self.assertIsNone(matcher.match('saffron'))
+
+    def test_matcher_follows_writes(self):
+        self.assertIsNone(parse_ingredient_lines(['a pinch of saffron'])[0]['ingredient_id'])
+        with self.captureOnCommitCallbacks(execute=True):
+            saffron = Ingredient.objects.create(name='Spices, saffron', fdc_id=999002)
+        self.assertEqual(parse_ingredient_lines(['a pinch of saffron'])[0]['ingredient_id'], saffron.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            saffron.delete()
+        self.assertIsNone(parse_ingredient_lines(['a pinch of saffron'])[0]['ingredient_id'])
+
+    def test_rolled_back_writes_leave_the_matcher_alone(self):
+        parse_ingredient_lines(['warm up'])
+        egg_id = self.ingredients['egg'].pk
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                Ingredient.objects.create(name='Spices, saffron', fdc_id=999002)
+                Ingredient.objects.get(pk=egg_id).delete()
+                Ingredient.objects.create(name='Duplicate', fdc_id=999002)
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                upsert_ingredients({999003: {**parse_food(fixture_fdc_payload('flour')), 'name': 'Spelt flour'}})
+                Ingredient.objects.create(name='Duplicate', fdc_id=999003)
+        self.assertEqual(callbacks, [])
+        results = parse_ingredient_lines(['a pinch of saffron', '2 eggs', '1 cup spelt flour'])
+        self.assertIsNone(results[0]['ingredient_id'])
+        self.assertEqual(results[1]['ingredient_id'], egg_id)
+        self.assertEqual(results[2]['ingredient_id'], self.ingredients['flour'].pk)
+
+    def test_incremental_updates_match_a_rebuild(self):
+        rows = [(i, f"Food {i % 7} item {i}" + ', raw' * (i % 2)) for i in range(1, 200)]
+        matcher = IngredientMatcher(rows[:100])
+        for row in rows[100:]:
+            matcher.add(*row)
+        for ingredient_id in range(1, 200, 3):
+            matcher.remove(ingredient_id)
+        matcher.add(5, 'Food renamed')
+
+        rebuilt = IngredientMatcher([row for row in rows if row[0] % 3 != 1 and row[0] != 5] + [(5, 'Food renamed')])
+        for query in ('food 3', 'item 150', 'renamed', 'raw food 4', 'item 1'):
+            self.assertEqual(matcher.match(query), rebuilt.match(query), query)
+
+    def test_parse_endpoint(self):
+        url = '/api/v1/ingredients/parse/'
+        lines = ['2 cups all-purpose flour', '3 large eggs', 'a pinch of saffron', 'apple']
+        self.assertEqual(self.client.post(url, {'lines': lines}, content_type='application/json').status_code, 403)
+
+        self.client.force_login(self.user)
+        response = self.client.post(url, {'lines': lines}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual([result['ingredient_id'] for result in results],
+                         [self.ingredients['flour'].id, self.ingredients['egg'].id, None,
+                          self.ingredients['apple'].id])
+        self.assertEqual((results[1]['quantity'], results[1]['unit']), (3.0, 'piece'))
+
+        response = self.client.post(url, {'lines': 'flour'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class RecipeImportTests(CatalogAPITestCase):
+    """
+    Bulk imports validate whole batches up front and match what single-row writes would store.
+    """
+    url = '/api/v1/recipes/import/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='editor', password='pw', is_staff=True)
+        cls.ingredients = {key: Ingredient.objects.create(**fields)
+                           for key, fields in FIXTURE_INGREDIENTS.items()}
+
+    def setUp(self):
+        super().setUp()
+        reset_ingredient_matcher()
+        self.addCleanup(reset_ingredient_matcher)
+
+    def recipe(self, name, ingredients=None, **fields):
+        return {'name': name, 'instructions': 'Mix and bake.', 'meal_type': 'breakfast', **fields,
+                'ingredients': ingredients if ingredients is not None else [
+                    {'ingredient': self.ingredients['flour'].id, 'quantity': 2, 'unit': 'cup'},
+                    {'fdc_id': FIXTURE_INGREDIENTS['egg']['fdc_id'], 'quantity': 2, 'unit': 'piece'},
+                    '1 tbsp olive oil',
+                ]}
+
+    def post(self, payload, **params):
+        query = '&'.join(f"{key}={value}" for key, value in params.items())
+        return self.client.post(f"{self.url}?{query}", payload, content_type='application/json')
+
+    def test_import_matches_calculate_nutrition(self):
+        self.client.force_login(self.admin)
+        version = CatalogVersion.current().cache_token
+        response = self.post([self.recipe('Pancakes'), self.recipe('Crepes', description='Thin')])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()['created'], response.json()['lines']), (2, 6))
+        self.assertNotEqual(CatalogVersion.current().cache_token, version)
+
+        recipe = Recipe.objects.get(name='Pancakes')
+        imported = (recipe.total_calories, recipe.total_protein_g, recipe.total_fat_g, recipe.total_carbs_g)
+        recipe.calculate_nutrition(save_to_instance=True)
+        self.assertEqual(imported, (recipe.total_calories, recipe.total_protein_g,
+                                    recipe.total_fat_g, recipe.total_carbs_g))
+        self.assertEqual(recipe.ingredient_details.count(), 3)
+
+        response = self.client.get('/api/v1/recipes/', {'search': 'thin olive'})
+        self.assertEqual([item['name'] for item in response.json()['results']], ['Crepes'])
+
+    def test_invalid_batch_writes_nothing(self):
+        self.client.force_login(self.admin)
+        Recipe.objects.create(name='Existing', instructions='-', meal_type='lunch')
+        response = self.post([
+            self.recipe('Fine'),
+            self.recipe('Existing'),
+            self.recipe('Bad lines', [{'ingredient': 999999, 'quantity': 1, 'unit': 'g'},
+                                      {'ingredient': self.ingredients['sugar'].id, 'quantity': -1, 'unit': 'g'},
+                                      '2 cups saffron']),
+            self.recipe('Bad meal', meal_type='brunch'),
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = {error['index']: error['errors'] for error in response.json()['errors']}
+        self.assertEqual(sorted(errors), [1, 2, 3])
+        self.assertEqual(sorted(errors[2]), ['ingredients[0]', 'ingredients[1]', 'ingredients[2]'])
+        self.assertIn('meal_type', errors[3])
+        self.assertFalse(Recipe.objects.filter(name='Fine').exists())
+
+        response = self.post([self.recipe('Fine'), self.recipe('Existing')], on_conflict='skip')
+        self.assertEqual((response.status_code, response.json()['created'], response.json()['skipped']),
+                         (201, 1, 1))
+
+    def test_admin_only_and_ndjson(self):
+        self.assertEqual(self.post([self.recipe('Pancakes')]).status_code, 403)
+        self.client.force_login(self.admin)
+        body = '\n'.join(json.dumps(self.recipe(f"Waffles {i}")) for i in range(3)) + '\n'
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        self.assertEqual((response.status_code, response.json()['created']), (201, 3))
+
+    def test_command_round_trips_an_export(self):
+        import_recipes([self.recipe('Pancakes')])
+        exported = list(iter_recipe_chunks())[0][0]
+        exported['name'] = 'Pancakes (copy)'
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'recipes.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump([exported], f)
+            call_command('import_recipes', path, stdout=io.StringIO())
+        original, copy = (Recipe.objects.get(name=name) for name in ('Pancakes', 'Pancakes (copy)'))
+        self.assertEqual(copy.total_calories, original.total_calories)
+        self.assertEqual(sorted(copy.ingredient_details.values_list('ingredient_id', 'quantity', 'unit')),
+                         sorted(original.ingredient_details.values_list('ingredient_id', 'quantity', 'unit')))
+
+
+class AuditConversionsTests(TestCase):
+    """
+    The conversion audit groups problem lines by (ingredient, unit) across recipe chunks.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ingredients = {key: Ingredient.objects.create(**fields)
+                           for key, fields in FIXTURE_INGREDIENTS.items()}
+        lines = [('flour', 2, 'cup'), ('olive_oil', 30, 'ml'), ('chicken', 1, 'cup'), ('sugar', 0, 'g')]
+        for i in range(5):
+            recipe = Recipe.objects.create(name=f"Audit {i}", instructions='-', meal_type='dinner')
+            for key, quantity, unit in lines[:2 + i % 3]:
+                RecipeIngredient.objects.create(recipe=recipe, ingredient=cls.ingredients[key],
+                                                quantity=quantity, unit=unit)
+
+    def audit(self, *args):
+        out = io.StringIO()
+        call_command('audit_conversions', '--chunk-size', '2', *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_json_report(self):
+        with self.assertNoLogs('api.models', level='ERROR'):
+            report = json.loads(self.audit())
+        summary = report['summary']
+        self.assertEqual((summary['recipes'], summary['lines']), (5, 14))
+        self.assertEqual(summary['lines_by_method'],
+                         {'portion': 5, 'density': 5, 'unconvertible': 3, 'zero_quantity': 1})
+        self.assertEqual((summary['recipes_with_unconvertible'], summary['recipes_with_density_fallback'],
+                          summary['recipes_with_zero_quantity']), (3, 5, 1))
+
+        [unconvertible] = report['unconvertible']
+        self.assertEqual((unconvertible['ingredient_id'], unconvertible['unit'], unconvertible['lines']),
+                         (self.ingredients['chicken'].id, 'cup', 3))
+        self.assertEqual(unconvertible['ingredient_name'], self.ingredients['chicken'].name)
+        [density] = report['density_fallback']
+        self.assertEqual((density['unit'], density['lines'], density['density']), ('ml', 5, 0.92))
+        [zero] = report['zero_quantity']
+        self.assertEqual((zero['ingredient_name'], zero['lines']), (self.ingredients['sugar'].name, 1))
+
+    def test_csv_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'audit.csv')
+            self.audit('--format', 'csv', '--output', path)
+            with open(path, encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual([(row['issue'], row['unit'], row['lines']) for row in rows],
+                         [('unconvertible', 'cup', '3'), ('density_fallback', 'ml', '5'),
+                          ('zero_quantity', 'g', '1')])
+
+
+# --- Meal plan generation ---
+class MealPlanQueryTests(CatalogAPITestCase):
+    """
+    Plan hydration loads every chosen recipe's ingredients in one query, whatever their number.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='hungry', password='secret-pass')
+        UserProfile.objects.get_or_create(user=cls.user)
+        ingredients = [Ingredient.objects.create(**fields) for fields in FIXTURE_INGREDIENTS.values()]
+        for meal_type in ('breakfast', 'lunch', 'dinner', 'snack'):
+            recipe = Recipe.objects.create(
+                name=f"{meal_type.title()} plate", instructions='Serve.', meal_type=meal_type)
+            for ingredient in ingredients:
+                RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, quantity=50, unit='g')
+            recipe.calculate_nutrition(save_to_instance=True)
+
+    def test_plan_query_budget(self):
+        self.client.force_login(self.user)
+        # Session, user, profile, planner catalog, chosen recipes,
+        # then all their recipe ingredients joined with their ingredient
+        with self.assertNumQueries(6):
+            response = self.client.post('/api/v1/mealplan/generate/')
+        self.assertEqual(response.status_code, 200)
+        meals = response.json()['meals']
+        self.assertEqual(len(meals), 4)
+        for meal in meals.values():
+            self.assertEqual(len(meal['ingredient_details']), len(FIXTURE_INGREDIENTS))
+
+        # With the recipes' fragments cached, the ingredient query goes away
+        with self.assertNumQueries(5):
+            self.client.post('/api/v1/mealplan/generate/')
+
+    def test_server_timing_and_metrics(self):
+        self.client.force_login(self.user)
+        with self.assertLogs('api.metrics', level='INFO') as logs, \
+                mock.patch.object(connection, 'execute_wrapper', wraps=connection.execute_wrapper) as install:
+            response = self.client.post('/api/v1/mealplan/generate/')
+        self.assertEqual(response.status_code, 200)
+        # One query counter for the whole request, however many phases run in the planner loop
+        install.assert_called_once()
+
+        metrics = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            metrics[name] = dict(param.split('=', 1) for param in params)
+        phases = ['profile', 'catalog', 'scoring', 'selection', 'hydration', 'serialization']
+        self.assertEqual(list(metrics), phases + ['db', 'total'])
+        for values in metrics.values():
+            self.assertGreaterEqual(float(values['dur']), 0.0)
+        # Session and user lookups run before the view and aren't attributed to a phase
+        self.assertEqual(metrics['db']['desc'], '"4 queries"')
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((record['event'], record['status'], record['user_id']), ('mealplan.generate', 200, self.user.pk))
+        self.assertEqual(record['phase_queries'], {
+            'profile': 1, 'catalog': 1, 'scoring': 0, 'selection': 0, 'hydration': 1, 'serialization': 1})
+        self.assertEqual(sorted(record['phases_ms']), sorted(phases))
+        self.assertAlmostEqual(sum(record['phases_ms'].values()), record['total_ms'], places=2)
+
+    def test_planner_returns_timings(self):
+        plan = generate_daily_meal_plan_v1(UserProfile.objects.get(user=self.user))
+        timings = plan['timings']
+        self.assertEqual(timings['phase_queries'], {
+            'catalog': 1, 'scoring': 0, 'selection': 0, 'hydration': 1})
+        self.assertEqual(timings['queries'], 2)
+        self.assertEqual(set(timings), {'phases_ms', 'phase_queries', 'queries', 'query_ms', 'total_ms'})
+
+    def test_nested_phases_count_queries_once(self):
+        timer = PhaseTimer()
+        with timer.phase('outer'):
+            Recipe.objects.count()
+            with timer.phase('inner'):
+                Recipe.objects.count()
+        self.assertEqual(timer.as_dict()['phase_queries'], {'outer': 1, 'inner': 1})
+        # The inner phase's time is already part of the outer one
+        self.assertEqual(timer.total_ms, timer.phases['outer']['ms'])
+        self.assertLess(timer.total_ms, timer.phases['outer']['ms'] + timer.phases['inner']['ms'])
+        self.assertIn(f"total;dur={timer.phases['outer']['ms']:.1f}", timer.server_timing_header())
+
+
+class SharedPlannerCatalogTests(TestCase):
+    """
+    The shared planner catalog is republished whenever CatalogVersion moves.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipes = {
+            meal_type: Recipe.objects.create(
+                name=f"{meal_type.title()} bowl", instructions='-', meal_type=meal_type,
+                total_calories=400.0, total_protein_g=20.0, total_carbs_g=50.0, total_fat_g=10.0)
+            for meal_type in ('breakfast', 'lunch', 'dinner')
+        }
+
+    def setUp(self):
+        self.shm_name = f"nptest_{os.getpid()}_{self._testMethodName[5:25]}"
+        self.addCleanup(unlink_catalog, self.shm_name)
+
+    def shared_settings(self):
+        return self.settings(PLANNER_SHARED_CATALOG=True, PLANNER_CATALOG_SHM_NAME=self.shm_name)
+
+    def test_publish_map_republish_unlink(self):
+        generation = publish_catalog(name=self.shm_name)
+        catalog = get_shared_catalog(self.shm_name)
+        self.assertEqual((catalog.generation, catalog.catalog_version), (generation, catalog_version_key()))
+        self.assertEqual(list(catalog.ids['lunch']), [self.recipes['lunch'].pk])
+        self.assertIs(get_shared_catalog(self.shm_name), catalog)
+
+        extra = Recipe.objects.create(name='Second lunch', instructions='-', meal_type='lunch', total_calories=300.0)
+        self.assertEqual(publish_catalog(name=self.shm_name), generation + 1)
+        swapped = get_shared_catalog(self.shm_name)
+        self.assertEqual(list(swapped.ids['lunch']), [self.recipes['lunch'].pk, extra.pk])
+        # Mapped before the swap: still readable although its segment has been unlinked
+        self.assertEqual(list(catalog.ids['lunch']), [self.recipes['lunch'].pk])
+        self.assertEqual(next(catalog.iter_recipes('breakfast'))[1]['calories'], 400.0)
+
+        self.assertTrue(unlink_catalog(self.shm_name))
+        self.assertIsNone(get_shared_catalog(self.shm_name))
+        self.assertFalse(unlink_catalog(self.shm_name))
+
+    def test_planner_republishes_after_writes(self):
+        with self.shared_settings():
+            catalog = load_planner_catalog()
+            self.assertIs(load_planner_catalog(), catalog)
+            self.recipes['dinner'].delete()
+            republished = load_planner_catalog()
+        self.assertEqual(republished.generation, catalog.generation + 1)
+        self.assertEqual((republished.count('lunch'), republished.count('dinner')), (1, 0))
+
+    def test_falls_back_to_the_database(self):
+        with self.shared_settings(), self.assertLogs('api.catalog', level='WARNING'), \
+                mock.patch('api.catalog.publish_catalog', side_effect=OSError('No space left on device')):
+            catalog = load_planner_catalog()
+        self.assertEqual((catalog.generation, len(catalog)), (0, 3))
+
+    def test_deleted_recipes_leave_the_plan(self):
+        stale = PlannerCatalog.from_db()
+        self.recipes['lunch'].delete()
+        with mock.patch('api.meal_planner_logic.load_planner_catalog', return_value=stale), \
+                self.assertLogs('api.meal_planner_logic', level='WARNING'):
+            plan = generate_daily_meal_plan_v1(UserProfile(target_calories=1200))
+        self.assertIsNone(plan['plan_recipes']['lunch'])
+        self.assertEqual(plan['plan_recipes']['dinner'], self.recipes['dinner'])
+        self.assertEqual(plan['plan_totals']['calories'], 800.0)
+
+
+class CatalogSnapshotTests(TestCase):
+    """
+    export_catalog_snapshot / load_catalog_snapshot round-trip the catalog through one binary file.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ingredients = {key: Ingredient.objects.create(**fields)
+                           for key, fields in FIXTURE_INGREDIENTS.items()}
+        lines = {
+            'Crêpes': ('breakfast', [('flour', 1, 'cup'), ('egg', 2, 'piece'), ('milk', 250, 'ml')]),
+            'Chicken bowl': ('dinner', [('chicken', 150, 'g'), ('olive_oil', 1, 'tbsp')]),
+            # Chicken has no cup portion: this line can't be converted to grams
+            'Odd stew': ('lunch', [('sugar', 10, 'g'), ('chicken', 1, 'cup')]),
+        }
+        cls.recipes = {}
+        for name, (meal_type, recipe_lines) in lines.items():
+            recipe = cls.recipes[name] = Recipe.objects.create(name=name, instructions='-', meal_type=meal_type)
+            for key, quantity, unit in recipe_lines:
+                RecipeIngredient.objects.create(recipe=recipe, ingredient=cls.ingredients[key],
+                                                quantity=quantity, unit=unit)
+        for name in ('Crêpes', 'Chicken bowl'):
+            cls.recipes[name].calculate_nutrition(save_to_instance=True)
+        # Never calculated: kept in the snapshot, left out of the planner catalog
+        Recipe.objects.create(name='Draft', instructions='-', meal_type='snack')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'catalog.snap')
+        with self.assertLogs('api.models', level='ERROR'):
+            call_command('export_catalog_snapshot', self.path, stdout=io.StringIO())
+
+    def test_round_trip_arrays_and_names(self):
+        with CatalogSnapshot(self.path) as snapshot:
+            self.assertEqual(snapshot.counts, {'recipes': 4, 'ingredients': len(FIXTURE_INGREDIENTS),
+                                               'recipe_ingredients': 7})
+            recipes = list(Recipe.objects.order_by('pk'))
+            self.assertEqual(list(snapshot['recipe_ids']), [recipe.pk for recipe in recipes])
+            self.assertEqual([snapshot.recipe_name(i) for i in range(len(recipes))],
+                             [recipe.name for recipe in recipes])
+            ingredients = list(Ingredient.objects.order_by('pk'))
+            self.assertEqual([snapshot.ingredient_name(i) for i in range(len(ingredients))],
+                             [ingredient.name for ingredient in ingredients])
+            self.assertEqual(list(snapshot['ingr_fdc_ids']), [ingredient.fdc_id for ingredient in ingredients])
+            crepes = recipes.index(self.recipes['Crêpes'])
+            self.assertEqual(list(snapshot['recipe_macros'][crepes * 4:crepes * 4 + 4]),
+                             [recipes[crepes].total_calories, recipes[crepes].total_protein_g,
+                              recipes[crepes].total_carbs_g, recipes[crepes].total_fat_g])
+            # Unconvertible lines are kept with a NaN gram weight
+            self.assertEqual(sum(math.isnan(grams) for grams in snapshot['ri_grams']), 1)
+
+            catalog, expected = snapshot.to_planner_catalog(), PlannerCatalog.from_db()
+            for meal_type in ('breakfast', 'lunch', 'dinner', 'snack'):
+                self.assertEqual(list(catalog.ids[meal_type]), list(expected.ids[meal_type]))
+                self.assertEqual(list(catalog.macros[meal_type]), list(expected.macros[meal_type]))
+
+    def test_load_publishes_to_shared_memory(self):
+        name = f"nptest_{os.getpid()}_snapshot"
+        self.addCleanup(unlink_catalog, name)
+        out = io.StringIO()
+        call_command('load_catalog_snapshot', self.path, '--name', name, stdout=out)
+        self.assertIn('Published 2 recipes', out.getvalue())
+        published = get_shared_catalog(name)
+        self.assertEqual(list(published.ids['breakfast']), [self.recipes['Crêpes'].pk])
+        self.assertEqual(published.catalog_version, catalog_version_key())
+
+        # The planner serves the snapshot as is until the catalog changes
+        with self.settings(PLANNER_SHARED_CATALOG=True, PLANNER_CATALOG_SHM_NAME=name):
+            self.assertIs(load_planner_catalog(), published)
+            self.recipes['Chicken bowl'].delete()
+            self.assertEqual(load_planner_catalog().generation, published.generation + 1)
+
+    def test_restore_into_db(self):
+        with self.assertRaises(CommandError):
+            call_command('load_catalog_snapshot', self.path, '--into-db', stdout=io.StringIO())
+        with self.assertRaises(CommandError):
+            call_command('load_catalog_snapshot', os.path.join(os.path.dirname(self.path), 'missing.snap'))
+
+        expected_recipes = list(Recipe.objects.order_by('pk').values_list(
+            'pk', 'name', 'meal_type', 'total_calories', 'total_protein_g'))
+        expected_ingredients = list(Ingredient.objects.order_by('pk').values_list('pk', 'name', 'fdc_id'))
+        Recipe.objects.all().delete()
+        Ingredient.objects.all().delete()
+        version = CatalogVersion.current().cache_token
+
+        call_command('load_catalog_snapshot', self.path, '--into-db', stdout=io.StringIO())
+        self.assertEqual(list(Recipe.objects.order_by('pk').values_list(
+            'pk', 'name', 'meal_type', 'total_calories', 'total_protein_g')), expected_recipes)
+        self.assertEqual(list(Ingredient.objects.order_by('pk').values_list('pk', 'name', 'fdc_id')),
+                         expected_ingredients)
+        self.assertNotEqual(CatalogVersion.current().cache_token, version)
+        # Lines come back as grams; the unconvertible chicken cup is dropped
+        stew = Recipe.objects.get(name='Odd stew')
+        self.assertEqual(list(stew.ingredient_details.values_list('ingredient__name', 'quantity', 'unit')),
+                         [(FIXTURE_INGREDIENTS['sugar']['name'], 10.0, 'g')])
+        crepes = Recipe.objects.get(name='Crêpes')
+        self.assertEqual(sorted(crepes.ingredient_details.values_list('quantity', flat=True)), [100.0, 125.0, 250.0])
+
+
+class RecipeBatchTests(CatalogAPITestCase):
+    """
+    recipes/batch/ returns many recipes in a constant number of queries, keyed by ID.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        flour = Ingredient.objects.create(**FIXTURE_INGREDIENTS['flour'])
+        cls.recipes = []
+        for i in range(6):
+            recipe = Recipe.objects.create(name=f"Batch {i}", instructions='Bake.', meal_type='dinner')
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=flour, quantity=1 + i, unit='cup')
+            cls.recipes.append(recipe)
+
+    def test_batch_query_budget_and_shape(self):
+        ids = [recipe.pk for recipe in self.recipes[:4]]
+        # Catalog version, recipe stamps, recipes, their recipe ingredients joined with their ingredient
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/v1/recipes/batch/', {'ids': f"{ids[2]},{ids[0]},999999"})
+        body = response.json()
+        self.assertEqual(list(body['results']), [str(ids[2]), str(ids[0])])
+        self.assertEqual(body['not_found'], [999999])
+        self.assertEqual(len(body['results'][str(ids[0])]['ingredient_details']), 1)
+        self.assertEqual(set(body['etags']), set(body['results']))
+        self.assertTrue(response.has_header('ETag'))
+
+        # Shares fragments with the detail endpoint: cached recipes only cost their stamps
+        self.client.get(f'/api/v1/recipes/{ids[1]}/')
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/recipes/batch/', {'ids': ','.join(map(str, ids[:3]))})
+        self.assertEqual(len(response.json()['results']), 3)
+
+    def test_item_etags_follow_content(self):
+        first, second = self.recipes[:2]
+        params = {'ids': f"{first.pk},{second.pk}"}
+        etags = self.client.get('/api/v1/recipes/batch/', params).json()['etags']
+        first.description = 'Now with a description.'
+        first.save()
+        changed = self.client.get('/api/v1/recipes/batch/', params).json()['etags']
+        self.assertNotEqual(changed[str(first.pk)], etags[str(first.pk)])
+        self.assertEqual(changed[str(second.pk)], etags[str(second.pk)])
+
+    def test_invalid_ids(self):
+        self.assertEqual(self.client.get('/api/v1/recipes/batch/').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/recipes/batch/', {'ids': '1,x'}).status_code, 400)
+        too_many = ','.join(str(i) for i in range(1, 102))
+        self.assertEqual(self.client.get('/api/v1/recipes/batch/', {'ids': too_many}).status_code, 400)
+
+
+# --- Benchmarks ---
+class PlannerBenchmarkTests(TestCase):
+    """
+    The planner benchmark's statistics and exact optimum, and a rolled-back smoke run.
+    """
+
+    def test_percentile(self):
+        samples = list(range(1, 11))
+        self.assertIsNone(percentile([], 50))
+        self.assertEqual([percentile(samples, pct) for pct in (0, 50, 90, 95, 100)], [1, 5, 9, 10, 10])
+        self.assertEqual(percentile([7.5], 99), 7.5)
+        self.assertEqual(latency_summary([3.0, 1.0, 2.0])['p50_ms'], 2.0)
+
+    def test_exact_daily_optimum(self):
+        # (calories, protein, carbs, fat) per recipe
+        recipes = {
+            'breakfast': [(300, 15, 30, 10), (250, 10, 20, 5)],
+            'lunch': [(400, 20, 40, 12), (500, 25, 50, 15)],
+            'dinner': [(300, 15, 30, 10)],
+            'snack': [(200, 10, 20, 10)],
+        }
+        catalog = PlannerCatalog(
+            {meal_type: array('q', range(len(rows))) for meal_type, rows in recipes.items()},
+            {meal_type: array('d', [value for row in rows for value in row]) for meal_type, rows in recipes.items()})
+
+        def brute_force(targets):
+            # The snack may be left out, like the planner does
+            return min(
+                calculate_daily_plan_fitness_score(dict(zip(('calories', 'protein', 'carbs', 'fat'),
+                                                            map(sum, zip(*combo)))), targets)
+                for combo in itertools.product(recipes['breakfast'], recipes['lunch'], recipes['dinner'],
+                                               recipes['snack'] + [(0, 0, 0, 0)]))
+
+        # First breakfast + first lunch + dinner, no snack = (1000, 50, 100, 32): only 2 g of fat off
+        targets = {'calories': 1000, 'protein_g': 50, 'carbs_g': 100, 'fat_g': 30}
+        self.assertEqual(exact_daily_optimum(catalog, targets), 2.0)
+        self.assertEqual(brute_force(targets), 2.0)
+        # The same plus the snack = (1200, 60, 120, 42): 2 g of fat off again
+        targets = {'calories': 1200, 'protein_g': 60, 'carbs_g': 120, 'fat_g': 40}
+        self.assertEqual(exact_daily_optimum(catalog, targets), 2.0)
+        self.assertEqual(brute_force(targets), 2.0)
+
+        # Either half of the search exceeding the limit skips it
+        self.assertIsNone(exact_daily_optimum(catalog, targets, limit=1))
+        self.assertIsNone(exact_daily_optimum(PlannerCatalog({}, {}), targets))
+
+    def test_bench_planner_rolls_back(self):
+        api_logger = logging.getLogger('api')
+        self.addCleanup(api_logger.setLevel, api_logger.level)
+        Recipe.objects.create(name='Keep me', instructions='-', meal_type='lunch', total_calories=500.0)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'planner.json')
+            call_command('bench_planner', '--sizes', '10', '--repeat', '1', '--output', path, stdout=io.StringIO())
+            with open(path, encoding='utf-8') as f:
+                report = json.load(f)
+        self.assertEqual(len(report['results']), 4)
+        for result in report['results']:
+            self.assertEqual((result['catalog_size'], result['latency']['runs']), (10, 1))
+        self.assertEqual(list(Recipe.objects.values_list('name', flat=True)), ['Keep me'])
+
+
+# --- Delta sync ---
+class RecipeChangesTests(CatalogAPITestCase):
+    """
+    recipes/changes/ reports recipes changed through any of their rows, and deleted recipes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.flour = Ingredient.objects.create(**FIXTURE_INGREDIENTS['flour'])
+        cls.sugar = Ingredient.objects.create(**FIXTURE_INGREDIENTS['sugar'])
+        cls.bread = Recipe.objects.create(name='Bread', instructions='Bake.', meal_type='lunch')
+        cls.cake = Recipe.objects.create(name='Cake', instructions='Bake.', meal_type='snack')
+        cls.soup = Recipe.objects.create(name='Soup', instructions='Simmer.', meal_type='dinner')
+        RecipeIngredient.objects.create(recipe=cls.bread, ingredient=cls.flour, quantity=2, unit='cup')
+        RecipeIngredient.objects.create(recipe=cls.cake, ingredient=cls.sugar, quantity=1, unit='cup')
+        # Backdate the fixtures so only the writes made by each test count as changes
+        long_ago = timezone.now() - timedelta(days=30)
+        for model in (Ingredient, Recipe, RecipeIngredient):
+            model.objects.update(updated_at=long_ago)
+
+    def changes(self, since):
+        response = self.client.get('/api/v1/recipes/changes/', {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_changes_since_watermark(self):
+        since = self.changes(format_watermark(timezone.now()))['watermark']
+        self.assertEqual(self.changes(since)['changed'], [])
+
+        self.sugar.name = 'Caster sugar'
+        self.sugar.save()
+        self.soup.description = 'Hearty.'
+        self.soup.save()
+        RecipeIngredient.objects.filter(recipe=self.bread).delete()
+        body = self.changes(since)
+        self.assertEqual([recipe['name'] for recipe in body['changed']], ['Bread', 'Cake', 'Soup'])
+        self.assertEqual(body['changed'][1]['ingredient_details'][0]['ingredient']['name'], 'Caster sugar')
+        self.assertEqual(body['deleted'], [])
+        self.assertTrue(body['watermark'].endswith('Z'))
+
+    def test_deleted_recipes(self):
+        since = format_watermark(timezone.now())
+        soup_id = self.soup.pk
+        self.soup.delete()
+        body = self.changes(since)
+        self.assertEqual(body['deleted'], [soup_id])
+        self.assertEqual(body['changed'], [])
+
+    def test_invalid_and_oversized(self):
+        self.assertEqual(self.client.get('/api/v1/recipes/changes/').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/recipes/changes/', {'since': 'yesterday'}).status_code, 400)
+        with mock.patch('api.views.CHANGES_MAX_RECIPES', 1):
+            body = self.changes('2000-01-01T00:00:00Z')
+        self.assertTrue(body['full_sync_required'])
+        self.assertNotIn('changed', body)
+
+
+class SeedFixtureTests(CatalogAPITestCase):
+    """
+    The shipped data.json predates updated_at and must still load.
+    """
+
+    def test_shipped_fixture_loads(self):
+        # Content types and permissions are created by migrate with their own primary keys
+        call_command('loaddata', settings.BASE_DIR / 'data.json', verbosity=0,
+                     exclude=['contenttypes', 'auth.permission', 'admin.logentry'])
+        self.assertEqual(Recipe.objects.count(), 12)
+        self.assertEqual(RecipeIngredient.objects.count(), 29)
+        self.assertFalse(Ingredient.objects.filter(updated_at__isnull=True).exists())
+
+        # Ordinary saves still move updated_at forward
+        long_ago = timezone.now() - timedelta(days=30)
+        for model in (Ingredient, Recipe, RecipeIngredient):
+            model.objects.update(updated_at=long_ago)
+        recipe = Recipe.objects.first()
+        since = format_watermark(timezone.now())
+        recipe.calculate_nutrition(save_to_instance=True)
+        response = self.client.get('/api/v1/recipes/changes/', {'since': since})
+        self.assertEqual([item['name'] for item in response.json()['changed']], [recipe.name])
+
+
+# --- NDJSON export ---
+class RecipeExportTests(CatalogAPITestCase):
+    """
+    The NDJSON export matches the detail representation and costs two queries per chunk.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        ingredients = [Ingredient.objects.create(**FIXTURE_INGREDIENTS[key]) for key in ('flour', 'egg')]
+        for i in range(5):
+            recipe = Recipe.objects.create(
+                name=f"Export {i}", description='', instructions='Cook.', meal_type='dinner',
+                total_calories=100.0 * i)
+            for ingredient in ingredients[:1 + i % 2]:
+                RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, quantity=1, unit='cup')
+
+    def test_lines_match_detail_endpoint(self):
+        response = self.client.get('/api/v1/recipes/export/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 5)
+        for line in lines:
+            recipe = json.loads(line)
+            self.assertEqual(recipe, self.client.get(f"/api/v1/recipes/{recipe['id']}/").json())
+
+    def test_chunked_query_count(self):
+        # Two queries per chunk of two recipes, plus the empty chunk that ends the walk
+        with self.assertNumQueries(7):
+            chunks = list(iter_recipe_chunks(chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+
+
+
+# --- USDA ingestion ---
+class TokenBucketTests(TestCase):
+    def test_burst_then_steady_rate(self):
+        clock = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            clock[0] += seconds
+
+        bucket = TokenBucket(rate=2.0, capacity=3, clock=lambda: clock[0], sleep=sleep)
+        for _ in range(5):
+            bucket.acquire()
+        # Three banked tokens, then one every half second
+        self.assertEqual(sleeps, [0.5, 0.5])
+
+    def test_hourly_quota_is_never_exceeded(self):
+        bucket = TokenBucket.for_hourly_quota(quota=1000, burst=50)
+        self.assertAlmostEqual(bucket.capacity + bucket.rate * 3600, 1000)
+
+
+class FDCFetchTests(TestCase):
+    """
+    The fetcher retries 429/5xx with backoff and runs requests concurrently against a local stub.
+    """
+
+    def setUp(self):
+        self.foods = {FIXTURE_INGREDIENTS[key]['fdc_id']: fixture_fdc_payload(key)
+                      for key in FIXTURE_INGREDIENTS}
+        self.server = StubFDCServer(self.foods).start()
+        self.addCleanup(self.server.stop)
+        self.sleeps = []
+        self.client = FDCClient('test-key', base_url=self.server.base_url, max_retries=3,
+                                sleep=self.sleeps.append)
+        self.addCleanup(self.client.close)
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = cache_dir.name
+        self.vetted = [(fields['name'], str(fields['fdc_id'])) for fields in FIXTURE_INGREDIENTS.values()]
+
+    def populate(self, vetted=None, **options):
+        options = {'api_key': 'test-key', 'base_url': self.server.base_url, 'burst': 100,
+                   'cache_dir': self.cache_dir, **options}
+        with mock.patch('api.management.commands.populate_ingredients.PRE_VETTED_INGREDIENTS',
+                        vetted or self.vetted):
+            call_command('populate_ingredients', **options)
+
+    def test_non_json_bodies_are_retried_then_reported(self):
+        maintenance = '<html><body>Down for maintenance</body></html>'
+        self.server.fail_next(200, body=maintenance)
+        self.assertEqual(self.client.get_food(FIXTURE_INGREDIENTS['egg']['fdc_id'])['fdcId'],
+                         FIXTURE_INGREDIENTS['egg']['fdc_id'])
+
+        # Retries run out for the first food only; the rest of the run carries on
+        self.server.fail_next(200, count=4, body=maintenance)
+        ids = [FIXTURE_INGREDIENTS[key]['fdc_id'] for key in ('flour', 'egg', 'milk')]
+        results = {fdc_id: (food, error) for fdc_id, food, error in fetch_foods(self.client, ids, workers=1)}
+        food, error = results[ids[0]]
+        self.assertIsNone(food)
+        self.assertIsInstance(error, FDCError)
+        self.assertIn('Invalid JSON', str(error))
+        self.assertTrue(all(food is not None for food, _ in (results[ids[1]], results[ids[2]])))
+
+    def test_unexpected_errors_fail_one_item(self):
+        def get_food(fdc_id):
+            if fdc_id == 2:
+                raise RuntimeError('boom')
+            return {'fdcId': fdc_id}
+
+        with mock.patch.object(self.client, 'get_food', side_effect=get_food), \
+                self.assertLogs('api.fdc', level='ERROR'):
+            results = list(fetch_foods(self.client, [1, 2, 3]))
+        errors = {fdc_id: error for fdc_id, _, error in results}
+        self.assertEqual(sorted(errors), [1, 2, 3])
+        self.assertIsInstance(errors[2], FDCError)
+        self.assertIsNone(errors[1])
+
+    def test_retries_with_exponential_backoff(self):
+        self.server.fail_next(503, count=2)
+        food = self.client.get_food(FIXTURE_INGREDIENTS['egg']['fdc_id'])
+        self.assertEqual(food['description'], FIXTURE_INGREDIENTS['egg']['name'])
+        self.assertEqual(self.sleeps, [1.0, 2.0])
+
+        self.server.fail_next(429, retry_after=7)
+        self.client.get_food(FIXTURE_INGREDIENTS['egg']['fdc_id'])
+        self.assertEqual(self.sleeps[-1], 7.0)
+
+    def test_gives_up_on_client_errors_and_exhausted_retries(self):
+        with self.assertRaises(FDCError) as context:
+            self.client.get_food(1)
+        self.assertEqual(context.exception.status_code, 404)
+        self.server.fail_next(500, count=4)
+        with self.assertRaises(FDCError):
+            self.client.get_food(FIXTURE_INGREDIENTS['egg']['fdc_id'])
+
+    def test_concurrent_fetch_yields_every_id(self):
+        ids = list(self.foods) + [1]
+        results = {fdc_id: (data, error) for fdc_id, data, error in fetch_foods(self.client, ids, workers=3)}
+        self.assertEqual(set(results), set(ids))
+        self.assertIsInstance(results[1][1], FDCError)
+        self.assertEqual(results[ids[0]][0]['fdcId'], ids[0])
+
+    def test_populate_ingredients_against_stub(self):
+        self.server.fail_next(429, retry_after=0)
+        self.populate(workers=3)
+        self.assertEqual(Ingredient.objects.count(), len(FIXTURE_INGREDIENTS))
+        flour = Ingredient.objects.get(fdc_id=FIXTURE_INGREDIENTS['flour']['fdc_id'])
+        self.assertEqual(flour.protein_per_100g, FIXTURE_INGREDIENTS['flour']['protein_per_100g'])
+        self.assertEqual(flour.usda_food_portions, FIXTURE_INGREDIENTS['flour']['usda_food_portions'])
+        # All fixture foods fit in one `foods` request (plus the scripted 429)
+        self.assertEqual([path for _, path, _ in self.server.requests], ['/fdc/v1/foods'] * 2)
+
+    def test_multi_food_fetch_skips_unknown_ids(self):
+        ids = list(self.foods)[:3]
+        foods = self.client.get_foods(ids + [1])
+        self.assertEqual([food['fdcId'] for food in foods], ids)
+        with self.assertRaises(ValueError):
+            self.client.get_foods(range(21))
+
+    def test_batched_fetch_cuts_requests_twentyfold(self):
+        self.server.foods.update(synthetic_fdc_foods(200, random.Random(1)))
+        fetched = set()
+        for batch_ids, foods, error in fetch_food_batches(self.client, self.server.foods, 20, workers=3):
+            self.assertIsNone(error)
+            self.assertLessEqual(len(batch_ids), 20)
+            fetched.update(food['fdcId'] for food in foods)
+        self.assertEqual(fetched, set(self.server.foods))
+        self.assertEqual(self.client.requests_made, -(-len(self.server.foods) // 20))
+
+    def test_populate_ingredients_updates_existing_in_bulk(self):
+        egg = fixture_ingredient('egg', name='Egg')
+        egg.save()
+        vetted = self.vetted + [('Unknown food', '1')]
+        self.populate(vetted, batch_size=3)
+        self.assertEqual(len(self.server.requests), -(-len(vetted) // 3))
+        self.assertEqual(Ingredient.objects.count(), len(FIXTURE_INGREDIENTS))
+        egg.refresh_from_db()
+        self.assertEqual(egg.name, FIXTURE_INGREDIENTS['egg']['name'])
+        self.assertFalse(Ingredient.objects.filter(fdc_id=1).exists())
+        # An ID the API doesn't know fails every time, so it doesn't keep the journal alive
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, 'populate_ingredients.journal')))
+
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        self.server.fail_next(404)  # Not retried: the first batch fails outright
+        self.populate(batch_size=3, workers=1)
+        self.assertEqual(Ingredient.objects.count(), len(FIXTURE_INGREDIENTS) - 3)
+        journal = os.path.join(self.cache_dir, 'populate_ingredients.journal')
+        self.assertTrue(os.path.exists(journal))
+
+        # Only the failed batch is fetched again; completed IDs aren't even re-parsed
+        self.server.requests.clear()
+        with self.assertLogs('api.management.commands.populate_ingredients', level='WARNING') as logs:
+            self.populate(batch_size=3, workers=1)
+        self.assertIn(f'skipping {len(FIXTURE_INGREDIENTS) - 3} FDC IDs', logs.output[0])
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(Ingredient.objects.count(), len(FIXTURE_INGREDIENTS))
+        self.assertFalse(os.path.exists(journal))
+
+    def test_offline_reparse_uses_cached_responses(self):
+        self.populate()
+        # As if an older parser had derived different values
+        Ingredient.objects.update(protein_per_100g=0, fdc_content_hash='')
+        self.server.requests.clear()
+        self.populate(api_key='', base_url='http://127.0.0.1:9/', offline=True, restart=True)
+        self.assertEqual(self.server.requests, [])
+        flour = Ingredient.objects.get(fdc_id=FIXTURE_INGREDIENTS['flour']['fdc_id'])
+        self.assertEqual(flour.protein_per_100g, FIXTURE_INGREDIENTS['flour']['protein_per_100g'])
+
+    def test_sync_fetches_and_writes_only_changed_foods(self):
+        self.populate()
+        flour_id, apple_id = FIXTURE_INGREDIENTS['flour']['fdc_id'], FIXTURE_INGREDIENTS['apple']['fdc_id']
+        apple_updated_at = Ingredient.objects.get(fdc_id=apple_id).updated_at
+        # Republished: flour with new values, apple with identical ones
+        self.server.foods[flour_id] = fixture_fdc_payload('flour', extra_nutrients=0)
+        self.server.foods[flour_id]['publicationDate'] = '4/1/2024'
+        self.server.foods[flour_id]['foodNutrients'][0]['amount'] = 11.5
+        self.server.foods[apple_id]['publicationDate'] = '4/1/2024'
+        self.server.requests.clear()
+
+        output_path = os.path.join(self.cache_dir, 'changed.json')
+        self.populate(sync=True, changed_ids_output=output_path)
+        fetched = [request for request in self.server.requests if request[1] == '/fdc/v1/foods']
+        self.assertEqual(len(fetched), 1)
+        self.assertEqual(len(self.server.requests), 2)  # One list page, one foods batch
+
+        flour = Ingredient.objects.get(fdc_id=flour_id)
+        with open(output_path) as f:
+            self.assertEqual(json.load(f), [flour.id])
+        apple = Ingredient.objects.get(fdc_id=apple_id)
+        self.assertEqual(apple.updated_at, apple_updated_at)
+        self.assertEqual(str(apple.fdc_publication_date), '2024-04-01')
+
+        # Nothing changed since: only the listing is requested
+        self.server.requests.clear()
+        self.populate(sync=True)
+        self.assertEqual([path for _, path, _ in self.server.requests], ['/fdc/v1/foods/list'])
+
+
+class FDCDumpImportTests(TestCase):
+    """
+    import_fdc_dump streams FDC bulk downloads (JSON, CSV, zipped) into ingredients.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.foods = [fixture_fdc_payload(key, extra_nutrients=20) for key in FIXTURE_INGREDIENTS]
+
+    def import_dump(self, path, **options):
+        out = io.StringIO()
+        call_command('import_fdc_dump', path, stdout=out, **options)
+        return out.getvalue()
+
+    def test_json_array_is_decoded_across_small_reads(self):
+        document = json.dumps({'SRLegacyFoods': self.foods}, indent=1)
+        self.assertEqual(list(iter_json_array(io.StringIO(document), read_size=7)), self.foods)
+        self.assertEqual(list(iter_json_array(io.StringIO('[]'))), [])
+
+    def test_imports_zipped_json_and_updates_on_rerun(self):
+        path = os.path.join(self.directory, 'sr_legacy.zip')
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr('FoodData_Central_sr_legacy_food_json/sr_legacy.json',
+                             json.dumps({'SRLegacyFoods': self.foods}))
+        output = self.import_dump(path, batch_size=3)
+        self.assertIn('rows/s', output)
+        self.assertEqual(Ingredient.objects.count(), len(FIXTURE_INGREDIENTS))
+        flour = Ingredient.objects.get(fdc_id=FIXTURE_INGREDIENTS['flour']['fdc_id'])
+        self.assertEqual(flour.protein_per_100g, FIXTURE_INGREDIENTS['flour']['protein_per_100g'])
+        self.assertEqual(flour.usda_food_portions, FIXTURE_INGREDIENTS['flour']['usda_food_portions'])
+
+        output = self.import_dump(path)
+        # Identical foods skip the write
+        self.assertIn(f"0 created, 0 updated, {len(FIXTURE_INGREDIENTS)} unchanged", output)
+        self.assertEqual(Ingredient.objects.count(), len(FIXTURE_INGREDIENTS))
+
+    def test_imports_csv_tables(self):
+        def write(name, rows):
+            with open(os.path.join(self.directory, name), 'w', newline='') as f:
+                f.write('\n'.join(','.join(f'"{value}"' for value in row) for row in rows) + '\n')
+
+        egg = FIXTURE_INGREDIENTS['egg']
+        write('food.csv', [('fdc_id', 'data_type', 'description', 'food_category_id', 'publication_date'),
+                           (egg['fdc_id'], 'sr_legacy_food', egg['name'], 1, '2019-04-01'),
+                           (1, 'sr_legacy_food', 'No nutrients', 1, '2019-04-01')])
+        write('food_nutrient.csv', [('id', 'fdc_id', 'nutrient_id', 'amount'),
+                                    (1, egg['fdc_id'], 1003, egg['protein_per_100g']),
+                                    (2, egg['fdc_id'], 1004, egg['fat_per_100g']),
+                                    (3, egg['fdc_id'], 1005, egg['carbs_per_100g']),
+                                    (4, egg['fdc_id'], 1008, egg['calories_per_100g']),
+                                    (5, egg['fdc_id'], 1162, 0.0)])
+        write('measure_unit.csv', [('id', 'name'), (1000, 'cup')])
+        write('food_portion.csv', [('id', 'fdc_id', 'seq_num', 'amount', 'measure_unit_id', 'portion_description',
+                                    'modifier', 'gram_weight'),
+                                   (7, egg['fdc_id'], 2, 1.0, 1000, '', 'chopped', 136.0),
+                                   (6, egg['fdc_id'], 1, 1.0, 9999, '', 'large', 50.0)])
+
+        output = self.import_dump(os.path.join(self.directory, 'food.csv'))
+        self.assertIn('1 created, 0 updated, 0 unchanged, 1 skipped', output)
+        ingredient = Ingredient.objects.get(fdc_id=egg['fdc_id'])
+        self.assertEqual(ingredient.calories_per_100g, egg['calories_per_100g'])
+        self.assertEqual([portion['modifier'] for portion in ingredient.usda_food_portions], ['large', 'chopped'])
+        self.assertEqual(ingredient.usda_food_portions[1]['measureUnit']['name'], 'cup')
+
+    def test_csv_foods_stream_in_bounded_memory(self):
+        food_count = 2000
+        with open(os.path.join(self.directory, 'food.csv'), 'w', newline='') as f:
+            f.write('fdc_id,data_type,description,publication_date\n')
+            f.writelines(f'{i},sr_legacy_food,Food {i},2019-04-01\n' for i in range(food_count))
+        with open(os.path.join(self.directory, 'food_nutrient.csv'), 'w', newline='') as f:
+            # Grouped by nutrient rather than by food, as nothing guarantees the order
+            f.write('id,fdc_id,nutrient_id,amount\n')
+            f.writelines(f'{n * food_count + i},{i},{nutrient_id},{i % 50}.5\n'
+                         for n, nutrient_id in enumerate((1003, 1004, 1005, 1008)) for i in range(food_count))
+        with open(os.path.join(self.directory, 'food_portion.csv'), 'w', newline='') as f:
+            f.write('id,fdc_id,seq_num,amount,measure_unit_id,portion_description,modifier,gram_weight\n')
+            f.writelines(f'{i},{i},1,1.0,1000,,cup,120\n' for i in range(food_count))
+
+        source = DumpSource(self.directory)
+        self.addCleanup(source.close)
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        foods = 0
+        for food in iter_csv_foods(source):
+            foods += 1
+            self.assertEqual(len(food['foodNutrients']), 4)
+            self.assertEqual(len(food['foodPortions']), 1)
+        _, peak = tracemalloc.get_traced_memory()
+        self.assertEqual(foods, food_count)
+        # Holding every food's nutrients and portions took ~2.7 MB here; staged on disk, only
+        # the food being rebuilt is in memory
+        self.assertLess(peak, 512 * 1024)
+
+
+class IngredientWriterTests(TestCase):
+    """
+    Parsed foods are upserted in chunks with exact created/updated counts.
+    """
+
+    def setUp(self):
+        reset_ingredient_index()
+        self.addCleanup(reset_ingredient_index)
+        reset_ingredient_matcher()
+        self.addCleanup(reset_ingredient_matcher)
+
+    def test_chunks_report_created_and_updated(self):
+        fixture_ingredient('egg', name='Egg').save()
+        recipe = Recipe.objects.create(name='Omelette', instructions='', meal_type='breakfast')
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=Ingredient.objects.get(fdc_id=FIXTURE_INGREDIENTS['egg']['fdc_id']),
+            quantity=2, unit='piece')
+        index = get_ingredient_index()
+        matcher = get_ingredient_matcher()
+        version = CatalogVersion.current().cache_token
+
+        chunks = []
+        with IngredientWriter(batch_size=4, on_flush=lambda created, updated, unchanged: chunks.append(
+                (len(created), len(updated), len(unchanged)))) as writer, \
+                self.captureOnCommitCallbacks(execute=True):
+            for key in FIXTURE_INGREDIENTS:
+                writer.add(FIXTURE_INGREDIENTS[key]['fdc_id'], parse_food(fixture_fdc_payload(key)))
+        self.assertEqual((writer.created, writer.updated), (len(FIXTURE_INGREDIENTS) - 1, 1))
+        self.assertEqual(sum(map(sum, chunks)), len(FIXTURE_INGREDIENTS))
+        self.assertEqual(len(chunks), -(-len(FIXTURE_INGREDIENTS) // 4))
+
+        self.assertEqual(Ingredient.objects.count(), len(FIXTURE_INGREDIENTS))
+        self.assertEqual(Ingredient.objects.get(fdc_id=FIXTURE_INGREDIENTS['egg']['fdc_id']).name,
+                         FIXTURE_INGREDIENTS['egg']['name'])
+        # Bulk writes skip signals; the writer keeps caches and indexes in step itself
+        self.assertNotEqual(CatalogVersion.current().cache_token, version)
+        self.assertEqual(len(index.search('olive oil')), 1)
+        self.assertEqual(matcher.match('olive oil')[1], FIXTURE_INGREDIENTS['olive_oil']['name'])
+        response = self.client.get('/api/v1/recipes/', {'search': 'whole raw'})
+        self.assertEqual([item['id'] for item in response.json()['results']], [recipe.id])
+
+
+class NutrientParserTests(TestCase):
+    """
+    foodNutrients are indexed once per food; fields take the first available source.
+    """
+
+    def test_matches_fixture_macros(self):
+        fields = parse_food(fixture_fdc_payload('flour', extra_nutrients=150))
+        for field in ('calories_per_100g', 'protein_per_100g', 'fat_per_100g', 'carbs_per_100g'):
+            self.assertEqual(fields[field], FIXTURE_INGREDIENTS['flour'][field])
+
+    def test_priority_fallbacks_and_unit_factors(self):
+        food_nutrients = [
+            {'nutrient': {'id': 1062}, 'amount': 418.4},  # Energy in kJ
+            {'nutrient': {'id': 1003}, 'amount': 20.0},
+            {'nutrient': {'id': 1085}, 'amount': 5.0},  # Total fat (NLEA)
+            {'nutrient': {'id': 1004}, 'amount': 6.0},  # Total lipid wins over NLEA
+            {'nutrientId': 1050, 'value': 30.0},  # Abridged format
+        ]
+        values, missing = default_parser.parse(food_nutrients)
+        self.assertEqual(missing, [])
+        self.assertAlmostEqual(values['calories_per_100g'], 100.0)
+        self.assertEqual((values['fat_per_100g'], values['carbs_per_100g']), (6.0, 30.0))
+
+        values, missing = default_parser.parse(food_nutrients[:2])
+        self.assertEqual(missing, ['fat_per_100g', 'carbs_per_100g'])
 
-# Create your tests here.
+    def test_map_is_extensible(self):
+        parser = NutrientParser({**NUTRIENT_MAP, 'fiber_per_100g': (1079,)}, required=())
+        values, missing = parser.parse([{'nutrient': {'id': 1079}, 'amount': 2.7}])
+        self.assertEqual((values['fiber_per_100g'], values['protein_per_100g'], missing), (2.7, 0.0, []))
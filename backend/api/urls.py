@@ -4,19 +4,19 @@ from .views import (
     RegisterView,
     UserProfileView,
     RecipeViewSet,
-    MealPlanGenerateView
-    # Import IngredientViewSet if you created it
+    MealPlanGenerateView,
+    IngredientViewSet,
 )
 from .views import CustomAuthToken
 
 router = DefaultRouter()
 router.register(r'recipes', RecipeViewSet, basename='recipe')
-# router.register(r'ingredients', IngredientViewSet, basename='ingredient') # Uncomment if you have IngredientViewSet
+router.register(r'ingredients', IngredientViewSet, basename='ingredient')
 
 # The API URLs are now determined automatically by the router.
 # For simple views (not ViewSets), we define paths manually.
 urlpatterns = [
-    # Includes URLs for 'recipes' (and 'ingredients' if uncommented)
+    # Includes URLs for 'recipes' and 'ingredients'
     path('', include(router.urls)),
     path('auth/register/', RegisterView.as_view(), name='auth-register'),
     path('auth/login/', CustomAuthToken.as_view(), name='auth-login'),
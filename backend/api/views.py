@@ -3,17 +3,43 @@ from .serializers import (
     RegisterSerializer,
     UserProfileSerializer,
     RecipeSerializer,
-    # IngredientSerializer # If you want a direct endpoint for Ingredients
+    RecipeSummarySerializer,
+    IngredientSerializer,
+    IngredientSummarySerializer,
+    INGREDIENT_SUMMARY_COLUMNS,
+    ingredient_details_prefetch,
 )
-from .models import UserProfile, Recipe, Ingredient
+from .models import UserProfile, Recipe, Ingredient, RecipeIngredient, CatalogVersion
+from django.db.models import prefetch_related_objects
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from django.contrib.auth.models import User
 from rest_framework import generics, viewsets, status, permissions
 from rest_framework.response import Response
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 # For token authentication
 from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
 from .meal_planner_logic import generate_daily_meal_plan_v1
+from .instrumentation import PhaseTimer
+from .pagination import recipe_paginator_for, IngredientPagination
+from .renderers import FastJSONRenderer, RawJSON
+from .fragments import get_recipe_fragments, recipe_stamps
+from .filters import RecipeFilterBackend, RecipeSearchBackend
+from .export import iter_recipe_ndjson
+from .sync import (
+    CHANGES_MAX_RECIPES, changed_recipe_ids, deleted_recipe_ids, format_watermark, parse_watermark)
+from .autocomplete import AUTOCOMPLETE_DEFAULT_LIMIT, AUTOCOMPLETE_MAX_LIMIT, get_ingredient_index
+from .ingredient_lines import parse_ingredient_lines
+from .parsers import NDJSONParser
+from .recipe_import import ON_CONFLICT_ERROR, ON_CONFLICT_SKIP, RecipeImportError, import_recipes
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BrowsableAPIRenderer
+import hashlib
 import logging
 logger = logging.getLogger(__name__)
 
@@ -77,48 +103,317 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     #     serializer.save(user=self.request.user) # Ensure user is correctly associated if not read-only
 
 
+# --- Conditional GET on the catalog version ---
+class CatalogConditionalGetMixin:
+    """
+    Adds ETag / Last-Modified headers derived from the catalog version to list and retrieve,
+    and answers matching If-None-Match / If-Modified-Since requests with 304 before any
+    serialization or DB query beyond the version lookup.
+    """
+
+    def get_catalog_etag(self, request, catalog_version):
+        # The same URL can render differently per format, so both go into the tag
+        representation = f"{request.get_full_path()}|{request.accepted_renderer.format}"
+        digest = hashlib.sha256(representation.encode()).hexdigest()[:16]
+        return f'"catalog-{catalog_version.cache_token}-{digest}"'
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        catalog_version = CatalogVersion.current()
+        self.catalog_version = catalog_version
+        etag = self.get_catalog_etag(request, catalog_version)
+        last_modified = int(catalog_version.updated_at.timestamp())
+
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            # Let clients keep the body but revalidate it on every use
+            patch_cache_control(response, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+
+# Upper bound on ?ids= for recipes/batch/
+RECIPE_BATCH_MAX_IDS = 100
+# Upper bound on "lines" for ingredients/parse/
+INGREDIENT_PARSE_MAX_LINES = 200
+# Upper bound on recipes per recipes/import/ request; larger files go through manage.py import_recipes
+RECIPE_IMPORT_MAX_RECIPES = 1000
+
+
 # --- Recipe ViewSet (Read-Only for now) ---
 # Provides .list() and .retrieve() actions
-class RecipeViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Recipe.objects.all().order_by(
-        'name')  # Get all recipes, ordered by name
+class RecipeViewSet(CatalogConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    # Get all recipes, ordered by name. Columns and prefetches are narrowed in get_queryset()
+    # to match the fields being rendered.
+    queryset = Recipe.objects.all().order_by('name')
     serializer_class = RecipeSerializer
     # Allow anyone to view, but only auth users for other actions (if we add them)
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    # Add filtering or search backends later if needed
-    # filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    # filterset_fields = ['meal_type']
-    # search_fields = ['name', 'description', 'ingredients__name'] # Search by recipe name, description, or ingredient names
-    # ordering_fields = ['name', 'total_calories']
+    # Splices cached recipe fragments (see api/fragments.py) into the response body
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    # ?meal_type=, nutrient ranges (?calories_min= ...) and full-text ?search= over recipe name,
+    # description and ingredient names (see api/filters.py and api/search.py)
+    filter_backends = [RecipeFilterBackend, RecipeSearchBackend]
+
+    @property
+    def paginator(self):
+        # Page-number or cursor pagination, chosen per request (see api/pagination.py)
+        if not hasattr(self, '_paginator'):
+            self._paginator = recipe_paginator_for(
+                getattr(self, 'request', None))
+        return self._paginator
+
+    def get_rendered_fields(self):
+        """
+        Resolves the fields to render from ?fields=a,b and ?expand=ingredients.
+        Lists default to the summary representation, detail views to the full one.
+        """
+        if hasattr(self, '_rendered_fields'):
+            return self._rendered_fields
+
+        query_params = self.request.query_params
+        requested = [name.strip() for name in query_params.get(
+            'fields', '').split(',') if name.strip()]
+        if requested:
+            unknown = [name for name in requested
+                       if name not in RecipeSerializer.Meta.fields]
+            if unknown:
+                raise ValidationError(
+                    {"fields": f"Unknown field(s): {', '.join(unknown)}"})
+            fields = requested
+        elif self.action == 'list':
+            fields = list(RecipeSummarySerializer.Meta.fields)
+        else:
+            fields = list(RecipeSerializer.Meta.fields)
+
+        expand = [name.strip()
+                  for name in query_params.get('expand', '').split(',')]
+        if 'ingredients' in expand and 'ingredient_details' not in fields:
+            fields.append('ingredient_details')
+
+        self._rendered_fields = fields
+        return fields
+
+    def get_queryset(self):
+        fields = self.get_rendered_fields()
+        # Only load the columns we render, plus the ones pagination orders by
+        columns = {'id', 'name'} | (set(fields) - {'ingredient_details'})
+        queryset = super().get_queryset().only(*columns)
+        if 'ingredient_details' in fields:
+            # RecipeIngredients and their Ingredient (minus USDA portions) in one extra query
+            # per page, so the query count doesn't grow with the page size
+            queryset = queryset.prefetch_related(ingredient_details_prefetch())
+        return queryset
+
+    def get_serializer_class(self):
+        if self.get_rendered_fields() == RecipeSummarySerializer.Meta.fields:
+            return RecipeSummarySerializer
+        return RecipeSerializer
+
+    def get_serializer(self, *args, **kwargs):
+        if self.get_serializer_class() is RecipeSerializer:
+            kwargs['fields'] = self.get_rendered_fields()
+        return super().get_serializer(*args, **kwargs)
+
+    # --- Fragment-backed list and retrieve ---
+    # Pages are resolved to recipe IDs and updated_at stamps with a narrow query; each recipe's
+    # JSON comes from the fragment cache, and only the misses are loaded (with prefetches) and
+    # serialized.
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(self.list_from_fragments, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(self.retrieve_from_fragments, request, *args, **kwargs)
+
+    def get_recipe_fragments(self, stamps):
+        def render_missing(missing_ids):
+            recipes = list(self.get_queryset().in_bulk(missing_ids).values())
+            serializer = self.get_serializer(recipes, many=True)
+            return zip((recipe.pk for recipe in recipes), serializer.data)
+
+        return get_recipe_fragments(stamps, self.get_rendered_fields(), render_missing)
+
+    def list_from_fragments(self, request, *args, **kwargs):
+        self.get_rendered_fields()  # Reject unknown ?fields= before touching the DB
+        page = self.paginate_queryset(
+            self.filter_queryset(super().get_queryset().only('id', 'name', 'updated_at')))
+        recipe_ids = [recipe.pk for recipe in page]
+        fragments = self.get_recipe_fragments({recipe.pk: recipe.updated_at for recipe in page})
+        return self.get_paginated_response(RawJSON.array(
+            fragments[recipe_id] for recipe_id in recipe_ids if recipe_id in fragments))
+
+    @action(detail=False, methods=['get'])
+    def batch(self, request, *args, **kwargs):
+        """
+        GET recipes/batch/?ids=1,2,3 (at most RECIPE_BATCH_MAX_IDS)
+        Returns {"results": {id: recipe}, "etags": {id: etag}, "not_found": [id, ...]}.
+        Accepts ?fields= and ?expand= like the list; defaults to the full representation.
+        """
+        return self.conditional_response(self.batch_from_fragments, request, *args, **kwargs)
+
+    def batch_from_fragments(self, request, *args, **kwargs):
+        recipe_ids = self.get_batch_ids()
+        fragments = self.get_recipe_fragments(recipe_stamps(recipe_ids))
+        found = [recipe_id for recipe_id in recipe_ids if recipe_id in fragments]
+        return Response({
+            'results': {recipe_id: fragments[recipe_id] for recipe_id in found},
+            # Content-based, so clients can tell which recipes changed between two batches
+            'etags': {recipe_id: f'"{hashlib.sha256(fragments[recipe_id].content).hexdigest()[:16]}"'
+                      for recipe_id in found},
+            'not_found': [recipe_id for recipe_id in recipe_ids if recipe_id not in fragments],
+        })
+
+    def get_batch_ids(self):
+        raw_ids = [value.strip() for value in self.request.query_params.get(
+            'ids', '').split(',') if value.strip()]
+        if not raw_ids:
+            raise ValidationError({"ids": "Pass a comma-separated list of recipe IDs."})
+        try:
+            recipe_ids = list(dict.fromkeys(int(value) for value in raw_ids))
+        except ValueError:
+            raise ValidationError({"ids": "Recipe IDs must be integers."})
+        if len(recipe_ids) > RECIPE_BATCH_MAX_IDS:
+            raise ValidationError(
+                {"ids": f"At most {RECIPE_BATCH_MAX_IDS} recipe IDs per request."})
+        return recipe_ids
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request, *args, **kwargs):
+        """
+        GET recipes/changes/?since=<watermark>
+        Returns {"watermark", "changed": [recipe, ...], "deleted": [id, ...]} for recipes changed
+        or deleted since the watermark of a previous call (see api/sync.py), or
+        {"watermark", "full_sync_required": true} when too much changed to send as a delta.
+        """
+        raw_since = request.query_params.get('since', '')
+        since = parse_watermark(raw_since)
+        if since is None:
+            raise ValidationError(
+                {"since": "Pass the watermark returned by a previous call (ISO 8601 timestamp)."})
+
+        watermark = format_watermark(timezone.now())
+        recipe_ids = changed_recipe_ids(since)
+        if len(recipe_ids) > CHANGES_MAX_RECIPES:
+            return Response({'watermark': watermark, 'full_sync_required': True})
+
+        recipe_ids = sorted(recipe_ids)
+        fragments = self.get_recipe_fragments(recipe_stamps(recipe_ids))
+        return Response({
+            'watermark': watermark,
+            'full_sync_required': False,
+            'changed': [fragments[recipe_id] for recipe_id in recipe_ids if recipe_id in fragments],
+            'deleted': sorted(deleted_recipe_ids(since) - set(fragments)),
+        })
+
+    @action(detail=False, methods=['get'])
+    def export(self, request, *args, **kwargs):
+        """
+        GET recipes/export/
+        Streams every recipe (detail representation) as newline-delimited JSON, in constant memory.
+        """
+        return self.conditional_response(self.export_ndjson, request, *args, **kwargs)
+
+    def export_ndjson(self, request, *args, **kwargs):
+        response = StreamingHttpResponse(
+            iter_recipe_ndjson(), content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="recipes.ndjson"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import',
+            permission_classes=[permissions.IsAdminUser], parser_classes=[JSONParser, NDJSONParser])
+    def bulk_import(self, request, *args, **kwargs):
+        """
+        POST recipes/import/?on_conflict=error|skip
+        Body: a JSON array of recipes, {"recipes": [...]}, or NDJSON (application/x-ndjson) in the
+        recipes/export/ shape. All-or-nothing: any invalid recipe rejects the whole request with
+        400 and every error (see api/recipe_import.py).
+        """
+        records = request.data.get('recipes') if isinstance(request.data, dict) else request.data
+        if not isinstance(records, list):
+            raise ValidationError({"recipes": "Must be a list of recipes."})
+        if len(records) > RECIPE_IMPORT_MAX_RECIPES:
+            raise ValidationError({"recipes": f"At most {RECIPE_IMPORT_MAX_RECIPES} recipes per request."})
+        on_conflict = request.query_params.get('on_conflict', ON_CONFLICT_ERROR)
+        if on_conflict not in (ON_CONFLICT_ERROR, ON_CONFLICT_SKIP):
+            raise ValidationError({"on_conflict": f"Must be '{ON_CONFLICT_ERROR}' or '{ON_CONFLICT_SKIP}'."})
+        try:
+            result = import_recipes(records, on_conflict)
+        except RecipeImportError as e:
+            return Response({'errors': e.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
+
+    def retrieve_from_fragments(self, request, *args, **kwargs):
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            recipe_id = int(lookup)
+        except (TypeError, ValueError):
+            raise Http404
+        fragments = self.get_recipe_fragments(recipe_stamps([recipe_id]))
+        if recipe_id not in fragments:
+            raise Http404
+        return Response(fragments[recipe_id])
 
 
 # --- Meal Plan Generation View (Placeholder for now) ---
 class MealPlanGenerateView(APIView):
     # Only authenticated users can generate plans
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
 
     def post(self, request, *args, **kwargs):
-        try:
-            user_profile = UserProfile.objects.get(user=request.user)
-        except UserProfile.DoesNotExist:
-            return Response({"error": "User profile not found. Please set up your profile."}, status=status.HTTP_404_NOT_FOUND)
+        # Per-phase timings are returned in the Server-Timing header and logged as a metrics record
+        timer = PhaseTimer()
+        with timer.recording():
+            return self._generate(request, timer)
+
+    def _generate(self, request, timer):
+        with timer.phase('profile'):
+            try:
+                user_profile = UserProfile.objects.get(user=request.user)
+            except UserProfile.DoesNotExist:
+                user_profile = None
+        if user_profile is None:
+            return self._timed_response(timer, {"error": "User profile not found. Please set up your profile."}, status.HTTP_404_NOT_FOUND)
 
         logger.info(
             f"Meal plan generation requested for user: {request.user.username}")
 
-        generated_data = generate_daily_meal_plan_v1(user_profile)
+        generated_data = generate_daily_meal_plan_v1(user_profile, timer=timer)
 
         if not generated_data:
-            return Response({"error": "Could not generate a suitable meal plan with the current recipes and your targets. Try adjusting targets or check back later as more recipes are added."}, status=status.HTTP_400_BAD_REQUEST)
+            return self._timed_response(timer, {"error": "Could not generate a suitable meal plan with the current recipes and your targets. Try adjusting targets or check back later as more recipes are added."}, status.HTTP_400_BAD_REQUEST)
 
         # Serialize the plan for the response
-        # The plan_recipes dict contains Recipe model instances
+        # The plan_recipes dict contains Recipe model instances; their full JSON is shared
+        # with the recipe detail endpoint through the fragment cache
         serialized_meals = {}
-        for meal_type, recipe_obj in generated_data["plan_recipes"].items():
-            if recipe_obj:
-                serialized_meals[meal_type] = RecipeSerializer(recipe_obj).data
-            else:
-                serialized_meals[meal_type] = None
+        with timer.phase('serialization'):
+            plan_recipes = generated_data["plan_recipes"]
+            chosen = {recipe.pk: recipe for recipe in plan_recipes.values() if recipe}
+
+            def render_missing(missing_ids):
+                # One query for every uncached recipe's ingredients, then one batch serialization
+                recipes = [chosen[recipe_id] for recipe_id in missing_ids]
+                prefetch_related_objects(recipes, ingredient_details_prefetch())
+                return zip(missing_ids, RecipeSerializer(recipes, many=True).data)
+
+            fragments = get_recipe_fragments(
+                {recipe_id: recipe.updated_at for recipe_id, recipe in chosen.items()},
+                list(RecipeSerializer.Meta.fields), render_missing)
+            for meal_type, recipe_obj in plan_recipes.items():
+                serialized_meals[meal_type] = fragments.get(
+                    recipe_obj.pk) if recipe_obj else None
 
         api_response_plan = {
             # Already in a good format
@@ -127,10 +422,63 @@ class MealPlanGenerateView(APIView):
             "totals_for_the_day": generated_data["plan_totals"]
         }
 
-        return Response(api_response_plan, status=status.HTTP_200_OK)
+        return self._timed_response(timer, api_response_plan, status.HTTP_200_OK)
+
+    def _timed_response(self, timer, data, response_status):
+        timer.emit('mealplan.generate', user_id=self.request.user.pk,
+                   status=response_status)
+        response = Response(data, status=response_status)
+        response['Server-Timing'] = timer.server_timing_header()
+        return response
+
+
+# --- Ingredient ViewSet (Read-Only) ---
+# The detail view is the only place USDA foodPortions are served
+class IngredientViewSet(CatalogConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Ingredient.objects.all().order_by('name')
+    serializer_class = IngredientSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = IngredientPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.only(*INGREDIENT_SUMMARY_COLUMNS)
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return IngredientSummarySerializer
+        return IngredientSerializer
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        GET ingredients/autocomplete/?q=chick&limit=10
+        Answered from the in-memory prefix index (api/autocomplete.py), without a DB query.
+        """
+        query = request.query_params.get('q', '')
+        try:
+            limit = int(request.query_params.get('limit', AUTOCOMPLETE_DEFAULT_LIMIT))
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+        limit = max(1, min(limit, AUTOCOMPLETE_MAX_LIMIT))
+        matches = get_ingredient_index().search(query, limit=limit)
+        return Response([
+            {'id': ingredient_id, 'name': name, 'fdc_id': fdc_id}
+            for ingredient_id, name, fdc_id in matches
+        ])
 
-# --- Optional: Ingredient List View (if you want to expose ingredients directly) ---
-# class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
-#     queryset = Ingredient.objects.all().order_by('name')
-#     serializer_class = IngredientSerializer
-#     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    @action(detail=False, methods=['post'])
+    def parse(self, request):
+        """
+        POST ingredients/parse/ {"lines": ["2 cups all-purpose flour", ...]}
+        Splits each line into quantity, unit and ingredient and matches the ingredient against
+        the catalog with the in-memory matcher (api/ingredient_lines.py).
+        """
+        lines = request.data.get('lines') if isinstance(request.data, dict) else None
+        if not isinstance(lines, list) or not all(isinstance(line, str) for line in lines):
+            raise ValidationError({"lines": "Must be a list of strings."})
+        if len(lines) > INGREDIENT_PARSE_MAX_LINES:
+            raise ValidationError({"lines": f"At most {INGREDIENT_PARSE_MAX_LINES} lines per request."})
+        return Response(parse_ingredient_lines(lines))
@@ -130,3 +130,35 @@ REST_FRAMEWORK = {
     #     'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     # ]
 }
+
+# --- Meal planner ---
+# When enabled, workers map the planner catalog (recipe IDs and macros per meal type) from
+# shared memory instead of each building a private copy. Publish it with
+# `manage.py publish_planner_catalog` (or let the first worker do it).
+PLANNER_SHARED_CATALOG = False
+PLANNER_CATALOG_SHM_NAME = 'nutriplan_catalog'
+
+# --- Ingredient autocomplete ---
+# Each worker keeps an in-memory prefix index of ingredient names and FDC IDs. Writes made by
+# the worker update it in place. Every this many seconds a background thread checks whether the
+# ingredient table changed elsewhere and, only then, rebuilds the index (None: never check).
+# The ingredient line matcher (api/ingredient_lines.py) follows the same schedule.
+INGREDIENT_INDEX_CHECK_SECONDS = 60
+
+# --- USDA ingestion ---
+# Raw FoodData Central responses and the checkpoint journal of `populate_ingredients`, so
+# interrupted runs resume and ingredients can be re-derived without network calls.
+FDC_CACHE_DIR = BASE_DIR / 'var' / 'fdc_cache'
+
+# --- Caching ---
+# Rendered recipe JSON fragments (api/fragments.py) are stored in RECIPE_FRAGMENT_CACHE.
+# The local-memory cache is per process; point it at a shared backend (Redis/Memcached)
+# in production so all workers reuse the same fragments.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'nutriplan-default',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+RECIPE_FRAGMENT_CACHE = 'default'
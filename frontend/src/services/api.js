@@ -40,8 +40,19 @@ export const updateUserProfile = (profileData) => {
   return apiClient.put('profile/', profileData);
 };
 
-export const fetchRecipes = () => {
-    return apiClient.get('recipes/');
+// Recipes are paginated: pass { page, page_size } or { pagination: 'cursor' } and follow `next`
+export const fetchRecipes = (params = {}) => {
+    return apiClient.get('recipes/', { params });
+};
+
+// Fetches several recipes in one request; the response is keyed by recipe ID
+export const fetchRecipesBatch = (ids, params = {}) => {
+    return apiClient.get('recipes/batch/', { params: { ...params, ids: ids.join(',') } });
+};
+
+// Delta sync: pass the `watermark` from the previous response; start from a full fetch
+export const fetchRecipeChanges = (since, params = {}) => {
+    return apiClient.get('recipes/changes/', { params: { ...params, since } });
 };
 
 export const generateMealPlan = () => {